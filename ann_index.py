@@ -0,0 +1,464 @@
+"""
+Local approximate nearest neighbor index
+
+An in-process index of edge-fact and entity-name embeddings used as the
+first stage of edge and node searches, so a nearest neighbor lookup costs a
+matrix product instead of a Neo4j vector index round-trip. Neo4j is then
+only asked to hydrate the top-k by uuid.
+
+Small indexes are searched exactly. Past ``exact_threshold`` vectors an IVF
+layout is trained (spherical k-means over a sample) in a worker thread, and
+once it is in place each query scans only the ``nprobe`` closest lists;
+until then searches keep using the exact scan or the previous layout. Rows are also partitioned by group, so a
+group-scoped search only scores that group's rows, exactly unless the group
+alone is past ``exact_threshold``. Episodes ingested through ``Connection``
+are added as they land, anything else is caught up from the graph by
+``created_at`` on first use and every ``sync_interval`` seconds, and the
+index snapshots to ``.npy`` files that are memory-mapped on load for fast
+restarts. Every ``Connection.clear_data`` stamps a new clear epoch on the
+graph's SchemaVersion node; an index from an older epoch is dropped and
+rebuilt on its next sync, and hits the graph no longer has are removed as
+searches come across them.
+"""
+
+import asyncio
+import json
+import math
+import os
+import time
+from datetime import datetime
+from uuid import uuid4
+
+import numpy as np
+from graphiti_core.helpers import DEFAULT_DATABASE, parse_db_date
+
+INITIAL_ROWS = 1024
+SYNC_BATCH = 5000
+
+
+def fit_ivf(vectors: np.ndarray, live: np.ndarray, size: int, iterations: int = 10,
+            sample_size: int = 50000, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Spherical k-means into ~sqrt(n) lists; returns centroids and row assignments.
+
+    Only reads ``vectors``, so it can run in a worker thread.
+    """
+    lists = min(4096, max(1, int(math.sqrt(len(live)))))
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(live, min(len(live), sample_size), replace=False)]
+    centroids = sample[rng.choice(len(sample), lists, replace=False)]
+    for _ in range(iterations):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # Lists that lost all their points keep their old centroid
+        centroids = np.where(norms > 0, sums / np.where(norms == 0, 1, norms), centroids)
+
+    centroids = centroids.astype(np.float32)
+    assignments = np.empty(size, dtype=np.int32)
+    for start in range(0, size, SYNC_BATCH):
+        block = vectors[start:min(start + SYNC_BATCH, size)]
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return centroids, assignments
+
+
+async def clear_epoch(driver) -> str | None:
+    """Return the graph's clear epoch, or None if it was never cleared."""
+    records, _, _ = await driver.execute_query(
+        "MATCH (m:SchemaVersion {name: 'graphiti'}) RETURN m.clear_epoch AS epoch",
+        database_=DEFAULT_DATABASE,
+        routing_='r',
+    )
+    return records[0]['epoch'] if records else None
+
+
+async def mark_cleared(driver) -> str:
+    """Stamp a new clear epoch on the graph and return it."""
+    epoch = uuid4().hex
+    await driver.execute_query(
+        "MERGE (m:SchemaVersion {name: 'graphiti'}) SET m.clear_epoch = $epoch",
+        epoch=epoch,
+        database_=DEFAULT_DATABASE,
+    )
+    return epoch
+
+
+class VectorIndex:
+    """Growable matrix of unit vectors with an optional IVF partition."""
+
+    def __init__(self, exact_threshold: int = 20000, nprobe: int = 16):
+        self.exact_threshold = exact_threshold
+        self.nprobe = nprobe
+        self.vectors: np.ndarray | None = None
+        self.alive = np.zeros(0, dtype=bool)
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.centroids: np.ndarray | None = None
+        self.trained_size = 0
+        self.uuids: list[str] = []
+        self.groups: list[str] = []
+        self.rows: dict[str, int] = {}
+        self.group_rows: dict[str, list[int]] = {}
+        # Bumped whenever entries are removed, since their uuids may come back
+        # on other rows
+        self.version = 0
+        # Background training, and the rows written while it runs
+        self._training: asyncio.Task | None = None
+        self._dirty: set[int] | None = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def size(self) -> int:
+        return len(self.uuids)
+
+    def upsert(self, uuids: list[str], vectors, group_ids: list[str]):
+        """Insert or replace vectors by uuid."""
+        if not uuids:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+        if self.vectors is None:
+            self.vectors = np.zeros((INITIAL_ROWS, matrix.shape[1]), dtype=np.float32)
+            self.alive = np.zeros(INITIAL_ROWS, dtype=bool)
+            self.assignments = np.zeros(INITIAL_ROWS, dtype=np.int32)
+
+        rows = []
+        for uuid, group_id in zip(uuids, group_ids):
+            row = self.rows.get(uuid)
+            if row is None:
+                row = self.rows[uuid] = len(self.uuids)
+                self.uuids.append(uuid)
+                self.groups.append(group_id)
+                self.group_rows.setdefault(group_id, []).append(row)
+            rows.append(row)
+        self._reserve(len(self.uuids))
+        if self._dirty is not None:
+            self._dirty.update(rows)
+
+        rows = np.asarray(rows)
+        self.vectors[rows] = matrix
+        self.alive[rows] = True
+        if self.centroids is not None:
+            self.assignments[rows] = np.argmax(matrix @ self.centroids.T, axis=1)
+
+    def remove(self, uuids: list[str]):
+        self.version += 1
+        for uuid in uuids:
+            row = self.rows.pop(uuid, None)
+            if row is not None:
+                self.alive[row] = False
+
+    def remove_groups(self, group_ids: list[str]):
+        """Drop every entry of the given groups."""
+        self.version += 1
+        for group_id in group_ids:
+            for row in self.group_rows.pop(group_id, []):
+                if self.rows.get(self.uuids[row]) == row:
+                    del self.rows[self.uuids[row]]
+                self.alive[row] = False
+
+    def search(self, vector, k: int, group_ids: list[str] | None = None,
+               rows: np.ndarray | None = None) -> list[tuple[str, float]]:
+        """Return up to ``k`` ``(uuid, cosine similarity)`` pairs, best first.
+
+        ``rows`` (sorted row ids) restricts the search to those entries, e.g.
+        the facts a validity index reports as valid at some instant.
+        """
+        if not self.rows or k <= 0:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+
+        size = self.size
+        if size >= self.exact_threshold and size > 2 * self.trained_size:
+            self._start_training()
+
+        if group_ids is not None:
+            candidates = np.concatenate(
+                [np.asarray(self.group_rows.get(group_id, ()), dtype=np.int64)
+                 for group_id in group_ids] or [np.zeros(0, dtype=np.int64)])
+            if rows is not None:
+                candidates = candidates[np.isin(candidates, rows, assume_unique=True)]
+        elif rows is not None:
+            candidates = np.asarray(rows, dtype=np.int64)
+        else:
+            candidates = np.arange(size)
+        candidates = candidates[self.alive[candidates]]
+        # Small partitions are cheaper to scan exactly than to probe
+        if self.centroids is not None and len(candidates) >= self.exact_threshold:
+            probes = np.argsort(-(self.centroids @ query))[:self.nprobe]
+            candidates = candidates[np.isin(self.assignments[candidates], probes)]
+        if not len(candidates):
+            return []
+
+        scores = self.vectors[candidates] @ query
+        top = min(k, len(scores))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+        return [(self.uuids[candidates[i]], float(scores[i])) for i in best]
+
+    def train(self, iterations: int = 10, sample_size: int = 50000, seed: int = 0):
+        """Partition the vectors into ~sqrt(n) lists with spherical k-means."""
+        size = self.size
+        centroids, assignments = fit_ivf(
+            self.vectors, np.flatnonzero(self.alive[:size]), size,
+            iterations, sample_size, seed)
+        self._install(centroids, assignments, size)
+
+    def _start_training(self):
+        if self._training is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop to train behind
+            self.train()
+            return
+        self._dirty = set()
+        self._training = loop.create_task(self._train_in_background(self.size))
+
+    async def _train_in_background(self, size: int):
+        try:
+            centroids, assignments = await asyncio.to_thread(
+                fit_ivf, self.vectors, np.flatnonzero(self.alive[:size]), size)
+            self._install(centroids, assignments, size)
+        finally:
+            self._training = None
+            self._dirty = None
+
+    def _install(self, centroids: np.ndarray, assignments: np.ndarray, size: int):
+        self.centroids = centroids
+        self.assignments[:size] = assignments
+        # Rows added or rewritten while training ran
+        stale = np.union1d(np.arange(size, self.size),
+                           np.fromiter(self._dirty or (), dtype=np.int64))
+        if len(stale):
+            self.assignments[stale] = np.argmax(self.vectors[stale] @ centroids.T, axis=1)
+        self.trained_size = size
+
+    def save(self, path: str, name: str):
+        size = self.size
+        arrays = {'vectors': self.vectors[:size] if self.vectors is not None else None,
+                  'alive': self.alive[:size], 'assignments': self.assignments[:size],
+                  'centroids': self.centroids}
+        for key, array in arrays.items():
+            if array is not None:
+                # np.save appends .npy unless the name already ends with it
+                tmp_path = os.path.join(path, f'{name}.{key}.tmp.npy')
+                np.save(tmp_path, array)
+                os.replace(tmp_path, os.path.join(path, f'{name}.{key}.npy'))
+        return {'uuids': self.uuids, 'groups': self.groups,
+                'trained_size': self.trained_size}
+
+    def load(self, path: str, name: str, meta: dict):
+        def load_array(key, mmap_mode=None):
+            file = os.path.join(path, f'{name}.{key}.npy')
+            return np.load(file, mmap_mode=mmap_mode) if os.path.exists(file) else None
+
+        self.uuids = meta['uuids']
+        self.groups = meta['groups']
+        self.trained_size = meta['trained_size']
+        # Vectors stay memory-mapped until the first write copies them
+        self.vectors = load_array('vectors', mmap_mode='r')
+        if self.vectors is None:
+            self.uuids, self.groups = [], []
+            return
+        self.alive = load_array('alive')
+        self.assignments = load_array('assignments')
+        self.centroids = load_array('centroids')
+        self.rows = {uuid: row for row, uuid in enumerate(self.uuids) if self.alive[row]}
+        self.group_rows = {}
+        for row, group_id in enumerate(self.groups):
+            if self.alive[row]:
+                self.group_rows.setdefault(group_id, []).append(row)
+
+    def _writable(self):
+        if self.vectors is not None and not self.vectors.flags.writeable:
+            self.vectors = np.array(self.vectors)
+
+    def _reserve(self, rows: int):
+        self._writable()
+        capacity = len(self.vectors)
+        if rows <= capacity:
+            return
+        while capacity < rows:
+            capacity = max(capacity * 2, INITIAL_ROWS)
+        grow = capacity - len(self.vectors)
+        self.vectors = np.concatenate(
+            [self.vectors, np.zeros((grow, self.vectors.shape[1]), dtype=np.float32)])
+        self.alive = np.concatenate([self.alive, np.zeros(grow, dtype=bool)])
+        self.assignments = np.concatenate(
+            [self.assignments, np.zeros(grow, dtype=np.int32)])
+
+
+class AnnIndex:
+    """Edge-fact and entity-name vector indexes kept in step with the graph."""
+
+    def __init__(self, path: str = '', exact_threshold: int = 20000, nprobe: int = 16,
+                 sync_interval: float = 60.0):
+        self.path = path
+        self.edges = VectorIndex(exact_threshold, nprobe)
+        self.nodes = VectorIndex(exact_threshold, nprobe)
+        # Latest created_at caught up from the graph
+        self.watermark: datetime | None = None
+        # Clear epoch of the graph the index mirrors
+        self.epoch: str | None = None
+        self.sync_interval = sync_interval
+        self._synced_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    def add_results(self, results):
+        """Index the nodes and edges of an ``AddEpisodeResults``."""
+        nodes = [node for node in results.nodes if node.name_embedding]
+        edges = [edge for edge in results.edges if edge.fact_embedding]
+        self.nodes.upsert([node.uuid for node in nodes],
+                          [node.name_embedding for node in nodes],
+                          [node.group_id for node in nodes])
+        self.edges.upsert([edge.uuid for edge in edges],
+                          [edge.fact_embedding for edge in edges],
+                          [edge.group_id for edge in edges])
+
+    def _stale(self) -> bool:
+        return self._synced_at is None \
+            or time.monotonic() - self._synced_at >= self.sync_interval
+
+    async def ensure_synced(self, driver):
+        """Catch up with the graph on first use and every ``sync_interval`` seconds."""
+        if self._stale():
+            async with self._lock:
+                if self._stale():
+                    await self._sync(driver)
+
+    async def sync(self, driver):
+        """Index every node and edge created since the watermark.
+
+        Starts over from an empty index if the graph was cleared since the
+        index last synced, e.g. by another process.
+        """
+        async with self._lock:
+            await self._sync(driver)
+
+    async def _sync(self, driver):
+        epoch = await clear_epoch(driver)
+        if epoch != self.epoch:
+            print('ANN index: the graph was cleared since the last sync, rebuilding')
+            self.clear()
+            self.epoch = epoch
+        since = self.watermark
+        for index, match, embedding in (
+                (self.nodes, 'MATCH (x:Entity)', 'x.name_embedding'),
+                (self.edges, 'MATCH ()-[x:RELATES_TO]->()', 'x.fact_embedding')):
+            latest = await self._sync_index(driver, index, match, embedding, since)
+            if latest is not None and (self.watermark is None or latest > self.watermark):
+                self.watermark = latest
+        self._synced_at = time.monotonic()
+
+    @staticmethod
+    async def _sync_index(driver, index: VectorIndex, match: str, embedding: str, since):
+        latest, after_uuid = since, ''
+        while True:
+            # Page on (created_at, uuid) so huge graphs stream in batches
+            records, _, _ = await driver.execute_query(
+                f"""
+                {match}
+                WHERE {embedding} IS NOT NULL
+                  AND ($since IS NULL OR x.created_at > $since
+                       OR (x.created_at = $since AND x.uuid > $after_uuid))
+                RETURN x.uuid AS uuid, x.group_id AS group_id,
+                       x.created_at AS created_at, {embedding} AS embedding
+                ORDER BY x.created_at, x.uuid
+                LIMIT $limit
+                """,
+                since=latest,
+                after_uuid=after_uuid,
+                limit=SYNC_BATCH,
+                database_=DEFAULT_DATABASE,
+                routing_='r',
+            )
+            if not records:
+                return latest
+            index.upsert([record['uuid'] for record in records],
+                         [record['embedding'] for record in records],
+                         [record['group_id'] for record in records])
+            latest = parse_db_date(records[-1]['created_at'])
+            after_uuid = records[-1]['uuid']
+            if len(records) < SYNC_BATCH:
+                return latest
+
+    def remove_groups(self, group_ids: list[str]):
+        """Forget the nodes and edges of cleared groups."""
+        self.edges.remove_groups(group_ids)
+        self.nodes.remove_groups(group_ids)
+
+    def clear(self):
+        self.edges = VectorIndex(self.edges.exact_threshold, self.edges.nprobe)
+        self.nodes = VectorIndex(self.nodes.exact_threshold, self.nodes.nprobe)
+        self.watermark = None
+
+    def snapshot(self):
+        """Write the index to ``path`` for the next process to memory-map."""
+        if not self.path:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        meta = {
+            'watermark': self.watermark.isoformat() if self.watermark else None,
+            'epoch': self.epoch,
+            'edges': self.edges.save(self.path, 'edges'),
+            'nodes': self.nodes.save(self.path, 'nodes'),
+        }
+        tmp_path = os.path.join(self.path, 'index.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(self.path, 'index.json'))
+
+    @classmethod
+    def load(cls, path: str, exact_threshold: int = 20000, nprobe: int = 16,
+             sync_interval: float = 60.0) -> 'AnnIndex':
+        """Open the snapshot at ``path``, or an empty index if there is none."""
+        index = cls(path, exact_threshold, nprobe, sync_interval)
+        meta_path = os.path.join(path, 'index.json')
+        if path and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            index.edges.load(path, 'edges', meta['edges'])
+            index.nodes.load(path, 'nodes', meta['nodes'])
+            if meta['watermark']:
+                index.watermark = datetime.fromisoformat(meta['watermark'])
+            index.epoch = meta.get('epoch')
+        return index
+
+    def stats(self) -> dict:
+        return {
+            'edges': len(self.edges),
+            'nodes': len(self.nodes),
+            'edge_lists': 0 if self.edges.centroids is None else len(self.edges.centroids),
+            'node_lists': 0 if self.nodes.centroids is None else len(self.nodes.centroids),
+            'watermark': self.watermark.isoformat() if self.watermark else None,
+        }
+
+
+_ann_index: AnnIndex | None = None
+
+
+def get_ann_index() -> AnnIndex | None:
+    """Return the process-wide ANN index, or None unless ANN_INDEX is set."""
+    global _ann_index
+    if _ann_index is None and os.environ.get(
+            'ANN_INDEX', 'false').lower() in ('1', 'true', 'yes'):
+        _ann_index = AnnIndex.load(
+            os.environ.get('ANN_INDEX_PATH', '.ann_index'),
+            exact_threshold=int(os.environ.get('ANN_EXACT_THRESHOLD', '20000')),
+            nprobe=int(os.environ.get('ANN_NPROBE', '16')),
+            sync_interval=float(os.environ.get('ANN_SYNC_INTERVAL', '60')),
+        )
+    return _ann_index
+
+
+def close_ann_index():
+    """Snapshot the process-wide index and drop it."""
+    global _ann_index
+    if _ann_index is not None:
+        _ann_index.snapshot()
+        _ann_index = None
@@ -0,0 +1,206 @@
+"""
+Semantic answer cache
+
+Remembers the agent's answers by the embedding of the question, so a
+paraphrase of a question answered recently is served without an LLM call.
+Each answer keeps the uuids of the facts its searches returned and is
+dropped as soon as ingestion invalidates one of them. A hit is also checked
+against the graph with one read, which catches facts invalidated by bulk
+loads or other processes. Answers are kept per group and only served to
+questions from the same group.
+"""
+
+import json
+import os
+import time
+import uuid as uuid_lib
+from dataclasses import asdict, dataclass
+
+from graphiti_core.helpers import DEFAULT_DATABASE
+
+from ann_index import VectorIndex
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    fact_uuids: list[str]
+    created_at: float
+
+
+class AnswerCache:
+    """Answers keyed by question embedding, invalidated by their facts."""
+
+    def __init__(self, threshold: float = 0.92, ttl_seconds: float = 86400.0,
+                 max_entries: int = 10000, path: str = ''):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.path = path
+        # Always searched exactly; answers are few compared to facts
+        self.index = VectorIndex(exact_threshold=2 * max_entries + 1)
+        self.entries: dict[str, CachedAnswer] = {}
+        self.by_fact: dict[str, set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, vector, group_id: str = '') -> tuple[str, CachedAnswer] | None:
+        """Return the group's closest fresh answer at or above the threshold."""
+        hits = self.index.search(vector, 1, [group_id])
+        if not hits or hits[0][1] < self.threshold:
+            return None
+        key = hits[0][0]
+        entry = self.entries[key]
+        if time.time() - entry.created_at > self.ttl_seconds:
+            self.discard(key)
+            return None
+        return key, entry
+
+    async def get(self, driver, vector, group_id: str = '') -> CachedAnswer | None:
+        """Return a cached answer whose facts are all still valid in the graph."""
+        found = self.lookup(vector, group_id)
+        if found is not None:
+            key, entry = found
+            records, _, _ = await driver.execute_query(
+                """
+                MATCH ()-[e:RELATES_TO]->()
+                WHERE e.uuid IN $uuids AND e.invalid_at IS NULL
+                RETURN count(e) AS valid
+                """,
+                uuids=entry.fact_uuids,
+                database_=DEFAULT_DATABASE,
+                routing_='r',
+            )
+            if records and records[0]['valid'] == len(entry.fact_uuids):
+                self.hits += 1
+                return entry
+            self.discard(key)
+            self.invalidations += 1
+        self.misses += 1
+        return None
+
+    def put(self, question: str, vector, answer: str, fact_uuids, group_id: str = ''):
+        """Cache ``answer`` for ``question``, supported by ``fact_uuids``."""
+        fact_uuids = sorted(set(fact_uuids))
+        key = uuid_lib.uuid4().hex
+        self.entries[key] = CachedAnswer(question, answer, fact_uuids, time.time())
+        self.index.upsert([key], [vector], [group_id])
+        for fact_uuid in fact_uuids:
+            self.by_fact.setdefault(fact_uuid, set()).add(key)
+        while len(self.entries) > self.max_entries:
+            self.discard(next(iter(self.entries)))
+        if self.index.size > 2 * self.max_entries:
+            self._compact()
+
+    def discard(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        self.index.remove([key])
+        for fact_uuid in entry.fact_uuids:
+            keys = self.by_fact.get(fact_uuid)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.by_fact[fact_uuid]
+
+    def invalidate_facts(self, fact_uuids) -> int:
+        """Drop every answer supported by one of ``fact_uuids``."""
+        keys = set()
+        for fact_uuid in fact_uuids:
+            keys |= self.by_fact.get(fact_uuid, set())
+        for key in keys:
+            self.discard(key)
+        self.invalidations += len(keys)
+        return len(keys)
+
+    def invalidate_edges(self, edges) -> int:
+        """Drop answers that relied on edges an ingested episode invalidated."""
+        return self.invalidate_facts(
+            edge.uuid for edge in edges if edge.invalid_at is not None)
+
+    def remove_groups(self, group_ids: list[str]):
+        """Drop every answer given to a question from the given groups."""
+        for group_id in group_ids:
+            for row in list(self.index.group_rows.get(group_id, ())):
+                self.discard(self.index.uuids[row])
+
+    def clear(self):
+        self.__init__(self.threshold, self.ttl_seconds, self.max_entries, self.path)
+
+    def _compact(self):
+        # Removed rows stay in the matrix until it is rebuilt
+        index = VectorIndex(self.index.exact_threshold)
+        keys = list(self.entries)
+        rows = [self.index.rows[key] for key in keys]
+        index.upsert(keys, self.index.vectors[rows], [self.index.groups[row] for row in rows])
+        self.index = index
+
+    def snapshot(self):
+        """Write the cache to ``path`` for the next process."""
+        if not self.path:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        meta = {
+            'index': self.index.save(self.path, 'answers'),
+            'entries': {key: asdict(entry) for key, entry in self.entries.items()},
+        }
+        tmp_path = os.path.join(self.path, 'answers.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(self.path, 'answers.json'))
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> 'AnswerCache':
+        """Open the snapshot at ``path``, or an empty cache if there is none."""
+        cache = cls(path=path, **kwargs)
+        meta_path = os.path.join(path, 'answers.json')
+        if path and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            cache.index.load(path, 'answers', meta['index'])
+            for key, entry in meta['entries'].items():
+                cache.entries[key] = CachedAnswer(**entry)
+                for fact_uuid in entry['fact_uuids']:
+                    cache.by_fact.setdefault(fact_uuid, set()).add(key)
+        return cache
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+_answer_cache: AnswerCache | None = None
+
+
+def get_answer_cache() -> AnswerCache | None:
+    """Return the process-wide answer cache, or None unless ANSWER_CACHE is set."""
+    global _answer_cache
+    if _answer_cache is None and os.environ.get(
+            'ANSWER_CACHE', 'false').lower() in ('1', 'true', 'yes'):
+        _answer_cache = AnswerCache.load(
+            os.environ.get('ANSWER_CACHE_PATH', '.answer_cache'),
+            threshold=float(os.environ.get('ANSWER_CACHE_THRESHOLD', '0.92')),
+            ttl_seconds=float(os.environ.get('ANSWER_CACHE_TTL', '86400')),
+            max_entries=int(os.environ.get('ANSWER_CACHE_SIZE', '10000')),
+        )
+    return _answer_cache
+
+
+def close_answer_cache():
+    """Snapshot the process-wide cache and drop it."""
+    global _answer_cache
+    if _answer_cache is not None:
+        _answer_cache.snapshot()
+        _answer_cache = None
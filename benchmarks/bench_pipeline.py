@@ -0,0 +1,232 @@
+"""
+Offline pipeline benchmark
+
+Runs ``Connection.add_episodes`` on synthetic episodes shaped like the
+PHASE*_EPISODES constants, then the three search flows of ``Connection``
+(hybrid_search, center_node_search, node_search_by_recipe), against the
+deterministic stand-ins in ``benchmarks/fakes.py``. No OpenAI key or Neo4j
+instance is needed, and the same seed always produces the same dataset.
+
+For each dataset size it reports ingestion throughput, p50/p95/p99 latency
+of every instrumented stage and peak memory, and writes everything as JSON
+so runs can be diffed for regressions.
+
+Usage:
+    python benchmarks/bench_pipeline.py --sizes 10,100,1000,10000,100000 \\
+        --llm-latency-ms 0 --output bench.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graphiti_core.nodes import EpisodeType  # noqa: E402
+
+from benchmarks.fakes import FakeGraphiti  # noqa: E402
+from connection import Connection  # noqa: E402
+from instrumentation import metrics  # noqa: E402
+from neighborhood_cache import NeighborhoodCache  # noqa: E402
+from search_cache import SearchCache  # noqa: E402
+
+CREATORS = ['OpenAI', 'Anthropic', 'Google', 'Meta', 'Mistral', 'DeepSeek',
+            'Alibaba', 'Cohere', 'xAI', 'Microsoft']
+FAMILIES = ['GPT', 'Claude', 'Gemini', 'Llama', 'Mixtral', 'DeepSeek', 'Qwen',
+            'Command', 'Grok', 'Phi']
+FEATURES = ['Improved coding capabilities', 'Better instruction following',
+            'Enhanced long-context processing', 'Hybrid reasoning model',
+            'Extended thinking capabilities', 'Video-to-code capabilities',
+            'Superior front-end web development', 'Tool use', 'Multilingual support',
+            'Open weights']
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+          'August', 'September', 'October', 'November', 'December']
+
+
+def synthetic_episodes(count: int, seed: int = 0) -> list[dict]:
+    """Generate text and JSON episodes with the shape of PHASE*_EPISODES."""
+    rng = random.Random(seed)
+    episodes = []
+    for i in range(count):
+        family = rng.randrange(len(FAMILIES))
+        name = f'{FAMILIES[family]} {i // len(FAMILIES) % 50}.{rng.randrange(10)}'
+        creator = CREATORS[family]
+        date = f'{rng.choice(MONTHS)} {rng.randint(1, 28)}, {rng.randint(2023, 2026)}'
+        features = rng.sample(FEATURES, 3)
+        if i % 3 == 2:
+            episodes.append({
+                'content': {
+                    'name': name,
+                    'creator': creator,
+                    'release_date': date,
+                    'key_features': features,
+                    'ranking': rng.randint(1, 10),
+                },
+                'type': EpisodeType.json,
+                'description': 'LLM metadata',
+            })
+        else:
+            episodes.append({
+                'content': (
+                    f'{name} was released by {creator} on {date}. '
+                    f'It features {features[0].lower()} and {features[1].lower()}. '
+                    f'{name} competes with {rng.choice(FAMILIES)} models from '
+                    f'{rng.choice(CREATORS)}.'),
+                'type': EpisodeType.text,
+                'description': 'LLM research report',
+            })
+    return episodes
+
+
+def synthetic_queries(count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed + 1)
+    templates = [
+        'Which model did {creator} release?',
+        'What are the key features of {family}?',
+        'Which models support {feature}?',
+        'Who created {family}?',
+    ]
+    return [
+        rng.choice(templates).format(
+            creator=rng.choice(CREATORS), family=rng.choice(FAMILIES),
+            feature=rng.choice(FEATURES).lower())
+        for _ in range(count)
+    ]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+async def run_size(size: int, args) -> dict:
+    metrics.histograms.clear()
+    graphiti = FakeGraphiti(
+        llm_latency=args.llm_latency_ms / 1000,
+        embedding_latency=args.embedding_latency_ms / 1000,
+        db_latency=args.db_latency_ms / 1000,
+        dim=args.dim,
+    )
+    connection = Connection(graphiti)
+    if not args.search_cache:
+        # Every query must hit the search path, not the LRU
+        connection.search_cache = SearchCache(max_entries=0)
+    # A fresh cache per size; searches only run after ingestion finishes
+    connection.neighborhood_cache = NeighborhoodCache() if args.neighborhood_cache else None
+    episodes = synthetic_episodes(size, args.seed)
+    queries = synthetic_queries(args.queries, args.seed)
+
+    if args.trace_memory:
+        tracemalloc.start()
+
+    # The flows print every result; keep that cost but not the noise
+    with contextlib.redirect_stdout(io.StringIO() if args.quiet else sys.stdout):
+        start = time.perf_counter()
+        for offset in range(0, size, args.batch_size):
+            await Connection.add_episodes(
+                graphiti, episodes[offset:offset + args.batch_size], 'Bench',
+                concurrency=args.concurrency, start_index=offset)
+        ingest_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for query in queries:
+            with metrics.span('bench.hybrid_search'):
+                results = await connection.hybrid_search(query)
+            with metrics.span('bench.center_node_search'):
+                await connection.center_node_search(query, results)
+            with metrics.span('bench.node_search_by_recipe'):
+                await connection.node_search_by_recipe(query)
+        search_seconds = time.perf_counter() - start
+
+    memory = {'peak_rss_mb': round(peak_rss_mb(), 1)}
+    if args.trace_memory:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        memory.update(traced_current_mb=round(current / 2**20, 1),
+                      traced_peak_mb=round(peak / 2**20, 1))
+
+    stats = await connection.graph_stats()
+    return {
+        'episodes': size,
+        'entities': stats.entities,
+        'edges': stats.edges,
+        'ingest': {
+            'seconds': ingest_seconds,
+            'episodes_per_second': size / ingest_seconds if ingest_seconds else 0.0,
+        },
+        'search': {
+            'queries': len(queries),
+            'seconds': search_seconds,
+            'flows_per_second': len(queries) / search_seconds if search_seconds else 0.0,
+        },
+        'memory': memory,
+        'latency': metrics.snapshot(),
+        **({'neighborhood_cache': connection.neighborhood_cache.stats()}
+           if connection.neighborhood_cache is not None else {}),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Offline pipeline benchmark.')
+    parser.add_argument('--sizes', default='10,100,1000',
+                        help='comma-separated episode counts, e.g. 10,100,1000,10000,100000')
+    parser.add_argument('--queries', type=int, default=50,
+                        help='queries run through each search flow per size')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=1000,
+                        help='episodes per add_episodes call')
+    parser.add_argument('--llm-latency-ms', type=float, default=0.0)
+    parser.add_argument('--embedding-latency-ms', type=float, default=0.0)
+    parser.add_argument('--db-latency-ms', type=float, default=0.0)
+    parser.add_argument('--dim', type=int, default=256, help='embedding dimension')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--search-cache', action='store_true',
+                        help='keep the search result cache enabled')
+    parser.add_argument('--neighborhood-cache', action='store_true',
+                        help='rerank center node searches from neighborhood snapshots')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='also report tracemalloc peaks (slows the run down)')
+    parser.add_argument('--verbose', dest='quiet', action='store_false',
+                        help='show the output of the flows under test')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+
+    runs = []
+    for size in sizes:
+        run = await run_size(size, args)
+        runs.append(run)
+        print(
+            f"{size:>7} episodes: ingest {run['ingest']['episodes_per_second']:.0f}/s, "
+            f"search p95 {run['latency']['bench.hybrid_search']['p95'] * 1000:.1f}ms, "
+            f"peak RSS {run['memory']['peak_rss_mb']:.0f}MB", file=sys.stderr)
+
+    report = {
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'runs': runs,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
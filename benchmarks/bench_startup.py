@@ -0,0 +1,175 @@
+"""
+Startup-time benchmark
+
+Measures the cold start of each entry point: importing the module in a
+fresh interpreter, building the live agent on first use, and the startup
+index check of ``build_indices_once`` against a stand-in driver that charges
+a fixed round-trip latency per query. The index check is run twice, once
+on an empty graph (indices built, schema marker written) and once on a
+graph that already carries the marker.
+
+Usage:
+    python benchmarks/bench_startup.py --repeat 5 --output startup.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ENTRY_POINTS = ['graphiti_client', 'connection', 'llm_knowledge', 'quickstart',
+                'server', 'live_agent']
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+{extra}
+print(imported - start, time.perf_counter() - imported)
+"""
+
+
+def run_python(code: str) -> list[float]:
+    env = dict(os.environ)
+    # Module-level clients only need a key to be present
+    env.setdefault('OPENAI_API_KEY', 'bench')
+    output = subprocess.run(
+        [sys.executable, '-c', code], cwd=ROOT, env=env, check=True,
+        capture_output=True, text=True).stdout
+    return [float(value) for value in output.split()[-2:]]
+
+
+def summarize(samples: list[float]) -> dict:
+    return {
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'max': max(samples),
+    }
+
+
+def slowest_imports(module: str, top: int) -> list[dict]:
+    """Largest self-time imports of ``module`` from ``-X importtime``."""
+    env = dict(os.environ)
+    env.setdefault('OPENAI_API_KEY', 'bench')
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append({'module': name.strip(), 'self_ms': int(self_us) / 1000,
+                     'cumulative_ms': int(cumulative_us) / 1000})
+    return sorted(rows, key=lambda row: row['self_ms'], reverse=True)[:top]
+
+
+def measure_imports(args) -> dict:
+    results = {}
+    for module in ENTRY_POINTS:
+        extra = 'module = __import__("live_agent").get_agent()' if module == 'live_agent' else ''
+        imports, firsts, walls = [], [], []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            imported, first_use = run_python(IMPORT_SNIPPET.format(module=module, extra=extra))
+            walls.append(time.perf_counter() - start)
+            imports.append(imported)
+            firsts.append(first_use)
+        results[module] = {'import': summarize(imports), 'process': summarize(walls)}
+        if extra:
+            results[module]['build_agent'] = summarize(firsts)
+        if args.top:
+            results[module]['slowest_imports'] = slowest_imports(module, args.top)
+        print(f"{module:>16}: import {results[module]['import']['median'] * 1000:.0f}ms, "
+              f"process {results[module]['process']['median'] * 1000:.0f}ms",
+              file=sys.stderr)
+    return results
+
+
+class SchemaDriver:
+    """Driver stand-in that charges ``latency`` per query and keeps the schema marker."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.queries = 0
+        self.version = None
+
+    async def execute_query(self, query_, **kwargs):
+        self.queries += 1
+        await asyncio.sleep(self.latency)
+        if 'SchemaVersion' in query_ and 'MERGE' in query_:
+            self.version = kwargs['version']
+        elif 'SchemaVersion' in query_ and self.version is not None:
+            return [{'version': self.version}], None, None
+        return [], None, None
+
+
+class SchemaGraphiti:
+    def __init__(self, driver: SchemaDriver):
+        self.driver = driver
+
+    async def build_indices_and_constraints(self, delete_existing: bool = False):
+        from graphiti_core.utils.maintenance.graph_data_operations import (
+            build_indices_and_constraints,
+        )
+        await build_indices_and_constraints(self.driver, delete_existing)
+
+
+async def measure_index_check(args) -> dict:
+    import graphiti_client
+
+    driver = SchemaDriver(args.db_latency_ms / 1000)
+    graphiti = SchemaGraphiti(driver)
+    results = {}
+    for state in ('empty_graph', 'marker_present'):
+        # Each run stands for a new process
+        graphiti_client._indices_built.clear()
+        before = driver.queries
+        start = time.perf_counter()
+        await graphiti_client.build_indices_once(graphiti)
+        results[state] = {'seconds': time.perf_counter() - start,
+                          'queries': driver.queries - before}
+        print(f"{'index check ' + state:>28}: {results[state]['queries']} queries, "
+              f"{results[state]['seconds'] * 1000:.1f}ms", file=sys.stderr)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Entry point startup benchmark.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='fresh interpreters started per entry point')
+    parser.add_argument('--db-latency-ms', type=float, default=5.0,
+                        help='simulated Neo4j round-trip for the index check')
+    parser.add_argument('--top', type=int, default=0,
+                        help='also list the N slowest imports of each entry point')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    report = {
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'imports': measure_imports(args),
+        'index_check': await measure_index_check(args),
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
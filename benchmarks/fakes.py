@@ -0,0 +1,349 @@
+"""
+Offline stand-ins for the benchmark suite
+
+Deterministic local replacements for the pieces of Graphiti that normally
+call OpenAI and Neo4j, each with configurable injected latency:
+
+    HashEmbedder   hashed bag-of-words vectors, no network
+    FakeLLMClient  rule-based entity and fact extraction
+    FakeDriver     in-memory graph answering the Cypher that Connection,
+                   the neighborhood cache and Graphiti's node distance
+                   reranker send
+    FakeGraphiti   the Graphiti API surface Connection uses, backed by the
+                   three above
+
+Graphiti's own search and ingestion pipelines are written against raw
+Cypher, so the graph stand-in sits at the Graphiti API boundary: everything
+from ``Connection`` outwards is the real code under test.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+from collections import deque
+from datetime import datetime, timezone
+
+import numpy as np
+from neo4j.time import DateTime
+from graphiti_core.edges import EntityEdge
+from graphiti_core.graphiti import AddEpisodeResults
+from graphiti_core.nodes import EntityNode, EpisodeType, EpisodicNode
+from graphiti_core.search.search_config import DEFAULT_SEARCH_LIMIT, SearchResults
+
+from instrumentation import TimedDriver, TimedEmbedder, TimedLLMClient
+
+TOKEN_RE = re.compile(r'[\w.\-]+')
+ENTITY_RE = re.compile(r'\b[A-Z][\w.\-]*(?: [A-Z0-9][\w.\-]*)*')
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+RRF_K = 60
+
+
+def tokenize(text: str) -> list[str]:
+    return [token.strip('.-').lower() for token in TOKEN_RE.findall(text)
+            if token.strip('.-')]
+
+
+async def pause(seconds: float):
+    if seconds > 0:
+        await asyncio.sleep(seconds)
+
+
+def rrf(*rankings: list[int]) -> list[int]:
+    """Reciprocal rank fusion of row rankings."""
+    scores: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            scores[row] = scores.get(row, 0.0) + 1 / (rank + RRF_K)
+    return sorted(scores, key=lambda row: -scores[row])
+
+
+class HashEmbedder:
+    """Deterministic embedder hashing tokens into a fixed-size vector."""
+
+    def __init__(self, dim: int = 256, latency: float = 0.0):
+        self.dim = dim
+        self.latency = latency
+
+    def embed(self, text: str) -> list[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in tokenize(text):
+            digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+            value = int.from_bytes(digest, 'little')
+            vector[value % self.dim] += 1.0 if value & (1 << 63) else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    async def create(self, input_data):
+        await pause(self.latency)
+        text = input_data[0] if isinstance(input_data, list) else input_data
+        return self.embed(str(text))
+
+    async def create_batch(self, input_data_list: list[str]) -> list[list[float]]:
+        await pause(self.latency)
+        return [self.embed(text) for text in input_data_list]
+
+
+class FakeLLMClient:
+    """Rule-based extraction standing in for the LLM prompts of ingestion."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    async def generate_response(self, content: str, source: EpisodeType):
+        """Return ``(entity names, (source, target, fact) triples)``."""
+        await pause(self.latency)
+        if source == EpisodeType.json:
+            return self._extract_json(json.loads(content))
+        return self._extract_text(content)
+
+    @staticmethod
+    def _extract_text(content: str):
+        entities, facts = [], []
+        for sentence in SENTENCE_RE.split(content):
+            names = list(dict.fromkeys(ENTITY_RE.findall(sentence)))
+            entities += names
+            if len(names) >= 2:
+                facts.append((names[0], names[1], sentence))
+        return list(dict.fromkeys(entities)), facts
+
+    @staticmethod
+    def _extract_json(content: dict):
+        name = str(content.get('name', 'Unknown'))
+        entities, facts = [name], []
+        for key, value in content.items():
+            if key == 'name':
+                continue
+            for item in value if isinstance(value, list) else [value]:
+                target = str(item)
+                entities.append(target)
+                facts.append((name, target, f'{name} {key.replace("_", " ")} {target}'))
+        return list(dict.fromkeys(entities)), facts
+
+
+class FakeDriver:
+    """In-memory graph answering the queries Connection sends to Neo4j."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.adjacency: dict[str, set[str]] = {}
+        self.nodes: dict[str, EntityNode] = {}
+        self.episodes = 0
+        self.entities = 0
+        self.edges = 0
+        self.latest_created_at_ms = None
+
+    def add_edge(self, source_uuid: str, target_uuid: str):
+        self.adjacency.setdefault(source_uuid, set()).add(target_uuid)
+        self.adjacency.setdefault(target_uuid, set()).add(source_uuid)
+
+    def node_record(self, node_uuid: str, **fields) -> dict:
+        node = self.nodes[node_uuid]
+        return {'uuid': node.uuid, 'name': node.name, 'group_id': node.group_id,
+                'created_at': DateTime.from_native(node.created_at),
+                'summary': node.summary, 'labels': node.labels, 'attributes': {}, **fields}
+
+    def distances(self, center_uuid: str, targets: set[str]) -> dict[str, int]:
+        """Breadth-first hop counts from the center to each reachable target."""
+        found, seen, frontier = {}, {center_uuid}, deque([(center_uuid, 0)])
+        while frontier and len(found) < len(targets):
+            node_uuid, depth = frontier.popleft()
+            for neighbor in self.adjacency.get(node_uuid, ()):
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    if neighbor in targets:
+                        found[neighbor] = depth + 1
+                    frontier.append((neighbor, depth + 1))
+        return found
+
+    async def execute_query(self, query_, parameters_=None, **params):
+        await pause(self.latency)
+        text = getattr(query_, 'text', query_)
+        if 'SHORTEST' in text:
+            distances = self.distances(params['center_uuid'], set(params['node_uuids']))
+            records = [{'uuid': uuid, 'score': score} for uuid, score in distances.items()]
+        elif 'collect(DISTINCT n.uuid) AS sources' in text:
+            # One hop of a neighborhood snapshot
+            sources: dict[str, list[str]] = {}
+            for node_uuid in params['uuids']:
+                for neighbor in self.adjacency.get(node_uuid, ()):
+                    sources.setdefault(neighbor, []).append(node_uuid)
+            records = [self.node_record(node_uuid, sources=node_sources)
+                       for node_uuid, node_sources in sources.items()][:params['limit']]
+        elif 'MATCH (m:Entity {uuid: $uuid})' in text:
+            records = [self.node_record(params['uuid'])] if params['uuid'] in self.nodes else []
+        elif 'MATCH (n:Entity) WHERE n.uuid IN $uuids' in text:
+            records = [self.node_record(node_uuid) for node_uuid in params['uuids']
+                       if node_uuid in self.nodes]
+        elif 'count(x) AS episodes' in text:
+            records = [{
+                'episodes': self.episodes,
+                'entities': self.entities,
+                'edges': self.edges,
+                'latest_created_at_ms': self.latest_created_at_ms,
+            }]
+        else:
+            records = []
+        return records, None, None
+
+    async def close(self):
+        pass
+
+
+class FakeGraphiti:
+    """In-memory Graphiti exposing the methods Connection calls."""
+
+    def __init__(self, llm_latency: float = 0.0, embedding_latency: float = 0.0,
+                 db_latency: float = 0.0, dim: int = 256, group_id: str = ''):
+        self.group_id = group_id
+        # Wrapped like get_graphiti() does, so every stage lands in a histogram
+        self.driver = TimedDriver(FakeDriver(db_latency))
+        self.embedder = TimedEmbedder(HashEmbedder(dim, embedding_latency))
+        self.llm_client = TimedLLMClient(FakeLLMClient(llm_latency))
+
+        self.nodes: list[EntityNode] = []
+        self.node_by_name: dict[str, EntityNode] = {}
+        self.edges: list[EntityEdge] = []
+        self.node_postings: dict[str, set[int]] = {}
+        self.edge_postings: dict[str, set[int]] = {}
+        # Vectors live in float32 blocks; like Graphiti's search results, the
+        # stored models carry no embeddings
+        self._node_vectors: list[np.ndarray] = []
+        self._edge_vectors: list[np.ndarray] = []
+        self._node_matrix = None
+        self._edge_matrix = None
+
+    async def add_episode(self, name: str, episode_body: str, source_description: str,
+                          reference_time: datetime, source: EpisodeType = EpisodeType.message,
+                          **kwargs) -> AddEpisodeResults:
+        episode = EpisodicNode(
+            name=name, group_id=self.group_id, source=source,
+            source_description=source_description, content=episode_body,
+            valid_at=reference_time, created_at=datetime.now(timezone.utc))
+        return await self.commit_episode(await self.extract_episode(episode))
+
+    async def extract_episode(self, episode: EpisodicNode, pending=()):
+        """The LLM half of ``add_episode``; reads nothing from the graph."""
+        names, facts = await self.llm_client.generate_response(
+            episode.content, episode.source)
+        return episode, names, facts
+
+    async def commit_episode(self, extracted) -> AddEpisodeResults:
+        episode, names, facts = extracted
+        now = datetime.now(timezone.utc)
+        episode.created_at = now
+        reference_time = episode.valid_at
+        new_names = [entity for entity in names if entity not in self.node_by_name]
+        new_texts = new_names + [fact for _, _, fact in facts]
+        vectors = np.asarray(
+            await self.embedder.create_batch(new_texts) if new_texts else [],
+            dtype=np.float32)
+
+        # Graph writes of one episode go out as one query, like Graphiti's bulk save
+        await self.driver.execute_query('MERGE', episode=episode.uuid)
+
+        for entity in new_names:
+            node = EntityNode(name=entity, group_id=self.group_id, labels=['Entity'],
+                              created_at=now)
+            self._index(self.node_postings, len(self.nodes), entity)
+            self.nodes.append(node)
+            self.node_by_name[entity] = node
+            self.driver._driver.nodes[node.uuid] = node
+        if new_names:
+            self._node_vectors.append(vectors[:len(new_names)])
+
+        edges = []
+        for source_name, target_name, fact in facts:
+            source_node = self.node_by_name[source_name]
+            target_node = self.node_by_name[target_name]
+            edge = EntityEdge(
+                group_id=self.group_id, source_node_uuid=source_node.uuid,
+                target_node_uuid=target_node.uuid, name='RELATES_TO', fact=fact,
+                episodes=[episode.uuid],
+                valid_at=reference_time, created_at=now)
+            self._index(self.edge_postings, len(self.edges), fact)
+            self.edges.append(edge)
+            self.driver.add_edge(source_node.uuid, target_node.uuid)
+            edges.append(edge)
+        if facts:
+            self._edge_vectors.append(vectors[len(new_names):])
+        episode.entity_edges = [edge.uuid for edge in edges]
+
+        if new_names:
+            self._node_matrix = None
+        if edges:
+            self._edge_matrix = None
+        driver = self.driver._driver
+        driver.episodes += 1
+        driver.entities = len(self.nodes)
+        driver.edges = len(self.edges)
+        driver.latest_created_at_ms = int(now.timestamp() * 1000)
+
+        nodes = [self.node_by_name[entity] for entity in names]
+        return AddEpisodeResults(episode=episode, nodes=nodes, edges=edges)
+
+    async def add_episode_bulk(self, bulk_episodes, group_id: str = ''):
+        for raw in bulk_episodes:
+            await self.add_episode(
+                name=raw.name, episode_body=raw.content,
+                source_description=raw.source_description,
+                reference_time=raw.reference_time, source=raw.source)
+
+    async def search(self, query: str, center_node_uuid=None, group_ids=None,
+                     num_results: int = DEFAULT_SEARCH_LIMIT,
+                     search_filter=None) -> list[EntityEdge]:
+        vector = await self.embedder.create(query.replace('\n', ' '))
+        await self.driver.execute_query('MATCH', search_query=query)
+        self._edge_matrix = self._matrix(self._edge_matrix, self._edge_vectors)
+        ranked = self._hybrid(query, vector, self.edge_postings, self._edge_matrix,
+                              num_results * 2)
+        return [self.edges[i] for i in ranked[:num_results]]
+
+    async def _search(self, query: str, config, group_ids=None, center_node_uuid=None,
+                      bfs_origin_node_uuids=None, search_filter=None) -> SearchResults:
+        return await self.search_(query, config, group_ids, center_node_uuid,
+                                  bfs_origin_node_uuids, search_filter)
+
+    async def search_(self, query: str, config, group_ids=None, center_node_uuid=None,
+                      bfs_origin_node_uuids=None, search_filter=None) -> SearchResults:
+        vector = await self.embedder.create(query.replace('\n', ' '))
+        await self.driver.execute_query('MATCH', search_query=query)
+        self._node_matrix = self._matrix(self._node_matrix, self._node_vectors)
+        ranked = self._hybrid(query, vector, self.node_postings, self._node_matrix,
+                              config.limit * 2)
+        return SearchResults(
+            edges=[], nodes=[self.nodes[i] for i in ranked[:config.limit]],
+            episodes=[], communities=[])
+
+    async def close(self):
+        pass
+
+    @staticmethod
+    def _index(postings: dict[str, set[int]], row: int, text: str):
+        for token in set(tokenize(text)):
+            postings.setdefault(token, set()).add(row)
+
+    @staticmethod
+    def _matrix(matrix, vectors):
+        if matrix is None:
+            matrix = np.concatenate(vectors) if vectors else np.empty((0, 0), np.float32)
+            # Keep one block so the next rebuild only concatenates new rows
+            vectors[:] = [matrix]
+        return matrix
+
+    @staticmethod
+    def _hybrid(query: str, vector, postings, matrix, limit: int) -> list[int]:
+        """Fuse token-overlap and cosine rankings, like EDGE_HYBRID_SEARCH_RRF."""
+        overlap: dict[int, int] = {}
+        for token in set(tokenize(query)):
+            for row in postings.get(token, ()):
+                overlap[row] = overlap.get(row, 0) + 1
+        fulltext = sorted(overlap, key=lambda row: -overlap[row])[:limit]
+
+        similar = []
+        if len(matrix):
+            scores = matrix @ np.asarray(vector, dtype=np.float32)
+            top = min(limit, len(scores))
+            candidates = np.argpartition(-scores, top - 1)[:top]
+            similar = candidates[np.argsort(-scores[candidates])].tolist()
+        return rrf(fulltext, similar)
@@ -1,62 +1,1037 @@
+import asyncio
+import functools
+import hashlib
 import json
 import os
-from datetime import datetime, timezone
+import time
+import weakref
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Union
 
+import numpy as np
 from graphiti_core import Graphiti
-from graphiti_core.edges import EntityEdge
-from graphiti_core.nodes import EpisodeType
-from graphiti_core.search.search_config import SearchConfig
+from graphiti_core.edges import (
+    ENTITY_EDGE_RETURN,
+    EntityEdge,
+    get_entity_edge_from_record,
+)
+from graphiti_core.helpers import DEFAULT_DATABASE
+from graphiti_core.nodes import EntityNode, EpisodeType, EpisodicNode
+from graphiti_core.search.search import search
+from graphiti_core.search.search_config import (
+    DEFAULT_SEARCH_LIMIT,
+    SearchConfig,
+    SearchResults,
+)
+from graphiti_core.search.search_filters import SearchFilters
+from graphiti_core.search.search_utils import (
+    RELEVANT_SCHEMA_LIMIT,
+    edge_fulltext_search,
+    edge_similarity_search,
+    fulltext_query,
+    get_embeddings_for_edges,
+    get_embeddings_for_nodes,
+    node_distance_reranker,
+    node_fulltext_search,
+    node_similarity_search,
+)
+from graphiti_core.utils.bulk_utils import RawEpisode
 from graphiti_core.utils.maintenance import clear_data
-from graphiti_core.search.search_config_recipes import NODE_HYBRID_SEARCH_RRF
+from graphiti_core.search.search_config_recipes import (
+    EDGE_HYBRID_SEARCH_RRF,
+    NODE_HYBRID_SEARCH_RRF,
+)
+from ann_index import clear_epoch, get_ann_index, mark_cleared
+from answer_cache import get_answer_cache
+from graphiti_client import close_graphiti, get_graphiti, is_routed, is_shared, route_client
+from instrumentation import metrics
+from neighborhood_cache import get_neighborhood_cache
+import rerankers
+from search_cache import SearchCache, get_search_cache
+from temporal_index import get_validity_index
+
+SEARCH_RECIPES = {
+    'edge_hybrid_rrf': EDGE_HYBRID_SEARCH_RRF,
+    'node_hybrid_rrf': NODE_HYBRID_SEARCH_RRF,
+}
+RERANKERS = ('rrf', 'mmr', 'fusion')
+
+# Event loop -> group_id -> lock held while one of the group's episodes commits
+_group_locks = weakref.WeakKeyDictionary()
+
+
+@functools.lru_cache(maxsize=None)
+def recipe_config(recipe: str, limit: int) -> SearchConfig:
+    """Return a private copy of a search recipe with ``limit``, built once.
+
+    Graphiti's recipes are shared module objects (``Graphiti.search`` even
+    sets the limit on one), so each (recipe, limit) pair is copied the first
+    time it is used and must be treated as read-only afterwards.
+    """
+    config = SEARCH_RECIPES[recipe].model_copy(deep=True)
+    config.limit = limit
+    return config
+
+
+DEFAULT_EDGE_SEARCH_CONFIG = recipe_config('edge_hybrid_rrf', DEFAULT_SEARCH_LIMIT)
+
+# Just what the agent's search tool shows: no embeddings, episodes or
+# attributes, and dates rendered as strings by Neo4j
+FACT_PROJECTION = """
+        RETURN
+            e.uuid AS uuid,
+            e.fact AS fact,
+            toString(e.valid_at) AS valid_at,
+            toString(e.invalid_at) AS invalid_at,
+            startNode(e).uuid AS source_node_uuid"""
+
+FACT_FIELDS = ('uuid', 'fact', 'valid_at', 'invalid_at', 'source_node_uuid')
+
+# Facts valid at $as_of; open-ended bounds count as unbounded. The IS NULL
+# alternatives rule out a range index seek, so this filters the edges the
+# query already matched (fulltext hits, a center node's edges, or a scan).
+VALID_AS_OF = """
+    (e.valid_at IS NULL OR e.valid_at <= $as_of)
+    AND (e.invalid_at IS NULL OR e.invalid_at > $as_of)"""
+
+
+@dataclass
+class QueryResult:
+    """Results and timing for one query of a ``search_many`` batch."""
+    query: str
+    results: SearchResults
+    seconds: float
+
+
+@dataclass
+class GraphStats:
+    """Counts of what is loaded in the graph."""
+    episodes: int
+    entities: int
+    edges: int
+    latest_created_at_ms: Union[int, None]
+
+
+def episode_body(episode) -> str:
+    """Return the episode content as the string Graphiti expects."""
+    if isinstance(episode['content'], str):
+        return episode['content']
+    return json.dumps(episode['content'])
+
+
+def chunk_episodes(episodes, chunk_size, max_chunk_chars, start=0):
+    """Yield ``(start_index, chunk)`` pairs bounded by count and content size."""
+    chunk, chunk_start, chunk_chars = [], start, 0
+    for i in range(start, len(episodes)):
+        size = len(episode_body(episodes[i]))
+        if chunk and (len(chunk) >= chunk_size
+                      or chunk_chars + size > max_chunk_chars):
+            yield chunk_start, chunk
+            chunk, chunk_start, chunk_chars = [], i, 0
+        chunk.append(episodes[i])
+        chunk_chars += size
+    if chunk:
+        yield chunk_start, chunk
+
+
+def load_checkpoint(path) -> dict:
+    """Load the per-prefix ingestion checkpoint, if any."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, checkpoint: dict):
+    """Atomically persist the ingestion checkpoint."""
+    if not path:
+        return
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def update_fingerprint(digest, episodes):
+    """Fold the content, type and description of ``episodes`` into ``digest``."""
+    for episode in episodes:
+        digest.update(json.dumps(
+            [episode_body(episode), episode['type'].value, episode['description']]
+        ).encode())
+    return digest
+
+
+def as_utc(moment: datetime) -> datetime:
+    """Treat naive datetimes as UTC, like Graphiti stores them."""
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def parse_episode(record: dict, description: str = 'api') -> dict:
+    """Turn a JSON episode record into the dict shape ``add_episodes`` ingests.
+
+    ``type`` names an ``EpisodeType`` (text when the content is a string,
+    json otherwise) and ``reference_time`` is an ISO 8601 string or epoch
+    seconds, read as UTC when it carries no offset. An optional
+    ``group_id`` puts the episode in that group.
+    """
+    content = record['content']
+    kind = record.get('type') or ('text' if isinstance(content, str) else 'json')
+    episode = {
+        'content': content,
+        'type': EpisodeType(str(kind).lower()),
+        'description': record.get('description') or description,
+    }
+    reference_time = record.get('reference_time')
+    if isinstance(reference_time, (int, float)):
+        episode['reference_time'] = datetime.fromtimestamp(reference_time, timezone.utc)
+    elif reference_time:
+        episode['reference_time'] = as_utc(datetime.fromisoformat(reference_time))
+    if record.get('group_id'):
+        episode['group_id'] = str(record['group_id'])
+    return episode
+
+
+def edge_where(as_of: Union[datetime, None], group_ids: Union[List[str], None]) -> str:
+    """WHERE clause over the edge ``e`` for the validity and group filters."""
+    conditions = [VALID_AS_OF] if as_of is not None else []
+    if group_ids:
+        conditions.append('e.group_id IN $group_ids')
+    return 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+
+
+async def fulltext_edge_records(driver, query: str, limit: int = DEFAULT_SEARCH_LIMIT,
+                                as_of: Union[datetime, None] = None,
+                                group_ids: Union[List[str], None] = None,
+                                projection: str = ENTITY_EDGE_RETURN) -> list:
+    """Edges matching ``query`` in the fulltext index, best first, as raw records."""
+    lucene_query = fulltext_query(query, group_ids)
+    if not lucene_query:
+        return []
+    records, _, _ = await driver.execute_query(
+        f"""
+        CALL db.index.fulltext.queryRelationships("edge_name_and_fact", $query)
+        YIELD relationship AS e, score
+        {edge_where(as_of, group_ids)}
+        WITH e, score ORDER BY score DESC LIMIT $limit
+        """
+        + projection + ', score ORDER BY score DESC',
+        query=lucene_query,
+        as_of=as_utc(as_of) if as_of else None,
+        group_ids=group_ids,
+        limit=limit,
+        database_=DEFAULT_DATABASE,
+        routing_='r',
+    )
+    return records
+
+
+def fuse_rankings(rankings: List[List[str]], limit: int) -> List[str]:
+    """Fuse ranked uuid lists with RRF and return the ``limit`` best uuids."""
+    if not any(rankings):
+        return []
+    pools, ranks, mask = rerankers.build_pools([rankings])
+    best = rerankers.top_k(rerankers.rrf(ranks), mask, limit)[0]
+    return [pools[0][c] for c in best]
+
+
+async def hybrid_edge_records(driver, query: str, query_vector: List[float],
+                              limit: int = DEFAULT_SEARCH_LIMIT,
+                              as_of: Union[datetime, None] = None,
+                              group_ids: Union[List[str], None] = None,
+                              projection: str = ENTITY_EDGE_RETURN) -> list:
+    """Fulltext and vector edge search fused with RRF, as raw records.
+
+    ``projection`` is the RETURN clause over the edge ``e``, so callers can
+    fetch only the columns they need. With ``as_of`` the validity predicate
+    runs inside both queries, so each returns up to ``limit`` valid facts
+    instead of top hits that are filtered afterwards.
+    """
+    where = edge_where(as_of, group_ids)
+    params = dict(as_of=as_utc(as_of) if as_of else None, group_ids=group_ids,
+                  limit=limit, database_=DEFAULT_DATABASE, routing_='r')
+
+    async def fulltext():
+        return await fulltext_edge_records(
+            driver, query, limit, as_of, group_ids, projection)
+
+    async def similarity():
+        records, _, _ = await driver.execute_query(
+            f"""
+            MATCH ()-[e:RELATES_TO]->()
+            {where}
+            WITH e, vector.similarity.cosine(e.fact_embedding, $search_vector) AS score
+            WHERE score > $min_score
+            WITH e, score ORDER BY score DESC LIMIT $limit
+            """
+            + projection + ', score ORDER BY score DESC',
+            search_vector=query_vector,
+            min_score=EDGE_HYBRID_SEARCH_RRF.edge_config.sim_min_score,
+            **params,
+        )
+        return records
+
+    rankings = await asyncio.gather(fulltext(), similarity())
+    by_uuid = {record['uuid']: record for records in rankings for record in records}
+    best = fuse_rankings(
+        [[record['uuid'] for record in records] for records in rankings], limit)
+    return [by_uuid[uuid] for uuid in best]
+
+
+async def temporal_edge_search(driver, query: str, query_vector: List[float],
+                               as_of: datetime, limit: int = DEFAULT_SEARCH_LIMIT,
+                               group_ids: Union[List[str], None] = None) -> List[EntityEdge]:
+    """Hybrid edge search over the facts valid at ``as_of``."""
+    records = await hybrid_edge_records(
+        driver, query, query_vector, limit, as_of, group_ids)
+    return [get_entity_edge_from_record(record) for record in records]
+
+
+async def fact_records(driver, uuids: List[str]) -> list:
+    """Fetch the lean fact projection of edges by uuid, in ``uuids`` order."""
+    records, _, _ = await driver.execute_query(
+        """
+        MATCH ()-[e:RELATES_TO]->() WHERE e.uuid IN $uuids
+        """
+        + FACT_PROJECTION,
+        uuids=uuids,
+        database_=DEFAULT_DATABASE,
+        routing_='r',
+    )
+    order = {uuid: rank for rank, uuid in enumerate(uuids)}
+    return sorted(records, key=lambda record: order[record['uuid']])
+
+
+async def existing_episodes(driver, names: List[str], group_id: str) -> Dict[str, str]:
+    """Map the names of the group's episodes already in the graph to their content."""
+    records, _, _ = await driver.execute_query(
+        """
+        MATCH (e:Episodic) WHERE e.name IN $names AND e.group_id = $group_id
+        RETURN e.name AS name, e.content AS content
+        """,
+        names=names,
+        group_id=group_id,
+        database_=DEFAULT_DATABASE,
+        routing_='r',
+    )
+    return {record['name']: record['content'] for record in records}
+
+
+async def center_node_edges(driver, center_node_uuid: str, limit: int,
+                            as_of: Union[datetime, None] = None) -> List[EntityEdge]:
+    """Return up to ``limit`` edges incident to the center node."""
+    records, _, _ = await driver.execute_query(
+        f"""
+        MATCH (n:Entity {{uuid: $center_uuid}})-[e:RELATES_TO]-(m:Entity)
+        {'WHERE ' + VALID_AS_OF if as_of else ''}
+        WITH e LIMIT $limit
+        """
+        + ENTITY_EDGE_RETURN,
+        center_uuid=center_node_uuid,
+        as_of=as_utc(as_of) if as_of else None,
+        limit=limit,
+        database_=DEFAULT_DATABASE,
+        routing_='r',
+    )
+    return [get_entity_edge_from_record(record) for record in records]
+
+
+async def rerank_by_node_distance(driver, edges: List[EntityEdge],
+                                  center_node_uuid: str,
+                                  neighborhoods=None) -> List[EntityEdge]:
+    """Order edges by their source node's distance to the center node.
+
+    Mirrors Graphiti's node distance reranker but reuses the given candidates,
+    so only one batched shortest-path query runs and nothing is re-embedded.
+    With a ``NeighborhoodCache`` the distances inside a hot center's snapshot
+    need no query at all.
+    """
+    edge_uuid_map = {}
+    source_to_edges: Dict[str, List[EntityEdge]] = {}
+    for edge in edges:
+        if edge.uuid in edge_uuid_map:
+            continue
+        edge_uuid_map[edge.uuid] = edge
+        source_to_edges.setdefault(edge.source_node_uuid, []).append(edge)
+
+    with metrics.span('rerank.node_distance'):
+        if neighborhoods is not None:
+            reranked_node_uuids = await neighborhoods.rerank(
+                driver, list(source_to_edges), center_node_uuid)
+        else:
+            reranked_node_uuids = await node_distance_reranker(
+                driver, list(source_to_edges), center_node_uuid)
+
+    return [edge for node_uuid in reranked_node_uuids
+            for edge in source_to_edges[node_uuid]]
+
+
+def group_lock(group_id: str) -> asyncio.Lock:
+    """Return the lock serializing episode commits to ``group_id``.
+
+    Locks are kept per event loop, since an asyncio lock binds to the loop
+    that first waits on it.
+    """
+    locks = _group_locks.setdefault(asyncio.get_running_loop(), {})
+    lock = locks.get(group_id)
+    if lock is None:
+        lock = locks[group_id] = asyncio.Lock()
+    return lock
+
+
+def local_indexes(graphiti: Graphiti) -> bool:
+    """The process-wide ANN and validity indexes only mirror the default route."""
+    return not is_routed(graphiti)
 
 
 class Connection:
-    def __init__(self):
-        neo4j_uri = os.environ.get("NEO4J_URI", "bolt://localhost:7687")
-        neo4j_user = os.environ.get("NEO4J_USER", "neo4j")
-        neo4j_password = os.environ.get("NEO4J_PASSWORD", "password")
+    def __init__(self, graphiti: Graphiti | None = None, group_id: str | None = None):
+        # Borrow the process-wide client unless one is injected; a group in
+        # GROUP_ROUTES gets its routed client either way
+        self.graphiti = route_client(graphiti, group_id) if graphiti is not None \
+            else get_graphiti(group_id)
+        # Scopes ingestion, search, stats and clearing; None means all groups
+        self.group_id = group_id
+        self.group_ids = [group_id] if group_id is not None else None
+        # Shared with the agent tool; writes through Connection invalidate it
+        self.search_cache = get_search_cache()
+        local = local_indexes(self.graphiti)
+        # Optional local first-stage retriever (ANN_INDEX)
+        self.ann_index = get_ann_index() if local else None
+        # Optional in-memory validity intervals for as_of searches (TEMPORAL_INDEX)
+        self.validity_index = get_validity_index() if local else None
+        # Optional snapshots of hot center nodes' neighborhoods (NEIGHBORHOOD_CACHE)
+        self.neighborhood_cache = get_neighborhood_cache() if local else None
 
-        if not neo4j_uri or not neo4j_user or not neo4j_password:
-            raise ValueError(
-                "NEO4J_URI, NEO4J_USER, and NEO4J_PASSWORD must be set")
+    async def add_episodes(graphiti, episodes, prefix="LLM Evolution", concurrency=1,
+                           start_index=0, group_id=None, on_added=None,
+                           return_exceptions=False, indices=None):
+        """Add episodes to the graph with a given prefix.
 
-        self.graphiti = Graphiti(neo4j_uri, neo4j_user, neo4j_password)
+        Graphiti resolves every episode against the group's graph and its
+        previous episodes, so a group's episodes commit one at a time in
+        reference-time order, and other callers adding to the same group wait
+        their turn. LLM extraction reads no graph state, so it runs up to
+        ``concurrency`` episodes ahead of the commits, with the batch's
+        earlier episodes as context. Groups are ingested in parallel.
+        Reference times are assigned up front in input order (or taken from
+        an episode's ``reference_time``). Episodes go into ``group_id``
+        unless they carry a ``group_id`` of their own, through the group's
+        client if GROUP_ROUTES routes it. ``on_added`` is awaited with
+        ``[episode]`` as soon as each episode has committed. Episodes are
+        named ``"{prefix} {start_index + i}"``, or by their entry in
+        ``indices`` when given, e.g. their positions in an unfiltered list.
 
-    async def add_episodes(graphiti, episodes, prefix="LLM Evolution"):
-        """Add episodes to the graph with a given prefix."""
+        A failed episode stops the rest of its group, and the first error is
+        raised once every other group has finished. With
+        ``return_exceptions`` the group carries on instead, and the error
+        takes the episode's place in the returned list.
+        """
+        base_time = datetime.now(timezone.utc)
+        reference_times = [
+            episode.get('reference_time') or base_time + timedelta(microseconds=i)
+            for i, episode in enumerate(episodes)
+        ]
+        groups: Dict[str, List[int]] = {}
         for i, episode in enumerate(episodes):
-            await graphiti.add_episode(
-                name=f'{prefix} {i}',
-                episode_body=episode['content']
-                if isinstance(episode['content'], str)
-                else json.dumps(episode['content']),
+            groups.setdefault(episode.get('group_id') or group_id or '', []).append(i)
+        numbers = indices if indices is not None \
+            else range(start_index, start_index + len(episodes))
+        window = max(1, concurrency)
+        extract_slots = asyncio.Semaphore(window)
+        timings = [0.0] * len(episodes)
+        results = [None] * len(episodes)
+
+        def episode_node(i, episode_group):
+            episode = episodes[i]
+            return EpisodicNode(
+                name=f'{prefix} {numbers[i]}',
+                group_id=episode_group,
+                labels=[],
                 source=episode['type'],
+                content=episode_body(episode),
                 source_description=episode['description'],
-                reference_time=datetime.now(timezone.utc),
+                created_at=base_time,
+                valid_at=reference_times[i],
             )
-            print(f'Added episode: {prefix} {i} ({episode["type"].value})')
 
-    async def hybrid_search(self, query: str):
+        async def extract(client, node, pending):
+            # Clients without the split (a plain Graphiti) extract on commit
+            if not hasattr(client, 'extract_episode'):
+                return None
+            async with extract_slots:
+                return await client.extract_episode(node, pending)
+
+        async def commit(client, node, extracted):
+            if extracted is None:
+                return await client.add_episode(
+                    name=node.name,
+                    episode_body=node.content,
+                    source=node.source,
+                    source_description=node.source_description,
+                    reference_time=node.valid_at,
+                    group_id=node.group_id,
+                )
+            return await client.commit_episode(extracted)
+
+        async def add_episode(i, client, node, extraction):
+            start = time.perf_counter()
+            extracted = await extraction
+            async with group_lock(node.group_id):
+                result = await commit(client, node, extracted)
+            # Extraction that overlapped earlier commits is not counted
+            timings[i] = time.perf_counter() - start
+            metrics.observe('ingest.episode', timings[i])
+            local = local_indexes(client)
+            get_search_cache().invalidate()
+            ann_index = get_ann_index() if local else None
+            if ann_index is not None and result is not None:
+                ann_index.add_results(result)
+            validity_index = get_validity_index() if local else None
+            if validity_index is not None and result is not None:
+                # Includes older facts this episode invalidated
+                validity_index.add_edges(result.edges)
+            neighborhood_cache = get_neighborhood_cache() if local else None
+            if neighborhood_cache is not None and result is not None:
+                neighborhood_cache.add_results(result)
+            answer_cache = get_answer_cache()
+            if answer_cache is not None and result is not None:
+                # Answers built on facts this episode invalidated are stale
+                answer_cache.invalidate_edges(result.edges)
+            print(
+                f'Added episode: {node.name} ({episodes[i]["type"].value}) '
+                f'in {timings[i]:.2f}s')
+            return result
+
+        async def add_group(episode_group, indices):
+            client = route_client(graphiti, episode_group)
+            order = sorted(indices, key=lambda i: as_utc(reference_times[i]))
+            nodes = {i: episode_node(i, episode_group) for i in order}
+            extractions = {}
+
+            def extract_ahead(position):
+                for ahead in range(position, min(position + window, len(order))):
+                    i = order[ahead]
+                    if i in extractions:
+                        continue
+                    earlier = order[max(0, ahead - RELEVANT_SCHEMA_LIMIT):ahead]
+                    pending = [nodes[j] for j in earlier
+                               if not isinstance(results[j], Exception)]
+                    extractions[i] = asyncio.ensure_future(
+                        extract(client, nodes[i], pending))
+
+            try:
+                for position, i in enumerate(order):
+                    extract_ahead(position)
+                    try:
+                        results[i] = await add_episode(
+                            i, client, nodes[i], extractions.pop(i))
+                    except Exception as e:
+                        if not return_exceptions:
+                            raise
+                        print(f'Failed to add episode: {nodes[i].name}: {str(e)}')
+                        results[i] = e
+                        continue
+                    if on_added is not None:
+                        await on_added([episodes[i]])
+            finally:
+                # A stopped group drops the extractions it ran ahead with
+                for extraction in extractions.values():
+                    extraction.cancel()
+                await asyncio.gather(*extractions.values(), return_exceptions=True)
+
+        start = time.perf_counter()
+        # Let every group finish, so no ingestion keeps running after an error
+        errors = [error for error in await asyncio.gather(
+            *(add_group(g, indices) for g, indices in groups.items()),
+            return_exceptions=True) if error is not None]
+        if errors:
+            raise errors[0]
+        elapsed = time.perf_counter() - start
+
+        if episodes:
+            print(
+                f'Ingested {len(episodes)} episodes in {elapsed:.2f}s '
+                f'({len(episodes) / elapsed:.2f} episodes/s, '
+                f'mean {sum(timings) / len(timings):.2f}s, '
+                f'max {max(timings):.2f}s, concurrency {concurrency})')
+        return results
+
+    async def add_bulk_episodes(graphiti, episodes, prefix="LLM Evolution",
+                                chunk_size=20, max_chunk_chars=20000,
+                                checkpoint_path=".ingest_checkpoint.json", group_id=None,
+                                on_added=None, indices=None):
+        """Add episodes through Graphiti's bulk path in size-tuned chunks.
+
+        A chunk closes once it holds ``chunk_size`` episodes or
+        ``max_chunk_chars`` characters of content. A chunk that fails in bulk
+        is retried through the per-episode path, skipping the episodes it had
+        already committed (same name and content). Progress is recorded per
+        group and prefix in ``checkpoint_path`` after every chunk, along with
+        a fingerprint of the episodes it covers, so a crashed load of the
+        same episodes resumes after the last committed chunk; a checkpoint
+        whose fingerprint does not match ``episodes`` is ignored. Every
+        episode goes into ``group_id``, through the group's client if
+        GROUP_ROUTES routes it. ``on_added`` is awaited with each chunk's
+        episodes once they commit. Episodes are named by their position in
+        ``episodes``, or by their entry in ``indices`` when given.
+        """
+        graphiti = route_client(graphiti, group_id)
+        local = local_indexes(graphiti)
+        checkpoint = load_checkpoint(checkpoint_path)
+        # The same episodes may be loaded into several groups
+        key = f'{group_id}/{prefix}' if group_id else prefix
+        progress = checkpoint.get(key)
+        start, fingerprint = 0, hashlib.sha256()
+        if isinstance(progress, dict):
+            covered = update_fingerprint(hashlib.sha256(), episodes[:progress['done']])
+            if covered.hexdigest() == progress['fingerprint']:
+                start, fingerprint = progress['done'], covered
+        if start:
+            print(f'Resuming {prefix} from episode {start}')
+        elif progress is not None:
+            print(f'Ignoring the {prefix} checkpoint: it was taken over other episodes')
+
+        numbers = indices if indices is not None else range(len(episodes))
+        base_time = datetime.now(timezone.utc)
+        for chunk_start, chunk in chunk_episodes(
+                episodes, chunk_size, max_chunk_chars, start):
+            raw_episodes = [
+                RawEpisode(
+                    name=f'{prefix} {numbers[chunk_start + i]}',
+                    content=episode_body(episode),
+                    source=episode['type'],
+                    source_description=episode['description'],
+                    reference_time=episode.get('reference_time')
+                    or base_time + timedelta(microseconds=chunk_start + i),
+                )
+                for i, episode in enumerate(chunk)
+            ]
+            try:
+                with metrics.span('ingest.bulk_chunk'):
+                    await graphiti.add_episode_bulk(raw_episodes, group_id=group_id or '')
+                get_search_cache().invalidate()
+                ann_index = get_ann_index() if local else None
+                if ann_index is not None:
+                    # The bulk path returns nothing, so catch up from the graph
+                    await ann_index.sync(graphiti.driver)
+                validity_index = get_validity_index() if local else None
+                if validity_index is not None:
+                    validity_index.invalidate()
+                neighborhood_cache = get_neighborhood_cache() if local else None
+                if neighborhood_cache is not None:
+                    neighborhood_cache.invalidate()
+                print(
+                    f'Added episodes: {raw_episodes[0].name}-'
+                    f'{numbers[chunk_start + len(chunk) - 1]} (bulk)')
+                if on_added is not None:
+                    await on_added(chunk)
+            except Exception as e:
+                print(
+                    f'Bulk add failed for {raw_episodes[0].name}: {str(e)}; '
+                    'falling back to per-episode ingestion')
+                # The failed call may have committed part of the chunk
+                existing = await existing_episodes(
+                    graphiti.driver, [raw.name for raw in raw_episodes], group_id or '')
+                for i, (episode, raw) in enumerate(zip(chunk, raw_episodes)):
+                    if existing.get(raw.name) == raw.content:
+                        print(f'Skipping {raw.name}: already in the graph')
+                        continue
+                    await Connection.add_episodes(
+                        graphiti, [dict(episode, reference_time=raw.reference_time)],
+                        prefix, group_id=group_id, on_added=on_added,
+                        indices=[numbers[chunk_start + i]])
+
+            checkpoint[key] = {
+                'done': chunk_start + len(chunk),
+                'fingerprint': update_fingerprint(fingerprint, chunk).hexdigest(),
+            }
+            save_checkpoint(checkpoint_path, checkpoint)
+
+        # A finished load must not make the next full load skip episodes
+        checkpoint.pop(key, None)
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    async def search_edges(self, query: str, num_results: int = DEFAULT_SEARCH_LIMIT,
+                           center_node_uuid: Union[str, None] = None,
+                           reranker: Union[str, None] = None,
+                           as_of: Union[datetime, None] = None) -> List[EntityEdge]:
+        """Cached hybrid edge search without printing, for services.
+
+        With the ANN index enabled, plain searches take their candidates from
+        the local index and only hydrate the top hits from Neo4j. ``reranker``
+        ('rrf', 'mmr' or 'fusion') reranks with the NumPy rerankers instead.
+        ``as_of`` only returns facts valid at that instant. Every path is
+        restricted to the connection's group.
+        """
+        if as_of is not None:
+            search_fn = lambda: self.search_edges_as_of(
+                query, as_of, num_results, center_node_uuid)
+        elif reranker is not None and center_node_uuid is None:
+            search_fn = lambda: self._fused_one(query, 'edges', reranker, num_results)
+        elif self.ann_index is not None and center_node_uuid is None:
+            search_fn = lambda: self.ann_search_edges(query, num_results)
+        else:
+            search_fn = lambda: self.graphiti.search(
+                query, center_node_uuid=center_node_uuid, group_ids=self.group_ids,
+                num_results=num_results)
+        with metrics.span('search.edges'):
+            return await self.search_cache.get_or_search(
+                SearchCache.make_key(
+                    query, center_node_uuid=center_node_uuid, num_results=num_results,
+                    reranker=reranker, as_of=as_of, group_ids=self.group_ids),
+                search_fn,
+            )
+
+    async def ann_search_edges(self, query: str,
+                               num_results: int = DEFAULT_SEARCH_LIMIT) -> List[EntityEdge]:
+        """Edge facts from the local ANN index and fulltext, hydrated from Neo4j."""
+        return await self._ann_edges(
+            query, num_results, None, self._hydrate_edges, lambda edge: edge.uuid)
+
+    async def _ann_edges(self, query: str, num_results: int,
+                         as_of: Union[datetime, None], fetch, uuid_of) -> list:
+        """Fetch the fused ANN edge hits with ``fetch(uuids)``.
+
+        Hits the graph no longer has (deleted since the index last synced)
+        are dropped from the index, and the search runs once more to fill
+        their places.
+        """
+        for _ in range(2):
+            uuids = await self._ann_edge_uuids(query, num_results, as_of)
+            found = await fetch(uuids) if uuids else []
+            ghosts = set(uuids) - {uuid_of(item) for item in found}
+            if not ghosts:
+                break
+            self.ann_index.edges.remove(list(ghosts))
+        return found
+
+    async def _ann_edge_uuids(self, query: str, num_results: int,
+                              as_of: Union[datetime, None] = None) -> List[str]:
+        """ANN edge hits fused with the fulltext ranking by RRF, best first.
+
+        The ANN index only ranks by embedding similarity, so the fulltext
+        query runs alongside it, as in ``hybrid_edge_records``. With
+        ``as_of`` both only consider facts valid at that instant.
+        """
+        driver = self.graphiti.driver
+        await self.ann_index.ensure_synced(driver)
+        if as_of is not None:
+            await self.validity_index.ensure_loaded(driver)
+
+        async def nearest():
+            vector = await self.graphiti.embedder.create(query.replace('\n', ' '))
+            with metrics.span('search.ann'):
+                valid = self.validity_index.ann_rows(as_of, self.ann_index.edges) \
+                    if as_of is not None else None
+                hits = self.ann_index.edges.search(
+                    vector, num_results, self.group_ids, rows=valid)
+            return [uuid for uuid, _ in hits]
+
+        async def fulltext():
+            records = await fulltext_edge_records(
+                driver, query, num_results, as_of, self.group_ids,
+                projection='RETURN e.uuid AS uuid')
+            return [record['uuid'] for record in records]
+
+        rankings = await asyncio.gather(nearest(), fulltext())
+        return fuse_rankings(list(rankings), num_results)
+
+    async def search_edges_as_of(self, query: str, as_of: datetime,
+                                 num_results: int = DEFAULT_SEARCH_LIMIT,
+                                 center_node_uuid: Union[str, None] = None) -> List[EntityEdge]:
+        """Hybrid edge search restricted to facts valid at ``as_of``.
+
+        With both the ANN and the validity index enabled this runs in
+        process; otherwise the validity filter is pushed down into Neo4j.
+        """
+        driver = self.graphiti.driver
+        with metrics.span('search.as_of'):
+            if self.ann_index is not None and self.validity_index is not None:
+                edges = await self._ann_edges(
+                    query, num_results, as_of, self._hydrate_edges,
+                    lambda edge: edge.uuid)
+            else:
+                vector = await self.graphiti.embedder.create(query.replace('\n', ' '))
+                edges = await temporal_edge_search(
+                    driver, query, vector, as_of, num_results, self.group_ids)
+        if center_node_uuid is not None:
+            edges = await rerank_by_node_distance(
+                driver, edges, center_node_uuid, self.neighborhood_cache)
+        return edges
+
+    async def search_facts(self, query: str, num_results: int = DEFAULT_SEARCH_LIMIT,
+                           as_of: Union[datetime, None] = None) -> List[dict]:
+        """Cached hybrid fact search returning the lean ``FACT_PROJECTION``.
+
+        Each result is a plain dict of uuid, fact, valid_at, invalid_at (ISO
+        strings or None) and source_node_uuid, built straight from the
+        driver records without EntityEdge models.
+        """
+        async def search_fn():
+            driver = self.graphiti.driver
+            if self.ann_index is not None and (as_of is None or self.validity_index is not None):
+                records = await self._ann_edges(
+                    query, num_results, as_of, functools.partial(fact_records, driver),
+                    lambda record: record['uuid'])
+            else:
+                vector = await self.graphiti.embedder.create(query.replace('\n', ' '))
+                records = await hybrid_edge_records(
+                    driver, query, vector, num_results, as_of, self.group_ids,
+                    projection=FACT_PROJECTION)
+            return [{key: record[key] for key in FACT_FIELDS} for record in records]
+
+        with metrics.span('search.facts'):
+            return await self.search_cache.get_or_search(
+                SearchCache.make_key(
+                    query, 'facts', num_results=num_results, as_of=as_of,
+                    group_ids=self.group_ids),
+                search_fn,
+            )
+
+    async def _hydrate_edges(self, uuids: List[str]) -> List[EntityEdge]:
+        edges = await EntityEdge.get_by_uuids(self.graphiti.driver, uuids) if uuids else []
+        order = {uuid: rank for rank, uuid in enumerate(uuids)}
+        return sorted(edges, key=lambda edge: order[edge.uuid])
+
+    async def _hydrate_nodes(self, uuids: List[str]) -> List[EntityNode]:
+        if self.neighborhood_cache is not None:
+            return await self.neighborhood_cache.hydrate_nodes(self.graphiti.driver, uuids)
+        return await EntityNode.get_by_uuids(self.graphiti.driver, uuids)
+
+    async def ann_search_nodes(self, query: str, limit: int = 5) -> SearchResults:
+        """Entities from the local ANN index and fulltext, fused by RRF."""
+        driver = self.graphiti.driver
+        await self.ann_index.ensure_synced(driver)
+
+        async def nearest():
+            vector = await self.graphiti.embedder.create(query.replace('\n', ' '))
+            with metrics.span('search.ann'):
+                return self.ann_index.nodes.search(vector, limit, self.group_ids)
+
+        for _ in range(2):
+            hits, matches = await asyncio.gather(
+                nearest(),
+                node_fulltext_search(driver, query, SearchFilters(), self.group_ids, limit))
+            uuids = fuse_rankings(
+                [[uuid for uuid, _ in hits], [node.uuid for node in matches]], limit)
+            # Fulltext matches come back whole; only the ANN-only hits need fetching
+            by_uuid = {node.uuid: node for node in matches if node.uuid in uuids}
+            missing = [uuid for uuid in uuids if uuid not in by_uuid]
+            if missing:
+                by_uuid.update(
+                    (node.uuid, node) for node in await self._hydrate_nodes(missing))
+            # Hits deleted since the index last synced; search again without them
+            ghosts = [uuid for uuid in missing if uuid not in by_uuid]
+            if not ghosts:
+                break
+            self.ann_index.nodes.remove(ghosts)
+        nodes = [by_uuid[uuid] for uuid in uuids if uuid in by_uuid]
+        return SearchResults(edges=[], nodes=nodes, episodes=[], communities=[])
+
+    async def search_nodes(self, query: str, limit: int = 5,
+                           reranker: Union[str, None] = None) -> SearchResults:
+        """Cached NODE_HYBRID_SEARCH_RRF node search without printing."""
+        # Use a predefined search configuration recipe with the given limit
+        node_search_config = recipe_config('node_hybrid_rrf', limit)
+
+        if reranker is not None:
+            async def search_fn():
+                nodes = await self._fused_one(query, 'nodes', reranker, limit)
+                return SearchResults(edges=[], nodes=nodes, episodes=[], communities=[])
+        elif self.ann_index is not None:
+            search_fn = lambda: self.ann_search_nodes(query, limit)
+        else:
+            search_fn = lambda: self.graphiti._search(
+                query=query,
+                config=node_search_config,
+                group_ids=self.group_ids,
+            )
+        with metrics.span('search.nodes'):
+            return await self.search_cache.get_or_search(
+                SearchCache.make_key(query, f'node_hybrid_rrf:{limit}', reranker=reranker,
+                                     group_ids=self.group_ids),
+                search_fn)
+
+    async def hybrid_search(self, query: str, reranker: Union[str, None] = None,
+                            as_of: Union[datetime, None] = None):
         try:
-            results = await self.graphiti.search(query)
+            results = await self.search_edges(query, reranker=reranker, as_of=as_of)
             # Print search results
-            print('\nSearch Results:')
-            for result in results:
-                print(f'UUID: {result.uuid}')
-                print(f'Fact: {result.fact}')
-                if hasattr(result, 'valid_at') and result.valid_at:
-                    print(f'Valid from: {result.valid_at}')
-                if hasattr(result, 'invalid_at') and result.invalid_at:
-                    print(f'Valid until: {result.invalid_at}')
-                print('---')
-                return results
+            with metrics.span('format.results'):
+                print('\nSearch Results:')
+                for result in results:
+                    print(f'UUID: {result.uuid}')
+                    print(f'Fact: {result.fact}')
+                    if hasattr(result, 'valid_at') and result.valid_at:
+                        print(f'Valid from: {result.valid_at}')
+                    if hasattr(result, 'invalid_at') and result.invalid_at:
+                        print(f'Valid until: {result.invalid_at}')
+                    print('---')
+            return results
         finally:
             print("\nSearch Complete !!")
 
-    async def center_node_search(self, query: str, results: list[EntityEdge]):
+    async def search_many(self, queries: List[str],
+                          configs: Union[SearchConfig, List[SearchConfig], None] = None,
+                          concurrency: int = 10) -> List[QueryResult]:
+        """Run many searches with one batched embedding request.
+
+        ``configs`` is a single config for every query or one per query and
+        defaults to the edge hybrid search used by ``hybrid_search``. The
+        per-query Neo4j searches run concurrently on the shared pool, at most
+        ``concurrency`` at a time. Results are aligned with ``queries``.
+        """
+        if configs is None or isinstance(configs, SearchConfig):
+            configs = [configs or DEFAULT_EDGE_SEARCH_CONFIG] * len(queries)
+        if len(configs) != len(queries):
+            raise ValueError('configs must be a single config or one per query')
+
+        # Blank queries short-circuit in Graphiti and need no embedding
+        texts = [query.replace('\n', ' ') for query in queries]
+        to_embed = [i for i, text in enumerate(texts) if text.strip()]
+        vectors: List[Union[List[float], None]] = [None] * len(queries)
+
+        start = time.perf_counter()
+        if to_embed:
+            embedded = await self.graphiti.embedder.create_batch(
+                [texts[i] for i in to_embed])
+            for i, vector in zip(to_embed, embedded):
+                vectors[i] = vector
+        embedding_seconds = time.perf_counter() - start
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run(i):
+            async with semaphore:
+                query_start = time.perf_counter()
+                results = await search(
+                    self.graphiti.clients,
+                    queries[i],
+                    self.group_ids,
+                    configs[i],
+                    SearchFilters(),
+                    query_vector=vectors[i],
+                )
+                seconds = time.perf_counter() - query_start
+                metrics.observe('search.many.query', seconds)
+                return QueryResult(query=queries[i], results=results, seconds=seconds)
+
+        query_results = await asyncio.gather(*(run(i) for i in range(len(queries))))
+        print(
+            f'Ran {len(queries)} searches: embedding {embedding_seconds:.2f}s, '
+            f'total {time.perf_counter() - start:.2f}s')
+        return list(query_results)
+
+    async def fused_search_many(self, queries: List[str], scope: str = 'edges',
+                                reranker: str = 'rrf', limit: int = DEFAULT_SEARCH_LIMIT,
+                                pool_size: Union[int, None] = None,
+                                mmr_lambda: float = rerankers.DEFAULT_MMR_LAMBDA,
+                                fusion_weights: tuple = (0.5, 0.5),
+                                group_ids: Union[List[str], None] = None,
+                                concurrency: int = 10) -> List[list]:
+        """Hybrid searches reranked for all queries in one NumPy pass.
+
+        Fulltext and vector candidates (``pool_size`` each, default twice the
+        limit as Graphiti uses) are fetched concurrently for every query with
+        one batched embedding request, then reranked together with
+        ``reranker``: 'rrf', 'mmr' or 'fusion' (weighted RRF and cosine
+        similarity). ``scope`` is 'edges' or 'nodes'. Returns the top
+        ``limit`` edges or nodes per query, aligned with ``queries``.
+        ``group_ids`` defaults to the connection's group.
+        """
+        if reranker not in RERANKERS:
+            raise ValueError(f'reranker must be one of {", ".join(RERANKERS)}')
+        if scope not in ('edges', 'nodes'):
+            raise ValueError("scope must be 'edges' or 'nodes'")
+        pool_size = pool_size or 2 * limit
+        group_ids = group_ids if group_ids is not None else self.group_ids
+        driver = self.graphiti.driver
+        search_filter = SearchFilters()
+
+        texts = [query.replace('\n', ' ') for query in queries]
+        to_embed = [i for i, text in enumerate(texts) if text.strip()]
+        query_vectors = [None] * len(queries)
+        if to_embed:
+            embedded = await self.graphiti.embedder.create_batch(
+                [texts[i] for i in to_embed])
+            for i, vector in zip(to_embed, embedded):
+                query_vectors[i] = vector
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def candidates(i):
+            if query_vectors[i] is None:
+                return [], []
+            async with semaphore:
+                if scope == 'edges':
+                    return await asyncio.gather(
+                        edge_fulltext_search(
+                            driver, queries[i], search_filter, group_ids, pool_size),
+                        edge_similarity_search(
+                            driver, query_vectors[i], None, None, search_filter,
+                            group_ids, pool_size),
+                    )
+                return await asyncio.gather(
+                    node_fulltext_search(
+                        driver, queries[i], search_filter, group_ids, pool_size),
+                    node_similarity_search(
+                        driver, query_vectors[i], search_filter, group_ids, pool_size),
+                )
+
+        results = await asyncio.gather(*(candidates(i) for i in range(len(queries))))
+        by_uuid = {item.uuid: item for sources in results
+                   for source in sources for item in source}
+        pools, ranks, mask = rerankers.build_pools(
+            [[[item.uuid for item in source] for source in sources] for sources in results])
+        if not by_uuid:
+            return [[] for _ in queries]
 
+        with metrics.span(f'rerank.{reranker}'):
+            if reranker == 'rrf':
+                scores = rerankers.rrf(ranks)
+            else:
+                # One round-trip for the embeddings of every query's pool
+                get_embeddings = get_embeddings_for_edges \
+                    if scope == 'edges' else get_embeddings_for_nodes
+                embeddings = await get_embeddings(driver, list(by_uuid.values()))
+                dim = len(next(iter(embeddings.values()), [])) \
+                    or len(next(vector for vector in query_vectors if vector is not None))
+                candidate_vectors = np.zeros(mask.shape + (dim,), dtype=np.float32)
+                for q, pool in enumerate(pools):
+                    for c, uuid in enumerate(pool):
+                        if uuid in embeddings:
+                            candidate_vectors[q, c] = embeddings[uuid]
+                query_matrix = np.array(
+                    [vector if vector is not None else np.zeros(dim)
+                     for vector in query_vectors], dtype=np.float32)
+                if reranker == 'mmr':
+                    scores = rerankers.mmr(query_matrix, candidate_vectors, mask, mmr_lambda)
+                else:
+                    scores = rerankers.score_fusion(
+                        [rerankers.rrf(ranks),
+                         rerankers.cosine(query_matrix, candidate_vectors)],
+                        fusion_weights, mask)
+            best = rerankers.top_k(scores, mask, limit)
+
+        return [[by_uuid[pools[q][c]] for c in row] for q, row in enumerate(best)]
+
+    async def _fused_one(self, query: str, scope: str, reranker: str, limit: int):
+        return (await self.fused_search_many([query], scope, reranker, limit))[0]
+
+    async def center_node_search(self, query: str, results: list[EntityEdge],
+                                 rerank_only: bool = True, expand: int = 0,
+                                 as_of: Union[datetime, None] = None):
+        """Rerank results by graph distance to the top result's source node.
+
+        With ``rerank_only`` the already retrieved edges are reordered with a
+        single batched shortest-path query instead of re-running the search.
+        ``expand`` adds up to that many edges incident to the center node to
+        the candidate pool before reranking. ``as_of`` restricts expanded or
+        re-searched edges to facts valid at that instant.
+        """
         # Use the top search result's UUID as the center node for reranking
+        reranked_results = []
         try:
             if results and len(results) > 0:
                 center_node_uuid = results[0].source_node_uuid
@@ -64,9 +1039,17 @@ class Connection:
                 print('\nReranking search results based on graph distance:')
                 print(f'Using center node UUID: {center_node_uuid}')
 
-                reranked_results = await self.graphiti.search(
-                    query, center_node_uuid=center_node_uuid
-                )
+                if rerank_only:
+                    candidates = list(results)
+                    if expand > 0:
+                        candidates += await center_node_edges(
+                            self.graphiti.driver, center_node_uuid, expand, as_of)
+                    reranked_results = await rerank_by_node_distance(
+                        self.graphiti.driver, candidates, center_node_uuid,
+                        self.neighborhood_cache)
+                else:
+                    reranked_results = await self.search_edges(
+                        query, center_node_uuid=center_node_uuid, as_of=as_of)
 
                 # Print reranked search results
                 print('\nReranked Search Results:')
@@ -80,25 +1063,19 @@ class Connection:
                 print('---')
             else:
                 print("No results found in the initial search to use as center node.")
+            return reranked_results
         finally:
             print(
                 "\nCenter Node Search: results found in the initial search to use as center node."
             )
 
-    async def node_search_by_recipe(self, query: str):
+    async def node_search_by_recipe(self, query: str, reranker: Union[str, None] = None):
         # Example: Perform a node search using _search method with standard recipes
         print(
             '\nPerforming node search using _search method with standard recipe NODE_HYBRID_SEARCH_RRF:'
         )
         try:
-            # Use a predefined search configuration recipe and modify its limit
-            node_search_config = NODE_HYBRID_SEARCH_RRF.model_copy(deep=True)
-            node_search_config.limit = 5  # Limit to 5 results
-
-            node_search_results = await self.graphiti._search(
-                query=query,
-                config=node_search_config,
-            )
+            node_search_results = await self.search_nodes(query, limit=5, reranker=reranker)
             # Print node search results
             print("\nNode Search Results:")
             for node in node_search_results.nodes:
@@ -120,10 +1097,86 @@ class Connection:
         finally:
             print("\nNode Search By Recipe Complete !!")
 
+    async def graph_stats(self, group_ids: Union[List[str], None] = None) -> GraphStats:
+        """Return episode, entity and edge counts and the latest episode time.
+
+        ``group_ids`` defaults to the connection's group. Without any the
+        counts come straight from Neo4j's count store; with them, from the
+        group_id range indices. The latest ``created_at`` is read through
+        the created_at index.
+        """
+        group_ids = group_ids if group_ids is not None else self.group_ids
+        group_filter = 'WHERE x.group_id IN $group_ids' if group_ids else ''
+        latest_filter = 'AND n.group_id IN $group_ids' if group_ids else ''
+        records, _, _ = await self.graphiti.driver.execute_query(
+            f"""
+            CALL {{ MATCH (x:Episodic) {group_filter} RETURN count(x) AS episodes }}
+            CALL {{ MATCH (x:Entity) {group_filter} RETURN count(x) AS entities }}
+            CALL {{ MATCH ()-[x:RELATES_TO]->() {group_filter} RETURN count(x) AS edges }}
+            CALL {{
+                MATCH (n:Episodic)
+                WHERE n.created_at IS NOT NULL {latest_filter}
+                RETURN n.created_at.epochMillis AS latest_created_at_ms
+                ORDER BY n.created_at DESC LIMIT 1
+                UNION
+                RETURN null AS latest_created_at_ms
+            }}
+            RETURN episodes, entities, edges, max(latest_created_at_ms) AS latest_created_at_ms
+            """,
+            group_ids=group_ids,
+            database_=DEFAULT_DATABASE,
+            routing_='r',
+        )
+        record = records[0]
+        return GraphStats(
+            episodes=record['episodes'],
+            entities=record['entities'],
+            edges=record['edges'],
+            latest_created_at_ms=record['latest_created_at_ms'],
+        )
+
     async def close(self):
-        await self.graphiti.close()
+        if is_shared(self.graphiti):
+            await close_graphiti()
+        else:
+            await self.graphiti.close()
         print("connection closed !!")
 
     async def clear_data(self):
-        await clear_data(self.graphiti.driver)
-        print("Clearing Previous Data")
+        """Delete the connection's group, or the whole graph without one.
+
+        Also drops the group's ingestion manifest, so the next incremental
+        load ingests everything again, and every local cache of its data.
+        """
+        previous_epoch = await clear_epoch(self.graphiti.driver)
+        await clear_data(self.graphiti.driver, self.group_ids)
+        if self.group_ids is not None:
+            # Without a group the whole graph, manifest included, is gone
+            await self.graphiti.driver.execute_query(
+                "MATCH (m:IngestManifest) WHERE m.group_id IN $group_ids DELETE m",
+                group_ids=self.group_ids,
+                database_=DEFAULT_DATABASE,
+            )
+        # Tells other processes' ANN indexes to drop what they mirror
+        epoch = await mark_cleared(self.graphiti.driver)
+        self.search_cache.invalidate()
+        if self.ann_index is not None:
+            if self.group_ids is None:
+                self.ann_index.clear()
+            else:
+                self.ann_index.remove_groups(self.group_ids)
+            # An index that missed an earlier clear still has to rebuild
+            if self.group_ids is None or self.ann_index.epoch == previous_epoch:
+                self.ann_index.epoch = epoch
+        # Only the cleared group's entries go; other tenants keep theirs
+        for cache in (self.validity_index, self.neighborhood_cache, get_answer_cache()):
+            if cache is None:
+                continue
+            if self.group_ids is None:
+                cache.clear()
+            else:
+                cache.remove_groups(self.group_ids)
+        if self.group_id is not None:
+            print(f"Clearing Previous Data for group {self.group_id}")
+        else:
+            print("Clearing Previous Data")
@@ -0,0 +1,180 @@
+"""
+Conversation memory for the live agent
+
+Keeps the message history sent with every agent turn within a token budget.
+Recent turns are kept verbatim, older turns are folded into a compact
+summary, and stale ``search_graphiti`` payloads are replaced by a short
+placeholder once newer searches have superseded them. Turns can also be
+stored in the graph as message episodes.
+"""
+
+import asyncio
+import dataclasses
+import uuid
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    SystemPromptPart,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+
+from graphiti_core.nodes import EpisodeType
+
+from connection import Connection
+from stream_render import CHARS_PER_TOKEN
+
+
+def estimate_tokens(messages: List[ModelMessage]) -> int:
+    """Estimate the prompt tokens a message history costs."""
+    chars = 0
+    for message in messages:
+        for part in message.parts:
+            if isinstance(part, ToolReturnPart):
+                chars += len(part.model_response_str())
+            elif isinstance(part, ToolCallPart):
+                chars += len(part.args_as_json_str())
+            else:
+                chars += len(str(getattr(part, 'content', '')))
+    return chars // CHARS_PER_TOKEN
+
+
+def turn_text(turn: List[ModelMessage]) -> tuple[str, str]:
+    """Return the user prompt and final answer text of a turn."""
+    prompt, answer = '', ''
+    for message in turn:
+        for part in message.parts:
+            if isinstance(part, UserPromptPart) and isinstance(part.content, str):
+                prompt = part.content
+            elif isinstance(part, TextPart):
+                answer = part.content
+    return prompt, answer
+
+
+class ConversationMemory:
+    """Token-budgeted message history for ``Agent.run_stream``."""
+
+    def __init__(self, token_budget: int = 6000, keep_turns: int = 4,
+                 keep_tool_payloads: int = 1,
+                 summarize: Optional[Callable[[str], Awaitable[str]]] = None,
+                 graphiti=None, group_id: Optional[str] = None):
+        self.token_budget = token_budget
+        self.keep_turns = max(1, keep_turns)
+        self.keep_tool_payloads = keep_tool_payloads
+        # Optional async summarizer, e.g. a cheap LLM call; the default is
+        # a truncating extract of each folded turn
+        self.summarize = summarize
+        self.system_parts: List[SystemPromptPart] = []
+        self.summary = ''
+        self.turns: List[List[ModelMessage]] = []
+        # When set, every turn is also ingested as a message episode
+        self.graphiti = graphiti
+        self.group_id = group_id
+        self.session_id = uuid.uuid4().hex[:8]
+        self.turn_count = 0
+        self._pending: set[asyncio.Task] = set()
+        # Latest store task; each turn is stored after the one before it
+        self._last_store: Optional[asyncio.Task] = None
+
+    async def add_turn(self, messages: List[ModelMessage]):
+        """Record the new messages of one agent run and compact the history."""
+        turn = []
+        for message in messages:
+            if isinstance(message, ModelRequest):
+                # The agent only sends its system prompt when the history is
+                # empty, so keep it outside the turns that get folded away
+                system_parts = [
+                    part for part in message.parts if isinstance(part, SystemPromptPart)]
+                if system_parts:
+                    if not self.system_parts:
+                        self.system_parts = system_parts
+                    message = dataclasses.replace(message, parts=[
+                        part for part in message.parts
+                        if not isinstance(part, SystemPromptPart)])
+            turn.append(message)
+        self.turns.append(turn)
+        self.turn_count += 1
+        if self.graphiti is not None:
+            self._store_turn(turn)
+        await self._compact()
+
+    def _store_turn(self, turn: List[ModelMessage]):
+        prompt, answer = turn_text(turn)
+        episode = {
+            'content': f'user: {prompt}\nassistant: {answer}',
+            'type': EpisodeType.message,
+            'description': 'live agent session',
+            'reference_time': datetime.now(timezone.utc),
+        }
+        # Extraction takes seconds, so it must not hold up the next prompt
+        task = asyncio.create_task(
+            self._store_after(self._last_store, episode, self.turn_count - 1))
+        self._last_store = task
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _store_after(self, previous: Optional[asyncio.Task], episode: dict, index: int):
+        if previous is not None:
+            await previous
+        try:
+            await Connection.add_episodes(
+                self.graphiti, [episode], f'Session {self.session_id}',
+                start_index=index, group_id=self.group_id)
+        except Exception as e:
+            # Report it and keep storing the turns after it
+            print(f'Could not store session turn {index}: {str(e)}')
+
+    async def close(self):
+        """Wait for session turns still being stored in the graph."""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def history(self) -> List[ModelMessage]:
+        """Return the message history to send with the next turn."""
+        head = list(self.system_parts)
+        if self.summary:
+            head.append(SystemPromptPart(
+                f'Summary of the earlier conversation:\n{self.summary}'))
+
+        messages: List[ModelMessage] = []
+        if head:
+            messages.append(ModelRequest(parts=head))
+
+        stale = len(self.turns) - self.keep_tool_payloads
+        for i, turn in enumerate(self.turns):
+            for message in turn:
+                if i < stale and isinstance(message, ModelRequest):
+                    message = dataclasses.replace(message, parts=[
+                        self._drop_payload(part) for part in message.parts])
+                messages.append(message)
+        return messages
+
+    def estimate_tokens(self) -> int:
+        return estimate_tokens(self.history())
+
+    @staticmethod
+    def _drop_payload(part):
+        if isinstance(part, ToolReturnPart) and part.tool_name == 'search_graphiti':
+            count = f'{len(part.content)} ' if isinstance(part.content, list) else ''
+            return dataclasses.replace(
+                part, content=f'[{count}earlier search results omitted; search again if needed]')
+        return part
+
+    async def _compact(self):
+        while len(self.turns) > self.keep_turns \
+                and self.estimate_tokens() > self.token_budget:
+            prompt, answer = turn_text(self.turns.pop(0))
+            folded = f'- User asked: {prompt[:200]}\n  Assistant answered: {answer[:300]}'
+            self.summary = f'{self.summary}\n{folded}'.strip()
+            if self.summarize is not None:
+                self.summary = await self.summarize(self.summary)
+            # Keep the summary itself from outgrowing its share of the budget
+            max_chars = self.token_budget * CHARS_PER_TOKEN // 4
+            while len(self.summary) > max_chars and '\n- ' in self.summary:
+                self.summary = self.summary[self.summary.index('\n- ') + 1:]
+            self.summary = self.summary[:max_chars]
@@ -0,0 +1,216 @@
+"""
+Persistent embedding cache
+
+Wraps a Graphiti embedder so every text is embedded at most once. Vectors
+live in a memory-mapped float32 array on disk next to a JSON index keyed by
+model name and content hash, with least-recently-used eviction once the
+store reaches its size bound. Every slot also records the key its vector was
+written for, so a slot reused after the last index flush is never served
+for the key the stale index still maps to it. A store directory belongs to
+one process.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from collections.abc import Iterable
+
+import numpy as np
+from graphiti_core.embedder import EmbedderClient
+
+INITIAL_ROWS = 1024
+# A key is a hex sha256 digest, stored per slot as its 32 raw bytes
+TAG_BYTES = 32
+
+
+class EmbeddingStore:
+    """On-disk vector store: ``vectors.f32`` and ``keys.bin`` memmaps plus ``index.json``."""
+
+    def __init__(self, path: str, max_entries: int = 50000, flush_every: int = 32):
+        self.path = path
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        self.index_path = os.path.join(path, 'index.json')
+        self.vectors_path = os.path.join(path, 'vectors.f32')
+        self.tags_path = os.path.join(path, 'keys.bin')
+        os.makedirs(path, exist_ok=True)
+
+        self.dim = None
+        self.rows = 0
+        # key -> slot, least recently used first
+        self.slots: OrderedDict[str, int] = OrderedDict()
+        # Slots handed out so far, and those below it that no key owns
+        self.next_slot = 0
+        self.free: list[int] = []
+        self._vectors = None
+        self._tags = None
+        self._dirty = 0
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                index = json.load(f)
+            self.dim = index['dim']
+            self.rows = index['rows']
+            slots = index['slots']
+            if slots and isinstance(next(iter(slots.values())), list):
+                # Older index of key -> [slot, last_used]
+                slots = {key: entry[0] for key, entry in
+                         sorted(slots.items(), key=lambda item: item[1][1])}
+            self.slots = OrderedDict(slots)
+            self.next_slot = index.get(
+                'next_slot', max(self.slots.values(), default=-1) + 1)
+            self.free = sorted(set(range(self.next_slot)) - set(self.slots.values()))
+            tagged = os.path.exists(self.tags_path)
+            self._open(self.rows)
+            if not tagged:
+                for key, slot in self.slots.items():
+                    self._tags[slot] = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f'{model}\0{text}'.encode()).hexdigest()
+
+    def __len__(self):
+        return len(self.slots)
+
+    def get(self, key: str) -> list[float] | None:
+        slot = self.slots.get(key)
+        if slot is None:
+            return None
+        if self._tags[slot].tobytes() != bytes.fromhex(key):
+            # The slot was reused for another key after the index was flushed;
+            # that key did not make it into the index, so the slot is free
+            del self.slots[key]
+            self.free.append(slot)
+            return None
+        self.slots.move_to_end(key)
+        return self._vectors[slot].tolist()
+
+    def put(self, key: str, vector: list[float]):
+        if self.dim is None:
+            self.dim = len(vector)
+        if len(vector) != self.dim:
+            return
+
+        slot = self.slots.get(key)
+        if slot is not None:
+            self.slots.move_to_end(key)
+        elif self.free:
+            slot = self.free.pop()
+        elif self.next_slot < self.max_entries:
+            slot = self.next_slot
+            self.next_slot += 1
+            self._ensure_rows(slot + 1)
+        else:
+            # Evict the least recently used vector and reuse its slot
+            slot = self.slots.popitem(last=False)[1]
+
+        self.slots[key] = slot
+        # Untag the slot while its vector is rewritten, then tag it with the new key
+        self._tags[slot] = 0
+        self._vectors[slot] = np.asarray(vector, dtype=np.float32)
+        self._tags[slot] = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+
+        self._dirty += 1
+        if self._dirty >= self.flush_every:
+            self.flush()
+
+    def _ensure_rows(self, rows: int):
+        if rows <= self.rows:
+            return
+        new_rows = min(max(INITIAL_ROWS, self.rows * 2, rows), self.max_entries)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._tags.flush()
+            del self._vectors, self._tags
+        self._open(new_rows)
+        self.rows = new_rows
+
+    def _open(self, rows: int):
+        # Growing the files keeps existing rows in place
+        for path, width in ((self.vectors_path, self.dim * 4), (self.tags_path, TAG_BYTES)):
+            with open(path, 'ab') as f:
+                if f.tell() < rows * width:
+                    f.truncate(rows * width)
+        self._vectors = np.memmap(
+            self.vectors_path, dtype=np.float32, mode='r+', shape=(rows, self.dim))
+        self._tags = np.memmap(
+            self.tags_path, dtype=np.uint8, mode='r+', shape=(rows, TAG_BYTES))
+
+    def flush(self):
+        """Persist the vectors and write the index atomically."""
+        if self._vectors is None:
+            return
+        self._vectors.flush()
+        self._tags.flush()
+        tmp_path = f'{self.index_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'dim': self.dim, 'rows': self.rows, 'next_slot': self.next_slot,
+                       'slots': self.slots}, f)
+        os.replace(tmp_path, self.index_path)
+        self._dirty = 0
+
+
+class CachedEmbedder(EmbedderClient):
+    """Embedder that serves repeated texts from an ``EmbeddingStore``."""
+
+    def __init__(self, embedder: EmbedderClient, store: EmbeddingStore):
+        self.embedder = embedder
+        self.store = store
+        config = getattr(embedder, 'config', None)
+        self.model = str(getattr(config, 'embedding_model', type(embedder).__name__))
+        self.hits = 0
+        self.misses = 0
+        atexit.register(store.flush)
+
+    async def create(
+        self, input_data: str | list[str] | Iterable[int] | Iterable[Iterable[int]]
+    ) -> list[float]:
+        # Graphiti embeds one text at a time, either bare or in a list
+        if isinstance(input_data, list) and len(input_data) == 1 \
+                and isinstance(input_data[0], str):
+            text = input_data[0]
+        elif isinstance(input_data, str):
+            text = input_data
+        else:
+            return await self.embedder.create(input_data)
+
+        key = self.store.make_key(self.model, text)
+        vector = self.store.get(key)
+        if vector is not None:
+            self.hits += 1
+            return vector
+
+        self.misses += 1
+        vector = await self.embedder.create(input_data)
+        self.store.put(key, vector)
+        return vector
+
+    async def create_batch(self, input_data_list: list[str]) -> list[list[float]]:
+        keys = [self.store.make_key(self.model, text) for text in input_data_list]
+        vectors = [self.store.get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        self.hits += len(vectors) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            embedded = await self.embedder.create_batch(
+                [input_data_list[i] for i in missing])
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+                self.store.put(keys[i], vector)
+        return vectors
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.store),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        self.store.flush()
@@ -0,0 +1,360 @@
+"""
+Shared Graphiti client
+
+A process-wide Graphiti instance backed by one configurable Neo4j connection
+pool. Connection, LLM_Knowledge and the live agent borrow it instead of each
+opening their own driver, and the indices are built once per process. A
+schema version marker in the graph lets later processes skip the index
+creation round-trips entirely.
+
+An optional routing table (GROUP_ROUTES) sends groups to other Neo4j
+databases or instances; each route gets its own client, created on first use.
+
+Clients split ``add_episode`` into an extraction stage, which only calls the
+LLM, and a commit stage that resolves against the graph, so ingestion can
+extract later episodes while earlier ones commit.
+"""
+
+import asyncio
+import json
+import os
+from dataclasses import dataclass
+from importlib.metadata import version
+
+from dotenv import load_dotenv
+from graphiti_core import Graphiti
+from graphiti_core.edges import EntityEdge
+from graphiti_core.embedder import EmbedderClient, OpenAIEmbedder
+from graphiti_core.graphiti import AddEpisodeResults
+from graphiti_core.helpers import DEFAULT_DATABASE, semaphore_gather
+from graphiti_core.nodes import EntityNode, EpisodicNode
+from graphiti_core.search.search_utils import RELEVANT_SCHEMA_LIMIT
+from graphiti_core.utils.bulk_utils import add_nodes_and_edges_bulk, resolve_edge_pointers
+from graphiti_core.utils.datetime_utils import utc_now
+from graphiti_core.utils.maintenance.edge_operations import (
+    build_episodic_edges,
+    extract_edges,
+    resolve_extracted_edges,
+)
+from graphiti_core.utils.maintenance.node_operations import (
+    extract_attributes_from_nodes,
+    extract_nodes,
+    resolve_extracted_nodes,
+)
+from neo4j import AsyncGraphDatabase
+
+from ann_index import close_ann_index
+from answer_cache import close_answer_cache
+from embedding_cache import CachedEmbedder, EmbeddingStore
+from instrumentation import (
+    TimedCrossEncoder,
+    TimedDriver,
+    TimedEmbedder,
+    TimedLLMClient,
+    metrics,
+)
+
+_graphiti = None
+_default_driver = None
+_embedder: EmbedderClient | None = None
+_routes: dict | None = None
+# Routed clients and the lazy default drivers they replaced, by route target
+_routed: dict[tuple, tuple[Graphiti, object]] = {}
+# Clients whose indices are known to be current
+_indices_built: set[int] = set()
+_indices_lock = asyncio.Lock()
+
+# Bump when the indices this app relies on change; a new graphiti-core
+# release also triggers a rebuild since it may add indices of its own
+SCHEMA_VERSION = f"2/graphiti-core-{version('graphiti-core')}"
+
+
+def pool_config() -> dict:
+    """Return the Neo4j driver pool settings from the environment."""
+    return {
+        'max_connection_pool_size': int(
+            os.environ.get('NEO4J_MAX_POOL_SIZE', '50')),
+        'connection_acquisition_timeout': float(
+            os.environ.get('NEO4J_ACQUISITION_TIMEOUT', '30')),
+        'keep_alive': os.environ.get(
+            'NEO4J_KEEP_ALIVE', 'true').lower() in ('1', 'true', 'yes'),
+    }
+
+
+def shared_embedder() -> EmbedderClient:
+    """Return the embedder every client shares, so they share its cache."""
+    global _embedder
+    if _embedder is None:
+        _embedder = build_embedder()
+    return _embedder
+
+
+def build_embedder() -> EmbedderClient:
+    """Return the OpenAI embedder, wrapped in the on-disk cache if enabled."""
+    embedder = TimedEmbedder(OpenAIEmbedder())
+    cache_dir = os.environ.get('EMBEDDING_CACHE_DIR', '.embedding_cache')
+    if not cache_dir:
+        return embedder
+    store = EmbeddingStore(
+        cache_dir,
+        max_entries=int(os.environ.get('EMBEDDING_CACHE_SIZE', '50000')))
+    return CachedEmbedder(embedder, store)
+
+
+class DatabaseDriver:
+    """Driver proxy that runs every query against one Neo4j database.
+
+    Graphiti always passes its module-level default database, so a route to
+    another database on the same instance overrides it here.
+    """
+
+    def __init__(self, driver, database: str):
+        self._driver = driver
+        self.database = database
+
+    async def execute_query(self, *args, **kwargs):
+        kwargs['database_'] = self.database
+        return await self._driver.execute_query(*args, **kwargs)
+
+    def session(self, *args, **kwargs):
+        kwargs['database'] = self.database
+        return self._driver.session(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+
+@dataclass
+class ExtractedEpisode:
+    """An episode with the entities and facts the LLM extracted from it."""
+    episode: EpisodicNode
+    previous_episodes: list[EpisodicNode]
+    nodes: list[EntityNode]
+    edges: list[EntityEdge]
+
+
+class PipelinedGraphiti(Graphiti):
+    """Graphiti with ``add_episode`` split into extraction and commit.
+
+    ``commit_episode(await extract_episode(episode))`` does what
+    ``add_episode`` does. Extraction reads nothing but previous episodes, so
+    it can run ahead; commits resolve against the graph and must go in
+    reference-time order.
+    """
+
+    async def extract_episode(self, episode: EpisodicNode,
+                              pending: list[EpisodicNode] = ()) -> ExtractedEpisode:
+        """Extract the entities and facts of ``episode`` with the LLM.
+
+        ``pending`` are earlier episodes of the batch that may not have
+        committed yet; they count as previous episodes alongside the graph's.
+        """
+        stored = await self.retrieve_episodes(
+            episode.valid_at, last_n=RELEVANT_SCHEMA_LIMIT,
+            group_ids=[episode.group_id], source=episode.source)
+        previous = {e.uuid: e for e in stored}
+        previous.update((e.uuid, e) for e in pending
+                        if e.group_id == episode.group_id and e.source == episode.source)
+        previous_episodes = sorted(
+            previous.values(), key=lambda e: e.valid_at.timestamp())[-RELEVANT_SCHEMA_LIMIT:]
+        nodes = await extract_nodes(self.clients, episode, previous_episodes)
+        edges = await extract_edges(
+            self.clients, episode, nodes, previous_episodes, episode.group_id)
+        return ExtractedEpisode(episode, previous_episodes, nodes, edges)
+
+    async def commit_episode(self, extracted: ExtractedEpisode) -> AddEpisodeResults:
+        """Resolve an extracted episode against the graph and save it."""
+        episode = extracted.episode
+        episode.created_at = utc_now()
+        nodes, uuid_map = await resolve_extracted_nodes(
+            self.clients, extracted.nodes, episode, extracted.previous_episodes)
+        edges = resolve_edge_pointers(extracted.edges, uuid_map)
+        (resolved_edges, invalidated_edges), hydrated_nodes = await semaphore_gather(
+            resolve_extracted_edges(self.clients, edges, episode),
+            extract_attributes_from_nodes(
+                self.clients, nodes, episode, extracted.previous_episodes),
+        )
+        entity_edges = resolved_edges + invalidated_edges
+        episodic_edges = build_episodic_edges(nodes, episode, episode.created_at)
+        episode.entity_edges = [edge.uuid for edge in entity_edges]
+        if not self.store_raw_episode_content:
+            episode.content = ''
+        await add_nodes_and_edges_bulk(
+            self.driver, [episode], episodic_edges, hydrated_nodes, entity_edges,
+            self.embedder)
+        return AddEpisodeResults(episode=episode, nodes=nodes, edges=entity_edges)
+
+
+def create_graphiti(uri: str, user: str, password: str, database: str | None = None):
+    """Build a client with a tuned, timed driver; returns it and the driver it replaced."""
+    graphiti = PipelinedGraphiti(uri, user, password, embedder=shared_embedder())
+
+    # Graphiti does not forward pool settings, so swap in a tuned driver.
+    # The default one is lazy and has not opened any sockets yet.
+    default_driver = graphiti.driver
+    driver = AsyncGraphDatabase.driver(uri, auth=(user, password), **pool_config())
+    if database:
+        driver = DatabaseDriver(driver, database)
+    driver = TimedDriver(driver)
+    graphiti.driver = driver
+    graphiti.clients.driver = driver
+
+    # Time LLM extraction and cross-encoder reranking as well
+    graphiti.llm_client = TimedLLMClient(graphiti.llm_client)
+    graphiti.clients.llm_client = graphiti.llm_client
+    graphiti.cross_encoder = TimedCrossEncoder(graphiti.cross_encoder)
+    graphiti.clients.cross_encoder = graphiti.cross_encoder
+    return graphiti, default_driver
+
+
+def group_routes() -> dict:
+    """Return the routing table from the JSON file named by GROUP_ROUTES.
+
+    It maps a group id to any of ``uri``, ``user``, ``password`` and
+    ``database``; missing keys fall back to the NEO4J_* settings.
+    """
+    global _routes
+    if _routes is None:
+        load_dotenv()
+        path = os.environ.get('GROUP_ROUTES', '')
+        _routes = {}
+        if path:
+            with open(path) as f:
+                _routes = json.load(f)
+    return _routes
+
+
+def neo4j_settings() -> tuple[str, str, str]:
+    """Return the default route's NEO4J_URI, NEO4J_USER and NEO4J_PASSWORD."""
+    return (os.environ.get('NEO4J_URI', 'bolt://localhost:7687'),
+            os.environ.get('NEO4J_USER', 'neo4j'),
+            os.environ.get('NEO4J_PASSWORD', 'password'))
+
+
+def route_target(group_id: str | None) -> tuple[str, str, str | None] | None:
+    """Return the ``(uri, user, database)`` a group is routed to.
+
+    None for groups without a route and for routes that resolve to the
+    default database, which are served by the default client.
+    """
+    route = group_routes().get(group_id) if group_id else None
+    if route is None:
+        return None
+    neo4j_uri, neo4j_user, _ = neo4j_settings()
+    target = (route.get('uri') or neo4j_uri, route.get('user') or neo4j_user,
+              route.get('database') or None)
+    if target[:2] == (neo4j_uri, neo4j_user) and target[2] in (None, DEFAULT_DATABASE):
+        return None
+    return target
+
+
+def get_graphiti(group_id: str | None = None) -> Graphiti:
+    """Return the client for ``group_id``, creating it on first use.
+
+    Groups without a route (or routed to the default database), and no group
+    at all, share the default client.
+    """
+    global _graphiti, _default_driver
+    target = route_target(group_id)
+    if target is None and _graphiti is not None:
+        return _graphiti
+    if target in _routed:
+        return _routed[target][0]
+
+    load_dotenv()
+
+    neo4j_uri, neo4j_user, neo4j_password = neo4j_settings()
+
+    if target is not None:
+        password = group_routes()[group_id].get('password') or neo4j_password
+        _routed[target] = create_graphiti(*target[:2], password, target[2])
+        return _routed[target][0]
+
+    if not neo4j_uri or not neo4j_user or not neo4j_password:
+        raise ValueError(
+            'NEO4J_URI, NEO4J_USER, and NEO4J_PASSWORD must be set')
+
+    _graphiti, _default_driver = create_graphiti(neo4j_uri, neo4j_user, neo4j_password)
+    return _graphiti
+
+
+def route_client(graphiti: Graphiti, group_id: str | None) -> Graphiti:
+    """Return the routed client of ``group_id``, or ``graphiti`` without a route."""
+    return get_graphiti(group_id) if route_target(group_id) is not None else graphiti
+
+
+def route_clients() -> list[Graphiti]:
+    """Return the client of every route in the routing table."""
+    return list({id(client): client for client in
+                 (get_graphiti(group_id) for group_id in group_routes()
+                  if route_target(group_id) is not None)}.values())
+
+
+def is_routed(graphiti: Graphiti) -> bool:
+    """Return True if ``graphiti`` serves a routing-table entry."""
+    return any(graphiti is client for client, _ in _routed.values())
+
+
+def is_shared(graphiti: Graphiti) -> bool:
+    """Return True if ``graphiti`` is the shared client or a routed one."""
+    return graphiti is not None and (graphiti is _graphiti or is_routed(graphiti))
+
+
+async def schema_version(driver) -> str | None:
+    """Return the schema version recorded in the graph, if any."""
+    records, _, _ = await driver.execute_query(
+        "MATCH (m:SchemaVersion {name: 'graphiti'}) RETURN m.version AS version",
+        database_=DEFAULT_DATABASE,
+        routing_='r',
+    )
+    return records[0]['version'] if records else None
+
+
+async def build_indices_once(graphiti: Graphiti | None = None):
+    """Build Graphiti's indices and constraints once per process and client.
+
+    Skipped with a single read when the graph already carries the current
+    ``SCHEMA_VERSION`` marker.
+    """
+    graphiti = graphiti or get_graphiti()
+    async with _indices_lock:
+        if id(graphiti) in _indices_built:
+            return
+        if await schema_version(graphiti.driver) != SCHEMA_VERSION:
+            await graphiti.build_indices_and_constraints()
+            # Looked up by LLM_Knowledge on every incremental load
+            await graphiti.driver.execute_query(
+                "CREATE INDEX ingest_manifest_hash IF NOT EXISTS "
+                "FOR (m:IngestManifest) ON (m.hash)",
+                database_=DEFAULT_DATABASE,
+            )
+            await graphiti.driver.execute_query(
+                "MERGE (m:SchemaVersion {name: 'graphiti'}) SET m.version = $version",
+                version=SCHEMA_VERSION,
+                database_=DEFAULT_DATABASE,
+            )
+        _indices_built.add(id(graphiti))
+
+
+async def close_graphiti():
+    """Close the shared and routed clients and release their connection pools."""
+    global _graphiti, _default_driver, _embedder
+    clients = list(_routed.values())
+    if _graphiti is not None:
+        clients.append((_graphiti, _default_driver))
+    if not clients:
+        return
+    for graphiti, default_driver in clients:
+        await graphiti.close()
+        await default_driver.close()
+    if os.environ.get('METRICS_FILE'):
+        metrics.write_json(os.environ['METRICS_FILE'])
+    if isinstance(_embedder, CachedEmbedder):
+        _embedder.close()
+    close_ann_index()
+    close_answer_cache()
+    _routed.clear()
+    _graphiti = None
+    _default_driver = None
+    _embedder = None
+    _indices_built.clear()
@@ -0,0 +1,185 @@
+"""
+Streaming episode import
+
+Loads episodes from JSONL / NDJSON files, plain or gzip-compressed, through
+``Connection.add_episodes`` without reading a file into memory. Lines are
+decoded and parsed lazily by a generator pipeline and ingested in batches,
+so at most ``--batch-size`` episodes are held at a time however large the
+dump is. Progress is checkpointed per prefix as episodes commit, and an
+interrupted import resumes after the last episode that had committed along
+with everything before it (with ``--concurrency`` above 1, other groups'
+episodes that committed past that point are ingested again). Episodes that
+fail to ingest are reported and skipped.
+
+Each line is one JSON object:
+
+    {"content": "GPT-4.1 was released by OpenAI ...", "type": "text",
+     "description": "LLM research report", "reference_time": "2025-04-14T00:00:00Z"}
+
+``type`` is text, json or message (json when ``content`` is an object) and
+``reference_time`` an ISO 8601 string or epoch seconds; records without one
+are stamped with the import time. A record's ``group_id`` overrides
+``--group-id``.
+
+Usage:
+    python import_episodes.py dump.jsonl.gz --batch-size 100 --concurrency 4
+"""
+
+import argparse
+import asyncio
+import gzip
+import itertools
+import json
+import os
+import sys
+import time
+from typing import Iterable, Iterator, List
+
+from dotenv import load_dotenv
+
+from connection import Connection, load_checkpoint, parse_episode, save_checkpoint
+from graphiti_client import build_indices_once, close_graphiti, get_graphiti, route_clients
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def open_lines(path: str) -> Iterator[str]:
+    """Yield the lines of a plain or gzip-compressed file, or of stdin for '-'."""
+    if path == '-':
+        yield from sys.stdin
+        return
+    with open(path, 'rb') as raw:
+        compressed = raw.peek(2)[:2] == GZIP_MAGIC
+    with (gzip.open if compressed else open)(path, 'rt', encoding='utf-8') as f:
+        yield from f
+
+
+def read_episodes(lines: Iterable[str], description: str, skipped: List[int]) -> Iterator[dict]:
+    """Parse JSON lines into episodes; malformed line numbers go to ``skipped``."""
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield parse_episode(json.loads(line), description)
+        except (KeyError, TypeError, ValueError) as e:
+            print(f'Skipping line {line_number}: {str(e)}')
+            skipped.append(line_number)
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+async def import_file(graphiti, path: str, prefix: str, batch_size: int = 100,
+                      concurrency: int = 1, description: str = 'import',
+                      checkpoint_path: str = '.ingest_checkpoint.json',
+                      group_id: str | None = None) -> int:
+    """Stream the episodes of ``path`` into the graph; returns how many were added."""
+    checkpoint = load_checkpoint(checkpoint_path)
+    # The same dump may be imported into several groups
+    key = f'{group_id}/{prefix}' if group_id else prefix
+    done = checkpoint.get(key, 0)
+    if done:
+        print(f'Resuming {prefix} after {done} episodes')
+
+    skipped: List[int] = []
+    episodes = itertools.islice(
+        read_episodes(open_lines(path), description, skipped), done, None)
+    imported = 0
+    failed: List[int] = []
+    start = time.perf_counter()
+    for batch in batched(episodes, batch_size):
+        batch_start = done
+        positions = {id(episode): i for i, episode in enumerate(batch)}
+        finished = [False] * len(batch)
+
+        def advance():
+            # The checkpoint only moves past episodes whose predecessors finished
+            nonlocal done
+            previous = done
+            while done - batch_start < len(batch) and finished[done - batch_start]:
+                done += 1
+            if done != previous:
+                checkpoint[key] = done
+                save_checkpoint(checkpoint_path, checkpoint)
+
+        async def committed(added):
+            nonlocal imported
+            imported += 1
+            finished[positions[id(added[0])]] = True
+            advance()
+
+        results = await Connection.add_episodes(
+            graphiti, batch, prefix, concurrency=concurrency, start_index=batch_start,
+            group_id=group_id, on_added=committed, return_exceptions=True)
+        for i, result in enumerate(results):
+            if isinstance(result, Exception):
+                failed.append(batch_start + i)
+                finished[i] = True
+        advance()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f'Imported {imported} episodes from {path} in {elapsed:.2f}s'
+        f'{f" ({imported / elapsed:.2f} episodes/s)" if elapsed and imported else ""}, '
+        f'skipped {len(skipped)} malformed lines')
+    if failed:
+        print(f'Failed to ingest {len(failed)} episodes: '
+              + ', '.join(f'{prefix} {index}' for index in failed))
+    # A finished import must not make a later one skip episodes
+    checkpoint.pop(key, None)
+    save_checkpoint(checkpoint_path, checkpoint)
+    return imported
+
+
+def default_prefix(path: str) -> str:
+    name = os.path.basename(path)
+    for suffix in ('.gz', '.jsonl', '.ndjson', '.json'):
+        name = name.removesuffix(suffix)
+    return name or 'Import'
+
+
+def parse_args(argv=None):
+    """Parse the importer's command line options."""
+    parser = argparse.ArgumentParser(description='Stream JSONL episodes into the graph.')
+    parser.add_argument('paths', nargs='+',
+                        help="JSONL/NDJSON files, optionally .gz; '-' reads stdin")
+    parser.add_argument('--prefix',
+                        help='episode name prefix and checkpoint key (default: file name)')
+    parser.add_argument('--description', default='import',
+                        help='source description for records without one')
+    parser.add_argument('--batch-size', type=int, default=100,
+                        help='episodes parsed and held in memory at a time')
+    parser.add_argument('--concurrency', type=int,
+                        default=int(os.environ.get('INGEST_CONCURRENCY', '1')),
+                        help='episodes extracted ahead of the in-order commits')
+    parser.add_argument('--checkpoint',
+                        default=os.environ.get('INGEST_CHECKPOINT', '.ingest_checkpoint.json'),
+                        help="resume file; '' disables resuming")
+    parser.add_argument('--group-id', default=os.environ.get('GROUP_ID') or None,
+                        help='group of records without one (default: GROUP_ID)')
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    load_dotenv()
+    args = parse_args(argv)
+    graphiti = get_graphiti()
+    try:
+        # Records are routed by their group, so every route may receive some
+        for client in [graphiti, *route_clients()]:
+            await build_indices_once(client)
+        for path in args.paths:
+            await import_file(
+                graphiti, path, args.prefix or default_prefix(path),
+                batch_size=max(1, args.batch_size), concurrency=args.concurrency,
+                description=args.description, checkpoint_path=args.checkpoint,
+                group_id=args.group_id)
+    finally:
+        await close_graphiti()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,248 @@
+"""
+Background ingestion queue
+
+Producers enqueue episodes and return immediately. Every episode is first
+appended to a local JSONL journal, then drained into Graphiti with retries and
+exponential backoff by one worker per group, so a group's episodes commit in
+enqueue order even when one of them has to be retried. A worker only holds
+one of the ingestion slots while an attempt runs, never while it backs off. Journal appends are
+group-committed off the event loop, and the journal is compacted once enough
+finished records pile up. On restart the journal is replayed, so episodes
+that were queued but not yet ingested are picked up again.
+"""
+
+import asyncio
+import collections
+import json
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+
+from graphiti_core.nodes import EpisodeType
+
+from connection import Connection
+
+
+class IngestionQueue:
+    """Durable, worker-drained queue of episodes for one Graphiti client."""
+
+    def __init__(self, graphiti, journal_path: str = '.ingest_journal.jsonl',
+                 workers: int = 4, max_retries: int = 5, base_delay: float = 1.0,
+                 fsync: bool = True, compact_after: int = 10000):
+        self.graphiti = graphiti
+        self.journal_path = journal_path
+        self.workers = workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.fsync = fsync
+        # Finished records the journal may hold before it is rewritten
+        self.compact_after = compact_after
+
+        # group_id -> records waiting for (or in) that group's worker
+        self._groups: dict[str, collections.deque] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        # Bounds how many groups run an ingestion attempt at the same time
+        self._slots = asyncio.Semaphore(max(1, workers))
+        self._journal = None
+        # Journal lines not yet written, and the task writing them
+        self._buffer: list[str] = []
+        self._flusher: asyncio.Task | None = None
+        self._finished = 0
+        # id -> journal record of episodes not yet ingested or failed
+        self._pending: dict[str, dict] = {}
+        self._seq = 0
+        self.in_progress = 0
+        self.processed = 0
+        self.failed = 0
+        self.retries = 0
+
+    async def start(self):
+        """Replay the journal and start the pending groups' workers."""
+        records = self._replay()
+        # Rewrite the journal with just the pending records before appending
+        self._compact(records, self._seq)
+        self._journal = open(self.journal_path, 'a')
+        for record in records:
+            self._schedule(record)
+        if self._pending:
+            print(f'Resuming {len(self._pending)} queued episodes from the journal')
+
+    async def stop(self, drain: bool = True):
+        """Stop the workers, optionally after the queue is drained."""
+        while drain and self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._groups.clear()
+        await self.flush()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        self._compact(self._pending_records(), self._seq)
+
+    async def flush(self):
+        """Wait until every record journaled so far is on disk."""
+        while self._flusher is not None and not self._flusher.done():
+            await asyncio.shield(self._flusher)
+
+    def enqueue(self, episode: dict, prefix: str = 'Queued') -> str:
+        """Journal an episode and queue it for ingestion; returns its id.
+
+        The journal write is buffered; await ``flush()`` before relying on
+        the episode surviving a crash.
+        """
+        if self._journal is None:
+            raise RuntimeError('IngestionQueue.start() must be awaited first')
+
+        reference_time = episode.get('reference_time') or datetime.now(timezone.utc)
+        record = {
+            'op': 'enqueue',
+            'id': uuid.uuid4().hex,
+            'seq': self._seq,
+            'prefix': prefix,
+            'enqueued_at': time.time(),
+            'episode': {
+                'content': episode['content'],
+                'type': episode['type'].value,
+                'description': episode['description'],
+                'reference_time': reference_time.isoformat(),
+            },
+        }
+        if episode.get('group_id'):
+            record['episode']['group_id'] = episode['group_id']
+        self._seq += 1
+        self._append(record)
+        self._pending[record['id']] = record
+        self._schedule(record)
+        return record['id']
+
+    def status(self) -> dict:
+        """Return queue depth, lag and counters."""
+        oldest = min(
+            (record['enqueued_at'] for record in self._pending.values()), default=None)
+        return {
+            'depth': len(self._pending),
+            'queued': sum(map(len, self._groups.values())) - self.in_progress,
+            'in_progress': self.in_progress,
+            'processed': self.processed,
+            'failed': self.failed,
+            'retries': self.retries,
+            'lag_seconds': time.time() - oldest if oldest is not None else 0.0,
+            'workers': len(self._tasks),
+        }
+
+    def _schedule(self, record: dict):
+        group_id = record['episode'].get('group_id', '')
+        self._groups.setdefault(group_id, collections.deque()).append(record)
+        if group_id not in self._tasks:
+            self._tasks[group_id] = asyncio.create_task(self._worker(group_id))
+
+    async def _worker(self, group_id: str):
+        # Takes records strictly in order, so a retry holds back the group
+        queue = self._groups[group_id]
+        while queue:
+            self.in_progress += 1
+            try:
+                await self._ingest(queue[0])
+            finally:
+                self.in_progress -= 1
+            queue.popleft()
+        # Exits without awaiting, so no record can slip in behind the check
+        del self._groups[group_id]
+        del self._tasks[group_id]
+
+    async def _ingest(self, record: dict):
+        episode = dict(record['episode'])
+        episode['type'] = EpisodeType(episode['type'])
+        episode['reference_time'] = datetime.fromisoformat(episode['reference_time'])
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._slots:
+                    await Connection.add_episodes(
+                        self.graphiti, [episode], record['prefix'],
+                        start_index=record['seq'])
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f'Giving up on queued episode {record["id"]}: {str(e)}')
+                    self.failed += 1
+                    self._append({'op': 'failed', 'id': record['id'], 'error': str(e)})
+                    self._pending.pop(record['id'], None)
+                    self._finished += 1
+                    return
+                self.retries += 1
+                delay = self.base_delay * 2 ** attempt
+                await asyncio.sleep(delay + random.uniform(0, delay / 2))
+            else:
+                self.processed += 1
+                self._append({'op': 'done', 'id': record['id']})
+                self._pending.pop(record['id'], None)
+                self._finished += 1
+                return
+
+    def _append(self, record: dict):
+        self._buffer.append(json.dumps(record) + '\n')
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush())
+
+    async def _flush(self):
+        # Lines appended while a write is in flight go out in the next one
+        while self._buffer:
+            lines, self._buffer = self._buffer, []
+            await asyncio.to_thread(self._write, lines)
+            if self._finished >= max(self.compact_after, len(self._pending)):
+                self._finished = 0
+                # Records still buffered land after the rewrite; replay
+                # tolerates the duplicates
+                await asyncio.to_thread(
+                    self._rewrite, self._pending_records(), self._seq)
+
+    def _write(self, lines: list[str]):
+        self._journal.write(''.join(lines))
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+    def _rewrite(self, records: list[dict], seq: int):
+        self._journal.close()
+        self._compact(records, seq)
+        self._journal = open(self.journal_path, 'a')
+
+    def _pending_records(self) -> list[dict]:
+        return sorted(self._pending.values(), key=lambda record: record['seq'])
+
+    def _replay(self) -> list[dict]:
+        if not os.path.exists(self.journal_path):
+            return []
+        with open(self.journal_path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from a crash mid-write
+                    continue
+                if record['op'] == 'seq':
+                    self._seq = max(self._seq, record['seq'])
+                elif record['op'] == 'enqueue':
+                    self._pending[record['id']] = record
+                    self._seq = max(self._seq, record['seq'] + 1)
+                else:
+                    self._pending.pop(record['id'], None)
+        return self._pending_records()
+
+    def _compact(self, records: list[dict], seq: int):
+        tmp_path = f'{self.journal_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            # Keep episode numbering going across restarts
+            f.write(json.dumps({'op': 'seq', 'seq': seq}) + '\n')
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
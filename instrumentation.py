@@ -0,0 +1,203 @@
+"""
+Latency instrumentation
+
+Lightweight spans with per-operation latency histograms. A span costs two
+``perf_counter`` calls and a bucket increment, so it is cheap enough to wrap
+every embedding, LLM extraction, Neo4j query, rerank and formatting step.
+Histograms use fixed log-spaced buckets, report p50/p95/p99, and export to
+a JSON metrics file or Prometheus text format.
+"""
+
+import bisect
+import functools
+import json
+import os
+import time
+from contextlib import contextmanager
+
+# Bucket upper bounds in seconds, from 100µs to ~100s in 2^(1/4) steps
+BUCKETS = [0.0001 * 2 ** (i / 4) for i in range(81)]
+
+
+class Histogram:
+    """Fixed-bucket latency histogram."""
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """Return the bucket upper bound at quantile ``q`` (0-1)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return BUCKETS[i] if i < len(BUCKETS) else self.max
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(0.50),
+            'p95': self.percentile(0.95),
+            'p99': self.percentile(0.99),
+            'max': self.max,
+        }
+
+
+class Metrics:
+    """Registry of latency histograms keyed by operation name."""
+
+    def __init__(self):
+        self.histograms: dict[str, Histogram] = {}
+        self.enabled = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+    def observe(self, name: str, seconds: float):
+        if not self.enabled:
+            return
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+    @contextmanager
+    def span(self, name: str):
+        """Time the enclosed block under ``name``."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name: str):
+        """Decorate an async function so each call is recorded as a span."""
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return await func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> dict:
+        return {name: histogram.summary()
+                for name, histogram in sorted(self.histograms.items())}
+
+    def write_json(self, path: str):
+        """Write the current summaries to a JSON metrics file."""
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    def prometheus_text(self) -> str:
+        """Render the histograms in Prometheus text exposition format."""
+        lines = [
+            '# HELP graphiti_operation_seconds Latency of instrumented operations.',
+            '# TYPE graphiti_operation_seconds histogram',
+        ]
+        for name, histogram in sorted(self.histograms.items()):
+            cumulative = 0
+            # Every boundary, so each series has the same buckets in every scrape
+            for bound, bucket_count in zip(BUCKETS, histogram.counts):
+                cumulative += bucket_count
+                lines.append(
+                    f'graphiti_operation_seconds_bucket{{operation="{name}",'
+                    f'le="{bound:.6g}"}} {cumulative}')
+            lines.append(
+                f'graphiti_operation_seconds_bucket{{operation="{name}",le="+Inf"}} '
+                f'{histogram.count}')
+            lines.append(
+                f'graphiti_operation_seconds_sum{{operation="{name}"}} {histogram.total}')
+            lines.append(
+                f'graphiti_operation_seconds_count{{operation="{name}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def report(self):
+        """Print a p50/p95/p99 table of every operation."""
+        print(f"\n{'operation':<28}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for name, summary in self.snapshot().items():
+            print(f"{name:<28}{summary['count']:>8}"
+                  f"{summary['p50'] * 1000:>10.1f}{summary['p95'] * 1000:>10.1f}"
+                  f"{summary['p99'] * 1000:>10.1f}")
+
+
+metrics = Metrics()
+
+
+class TimedDriver:
+    """Neo4j driver proxy that records every ``execute_query`` as a span."""
+
+    def __init__(self, driver):
+        self._driver = driver
+
+    async def execute_query(self, *args, **kwargs):
+        with metrics.span('neo4j.query'):
+            return await self._driver.execute_query(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+
+class TimedEmbedder:
+    """Embedder proxy that records embedding calls as spans."""
+
+    def __init__(self, embedder):
+        self._embedder = embedder
+
+    async def create(self, input_data):
+        with metrics.span('embedding'):
+            return await self._embedder.create(input_data)
+
+    async def create_batch(self, input_data_list):
+        with metrics.span('embedding.batch'):
+            return await self._embedder.create_batch(input_data_list)
+
+    def __getattr__(self, name):
+        return getattr(self._embedder, name)
+
+
+class TimedLLMClient:
+    """LLM client proxy that records extraction calls as spans."""
+
+    def __init__(self, llm_client):
+        self._llm_client = llm_client
+
+    async def generate_response(self, *args, **kwargs):
+        with metrics.span('llm.extraction'):
+            return await self._llm_client.generate_response(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._llm_client, name)
+
+
+class TimedCrossEncoder:
+    """Cross-encoder proxy that records reranking calls as spans."""
+
+    def __init__(self, cross_encoder):
+        self._cross_encoder = cross_encoder
+
+    async def rank(self, query, passages):
+        with metrics.span('rerank.cross_encoder'):
+            return await self._cross_encoder.rank(query, passages)
+
+    def __getattr__(self, name):
+        return getattr(self._cross_encoder, name)
@@ -1,21 +1,48 @@
 from __future__ import annotations
-from typing import Dict, List, Optional
-from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple, Union
+from dataclasses import dataclass, field
+from datetime import datetime
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
-from rich.markdown import Markdown
-from rich.console import Console
-from rich.live import Live
 import asyncio
 import os
-
-from pydantic_ai.providers.openai import OpenAIProvider
-from pydantic_ai.models.openai import OpenAIModel
-from pydantic_ai import Agent, RunContext
+import re
+
+from pydantic_ai import Agent, ModelRetry, RunContext
+from pydantic_ai.messages import (
+    ModelRequest,
+    ModelResponse,
+    SystemPromptPart,
+    TextPart,
+    UserPromptPart,
+)
+from pydantic_ai.settings import ModelSettings
 from graphiti_core import Graphiti
+from answer_cache import CachedAnswer, get_answer_cache
+from graphiti_client import build_indices_once, close_graphiti, get_graphiti
+from instrumentation import metrics
+from connection import Connection
+from search_cache import get_search_cache
+from tool_payload import format_facts
 
 load_dotenv()
 
+# 'tsv' or 'json' return a trimmed text payload; 'models' the full result models
+SEARCH_TOOL_FORMAT = os.getenv('SEARCH_TOOL_FORMAT', 'tsv')
+SEARCH_TOOL_MAX_FACTS = int(os.getenv('SEARCH_TOOL_MAX_FACTS', '10'))
+SEARCH_TOOL_MAX_CHARS = int(os.getenv('SEARCH_TOOL_MAX_CHARS', '4000'))
+# Search the raw user input while the model picks its own query
+SPECULATIVE_SEARCH = os.getenv('SPECULATIVE_SEARCH', 'true').lower() in ('1', 'true', 'yes')
+SPECULATIVE_MATCH = float(os.getenv('SPECULATIVE_MATCH', '0.75'))
+# Tenant the CLI agent searches; unset searches every group
+GROUP_ID = os.getenv('GROUP_ID') or None
+
+STOPWORDS = frozenset(
+    'a an and any are about can could did do does for from had has have how i in is it '
+    'its know me of on or please tell that the their there these this to was were what '
+    'when where which who whom why with would you'.split())
+TERM_RE = re.compile(r'[\w.]+')
+
 # ========== Define dependencies ==========
 
 
@@ -23,6 +50,61 @@ load_dotenv()
 class GraphitiDependencies:
     """Dependencies for the Graphiti agent."""
     graphiti_client: Graphiti
+    prefetch: Optional[SpeculativeSearch] = None
+    # Group the searches are scoped to; None searches every group
+    group_id: Optional[str] = None
+    # Facts the searches of this turn returned, recorded with a cached answer
+    fact_uuids: Set[str] = field(default_factory=set)
+    point_in_time: bool = False
+
+
+def query_terms(text: str) -> frozenset:
+    """Content words of a question or search query, for equivalence checks."""
+    return frozenset(term.strip('.') for term in TERM_RE.findall(text.lower())
+                     if term.strip('.') and term not in STOPWORDS)
+
+
+class SpeculativeSearch:
+    """A search on the raw user input, started before the model calls the tool.
+
+    The model usually searches for a rephrasing of the user's question; when
+    its query has nearly the same content words the tool returns this result
+    instead of starting a second round-trip.
+    """
+
+    def __init__(self, graphiti: Graphiti, user_input: str, group_id: Optional[str] = None):
+        self.terms = query_terms(user_input)
+        self.task = asyncio.create_task(
+            run_search(graphiti, user_input, group_id=group_id))
+
+    def matches(self, query: str) -> bool:
+        terms = query_terms(query)
+        if not self.terms or not terms:
+            return False
+        return len(self.terms & terms) / len(self.terms | terms) >= SPECULATIVE_MATCH
+
+    async def result(self):
+        """The prefetched payload and fact uuids, or None if the search failed."""
+        try:
+            result = await asyncio.shield(self.task)
+        except Exception:
+            return None
+        return result
+
+    def cancel(self):
+        if not self.task.done():
+            self.task.cancel()
+        elif not self.task.cancelled():
+            # Mark a failure retrieved so an unused prefetch does not warn
+            self.task.exception()
+
+
+def start_prefetch(graphiti: Graphiti, user_input: str, group_id: Optional[str] = None
+                   ) -> Optional[SpeculativeSearch]:
+    """Start a speculative search for a new user turn unless disabled."""
+    if not SPECULATIVE_SEARCH or not query_terms(user_input):
+        return None
+    return SpeculativeSearch(graphiti, user_input, group_id)
 
 # ========== Helper function to get model configuration ==========
 
@@ -31,19 +113,12 @@ def get_model():
     """Configure and return the LLM model to use."""
     model_choice = os.getenv('MODEL_CHOICE', 'gpt-4.1-mini')
     api_key = os.getenv('OPENAI_API_KEY', 'no-api-key-provided')
+    from pydantic_ai.models.openai import OpenAIModel
+    from pydantic_ai.providers.openai import OpenAIProvider
 
     return OpenAIModel(model_choice, provider=OpenAIProvider(api_key=api_key))
 
 
-# ========== Create the Graphiti agent ==========
-graphiti_agent = Agent(
-    get_model(),
-    system_prompt="""You are a helpful assistant with access to a knowledge graph filled with temporal data about LLMs.
-    When the user asks you a question, use your search tool to query the knowledge graph and then answer honestly.
-    Be willing to admit when you didn't find the information necessary to answer the question.""",
-    deps_type=GraphitiDependencies
-)
-
 # ========== Define a result model for Graphiti search ==========
 
 
@@ -62,25 +137,30 @@ class GraphitiSearchResult(BaseModel):
 # ========== Graphiti search tool ==========
 
 
-@graphiti_agent.tool
-async def search_graphiti(ctx: RunContext[GraphitiDependencies], query: str) -> List[GraphitiSearchResult]:
-    """Search the Graphiti knowledge graph with the given query.
-
-    Args:
-        ctx: The run context containing dependencies
-        query: The search query to find information in the knowledge graph
+async def run_search(graphiti: Graphiti, query: str, as_of: Optional[datetime] = None,
+                     group_id: Optional[str] = None
+                     ) -> Tuple[Union[str, List[GraphitiSearchResult]], List[str]]:
+    """Search the graph and build the tool payload in SEARCH_TOOL_FORMAT.
 
-    Returns:
-        A list of search results containing facts that match the query
+    Also returns the uuids of the still valid facts in the payload, the ones
+    a cached answer must be dropped for once they are invalidated.
     """
-    # Access the Graphiti client from dependencies
-    graphiti = ctx.deps.graphiti_client
-
-    try:
-        # Perform the search
-        results = await graphiti.search(query)
-
-        # Format the results
+    if SEARCH_TOOL_FORMAT != 'models':
+        # Lean projection straight into a trimmed text payload
+        with metrics.span('agent.search_graphiti'):
+            facts = await Connection(graphiti, group_id).search_facts(
+                query, num_results=SEARCH_TOOL_MAX_FACTS, as_of=as_of)
+        with metrics.span('format.search_graphiti'):
+            payload = format_facts(
+                facts, SEARCH_TOOL_FORMAT, SEARCH_TOOL_MAX_FACTS, SEARCH_TOOL_MAX_CHARS)
+        return payload, [fact['uuid'] for fact in facts if not fact['invalid_at']]
+
+    # Perform the search, reusing cached results for repeated queries
+    with metrics.span('agent.search_graphiti'):
+        results = await Connection(graphiti, group_id).search_edges(query, as_of=as_of)
+
+    # Format the results
+    with metrics.span('format.search_graphiti'):
         formatted_results = []
         for result in results:
             formatted_result = GraphitiSearchResult(
@@ -98,43 +178,165 @@ async def search_graphiti(ctx: RunContext[GraphitiDependencies], query: str) ->
 
             formatted_results.append(formatted_result)
 
-        return formatted_results
+    return formatted_results, [result.uuid for result in formatted_results
+                               if not result.invalid_at]
+
+
+async def search_graphiti(ctx: RunContext[GraphitiDependencies], query: str,
+                          as_of: Optional[str] = None) -> Union[str, List[GraphitiSearchResult]]:
+    """Search the Graphiti knowledge graph with the given query.
+
+    Args:
+        ctx: The run context containing dependencies
+        query: The search query to find information in the knowledge graph
+        as_of: Optional ISO 8601 date or datetime (e.g. 2025-03-01). Only facts
+            that were valid at that point in time are returned; use it for
+            questions about what was true at a past date.
+
+    Returns:
+        Facts that match the query, with their uuid, validity period and source node
+    """
+    # Access the Graphiti client from dependencies
+    graphiti = ctx.deps.graphiti_client
+    try:
+        as_of_time = datetime.fromisoformat(as_of) if as_of else None
+    except ValueError:
+        raise ModelRetry(f'as_of must be an ISO 8601 date, got {as_of!r}')
+
+    prefetch = ctx.deps.prefetch
+    if as_of_time is None and prefetch is not None and prefetch.matches(query):
+        # Usually already finished while the model was choosing the query
+        with metrics.span('agent.prefetch_wait'):
+            result = await prefetch.result()
+        if result is not None:
+            payload, fact_uuids = result
+            ctx.deps.fact_uuids.update(fact_uuids)
+            return payload
+
+    # Answers about the past rely on facts that are no longer valid
+    ctx.deps.point_in_time = ctx.deps.point_in_time or as_of_time is not None
+    try:
+        payload, fact_uuids = await run_search(
+            graphiti, query, as_of_time, ctx.deps.group_id)
+        ctx.deps.fact_uuids.update(fact_uuids)
+        return payload
     except Exception as e:
         # Log the error but don't close the connection since it's managed by the dependency
         print(f"Error searching Graphiti: {str(e)}")
         raise
 
+# ========== Create the Graphiti agent ==========
+
+SYSTEM_PROMPT = """You are a helpful assistant with access to a knowledge graph filled with temporal data about LLMs.
+    When the user asks you a question, use your search tool to query the knowledge graph and then answer honestly.
+    When a question needs several independent lookups, issue all of the searches at once.
+    Be willing to admit when you didn't find the information necessary to answer the question."""
+
+_agent: Optional[Agent] = None
+
+
+def get_agent() -> Agent:
+    """Return the Graphiti agent, building the model client on first use."""
+    global _agent
+    if _agent is None:
+        agent = Agent(
+            get_model(),
+            system_prompt=SYSTEM_PROMPT,
+            deps_type=GraphitiDependencies,
+            # Tool calls from one response run concurrently, so let the model batch them
+            model_settings=ModelSettings(parallel_tool_calls=True),
+        )
+        agent.tool(search_graphiti)
+        _agent = agent
+    return _agent
+
+
+def __getattr__(name):
+    # Importing the module stays cheap; ``graphiti_agent`` is built when first used
+    if name == 'graphiti_agent':
+        return get_agent()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+# ========== Semantic answer cache ==========
+
+
+async def cached_answer(graphiti: Graphiti, question: str, history: list,
+                        group_id: Optional[str] = None
+                        ) -> Tuple[Optional[CachedAnswer], Optional[List[float]]]:
+    """Look up a cached answer to a standalone question from ``group_id``.
+
+    Follow-ups depend on the conversation, so only questions asked without
+    history use the cache. Returns the hit, if any, and the question
+    embedding a fresh answer is stored under.
+    """
+    cache = get_answer_cache()
+    if cache is None or history:
+        return None, None
+    try:
+        with metrics.span('agent.answer_cache'):
+            vector = await graphiti.embedder.create(question.replace('\n', ' '))
+            return await cache.get(graphiti.driver, vector, group_id or ''), vector
+    except Exception as e:
+        print(f"Answer cache lookup failed: {str(e)}")
+        return None, None
+
+
+def remember_answer(question: str, vector: Optional[List[float]], answer: str,
+                    deps: GraphitiDependencies):
+    """Cache a generated answer together with the facts it was built on."""
+    cache = get_answer_cache()
+    if cache is None or vector is None or not deps.fact_uuids or deps.point_in_time:
+        return
+    cache.put(question, vector, answer, deps.fact_uuids, deps.group_id or '')
+
+
+def answer_messages(question: str, answer: str) -> list:
+    """A cached exchange in the form the chat history records agent runs."""
+    return [
+        # The agent only sends its system prompt with an empty history
+        ModelRequest(parts=[SystemPromptPart(SYSTEM_PROMPT), UserPromptPart(question)]),
+        ModelResponse(parts=[TextPart(answer)]),
+    ]
+
 # ========== Main execution function ==========
 
 
 async def main():
     """Run the Graphiti agent with user queries."""
+    from rich.console import Console
+
+    from conversation_memory import ConversationMemory
+    from stream_render import StreamingMarkdown
+
     print("Graphiti Agent - Powered by Pydantic AI, Graphiti, and Neo4j")
     print("Enter 'exit' to quit the program.")
 
-    # Neo4j connection parameters
-    neo4j_uri = os.environ.get('NEO4J_URI', 'bolt://localhost:7687')
-    neo4j_user = os.environ.get('NEO4J_USER', 'neo4j')
-    neo4j_password = os.environ.get('NEO4J_PASSWORD', 'password')
-
-    # Initialize Graphiti with Neo4j connection
-    graphiti_client = Graphiti(neo4j_uri, neo4j_user, neo4j_password)
+    # Borrow the shared Graphiti client (or the group's routed one) and its
+    # connection pool
+    graphiti_client = get_graphiti(GROUP_ID)
 
     # Initialize the graph database with graphiti's indices if needed
     try:
-        await graphiti_client.build_indices_and_constraints()
+        await build_indices_once(graphiti_client)
         print("Graphiti indices built successfully.")
     except Exception as e:
         print(f"Note: {str(e)}")
         print("Continuing with existing indices...")
 
     console = Console()
-    messages = []
+    memory = ConversationMemory(
+        token_budget=int(os.getenv('MEMORY_TOKEN_BUDGET', '6000')),
+        keep_turns=int(os.getenv('MEMORY_KEEP_TURNS', '4')),
+        graphiti=graphiti_client
+        if os.getenv('STORE_SESSION_EPISODES', '').lower() in ('1', 'true', 'yes')
+        else None,
+        group_id=GROUP_ID,
+    )
 
     try:
         while True:
-            # Get user input
-            user_input = input("\n[You] ")
+            # Read input in a thread so session turns keep being stored meanwhile
+            user_input = await asyncio.to_thread(input, "\n[You] ")
 
             # Check if user wants to exit
             if user_input.lower() in ['exit', 'quit', 'bye', 'goodbye']:
@@ -144,27 +346,55 @@ async def main():
             try:
                 # Process the user input and output the response
                 print("\n[Assistant]")
-                with Live('', console=console, vertical_overflow='visible') as live:
-                    # Pass the Graphiti client as a dependency
+                history = memory.history()
+                hit, question_vector = await cached_answer(
+                    graphiti_client, user_input, history, GROUP_ID)
+                if hit is not None:
+                    # A paraphrase of an answered question; no LLM call needed
+                    with StreamingMarkdown(console) as renderer:
+                        renderer.append(hit.answer)
+                    await memory.add_turn(answer_messages(user_input, hit.answer))
+                    console.print(
+                        f"[dim]cached answer · {len(hit.fact_uuids)} supporting facts[/dim]")
+                    continue
+
+                with metrics.span('agent.turn'), StreamingMarkdown(console) as renderer:
+                    # Pass the Graphiti client and the speculative search as dependencies
                     deps = GraphitiDependencies(
-                        graphiti_client=graphiti_client)
-
-                    async with graphiti_agent.run_stream(
-                        user_input, message_history=messages, deps=deps
-                    ) as result:
-                        curr_message = ""
-                        async for message in result.stream_text(delta=True):
-                            curr_message += message
-                            live.update(Markdown(curr_message))
-
-                    # Add the new messages to the chat history
-                    messages.extend(result.all_messages())
+                        graphiti_client=graphiti_client,
+                        prefetch=start_prefetch(graphiti_client, user_input, GROUP_ID),
+                        group_id=GROUP_ID)
+
+                    answer = []
+                    try:
+                        async with get_agent().run_stream(
+                            user_input, message_history=history, deps=deps
+                        ) as result:
+                            # Only the unfinished trailing block is re-rendered
+                            async for message in result.stream_text(delta=True):
+                                renderer.append(message)
+                                answer.append(message)
+                    finally:
+                        if deps.prefetch is not None:
+                            deps.prefetch.cancel()
+
+                # Add this turn to the budgeted chat history
+                await memory.add_turn(result.new_messages())
+                remember_answer(user_input, question_vector, ''.join(answer), deps)
+                console.print(
+                    f"[dim]prompt tokens: {result.usage().request_tokens} · "
+                    f"history ≈ {memory.estimate_tokens()} tokens[/dim]")
 
             except Exception as e:
                 print(f"\n[Error] An error occurred: {str(e)}")
     finally:
         # Close the Graphiti connection when done
-        await graphiti_client.close()
+        await memory.close()
+        print(f"\nSearch cache: {get_search_cache().stats()}")
+        if get_answer_cache() is not None:
+            print(f"Answer cache: {get_answer_cache().stats()}")
+        metrics.report()
+        await close_graphiti()
         print("\nGraphiti connection closed.")
 
 if __name__ == "__main__":
@@ -6,7 +6,9 @@ It creates episodes about different LLMs, then updates them to show how
 the field evolves over time.
 """
 
+import argparse
 import asyncio
+import hashlib
 import json
 import logging
 import os
@@ -16,15 +18,15 @@ from logging import INFO
 from dotenv import load_dotenv
 from graphiti_core import Graphiti
 from graphiti_core.nodes import EpisodeType
-from graphiti_core.utils.maintenance.graph_data_operations import clear_data
 from connection import Connection
-from llm_constants import *
+from graphiti_client import build_indices_once, close_graphiti, get_graphiti
+from llm_constants import PHASE1_EPISODES, PHASE2_EPISODES, PHASE3_EPISODES
 
 
 class LLM_Knowledge:
     """LLM Knowledge Class"""
 
-    def __init__(self):
+    def __init__(self, interactive=True, group_id=None):
         logging.basicConfig(
             level=INFO,
             format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -35,22 +37,49 @@ class LLM_Knowledge:
 
         load_dotenv()
 
-        # Neo4j connection parameters
-        neo4j_uri = os.environ.get('NEO4J_URI', 'bolt://localhost:7687')
-        neo4j_user = os.environ.get('NEO4J_USER', 'neo4j')
-        neo4j_password = os.environ.get('NEO4J_PASSWORD', 'password')
+        # Neo4j settings are read once by the shared client in graphiti_client
 
-        if not neo4j_uri or not neo4j_user or not neo4j_password:
-            raise ValueError(
-                'NEO4J_URI, NEO4J_USER, and NEO4J_PASSWORD must be set')
+        # Episodes extracted by the LLM ahead of the in-order commits
+        self.ingest_concurrency = int(
+            os.environ.get('INGEST_CONCURRENCY', '1'))
+        # 'episode' uses add_episode per episode, 'bulk' uses add_episode_bulk
+        self.ingest_mode = os.environ.get('INGEST_MODE', 'episode')
+        # Without a terminal, prompts are answered with 'continue'
+        self.interactive = interactive
+        # Loads, checks and clears only this group; None is the whole graph
+        self.group_id = group_id
+        self.group_ids = [group_id] if group_id is not None else None
 
     async def check_llm_data_exists(self, graphiti):
         """Check if LLM knowledge data already exists in the graph."""
-        result = await graphiti.driver.execute_query("MATCH (n1)-[r]->(n2) RETURN * LIMIT 1")
-        return bool(result.records)
+        stats = await Connection(graphiti, self.group_id).graph_stats()
+        return stats.episodes > 0 or stats.edges > 0
+
+    async def load_manifest(self, graphiti):
+        """Return the hashes of the group's episodes recorded as ingested."""
+        result = await graphiti.driver.execute_query(
+            "MATCH (m:IngestManifest) WHERE coalesce(m.group_id, '') = $group_id "
+            "RETURN m.hash AS hash",
+            group_id=self.group_id or '')
+        return {record['hash'] for record in result.records}
+
+    async def record_manifest(self, graphiti, episodes, prefix):
+        """Record episodes as ingested in the graph's manifest."""
+        await graphiti.driver.execute_query(
+            """
+            UNWIND $hashes AS hash
+            MERGE (m:IngestManifest {hash: hash, group_id: $group_id})
+            SET m.prefix = $prefix, m.ingested_at = datetime()
+            """,
+            hashes=[episode_hash(episode) for episode in episodes],
+            prefix=prefix,
+            group_id=self.group_id or '',
+        )
 
     async def get_user_choice(self):
         """Get user choice to continue or quit."""
+        if not self.interactive:
+            return 'continue'
         while True:
             choice = input(
                 "\nType 'continue' to proceed or 'quit' to exit: ").strip().lower()
@@ -58,6 +87,41 @@ class LLM_Knowledge:
                 return choice
             print("Invalid input. Please type 'continue' or 'quit'.")
 
+    async def ingest(self, graphiti, episodes, prefix):
+        """Ingest new or changed episodes using the configured ingestion mode.
+
+        Episodes whose content hash is already in the manifest are skipped,
+        and each episode is recorded there as soon as it commits, so an
+        interrupted phase resumes with the episodes it had not reached. The
+        rest keep the names of their positions in the phase.
+        Returns the number of episodes ingested.
+        """
+        manifest = await self.load_manifest(graphiti)
+        indices = [
+            i for i, episode in enumerate(episodes)
+            if episode_hash(episode) not in manifest
+        ]
+        episodes = [episodes[i] for i in indices]
+        if not episodes:
+            print(f"{prefix}: all episodes already loaded, skipping.")
+            return 0
+
+        async def record(added):
+            await self.record_manifest(graphiti, added, prefix)
+
+        if self.ingest_mode == 'bulk':
+            await Connection.add_bulk_episodes(
+                graphiti, episodes, prefix,
+                # The manifest already resumes an interrupted phase
+                checkpoint_path=None, group_id=self.group_id,
+                on_added=record, indices=indices)
+        else:
+            await Connection.add_episodes(
+                graphiti, episodes, prefix,
+                concurrency=self.ingest_concurrency, group_id=self.group_id,
+                on_added=record, indices=indices)
+        return len(episodes)
+
     async def phase1_current_llms(self, graphiti):
         """Phase 1: Add episodes about current top LLMs."""
         print("\n=== PHASE 1: CURRENT TOP LLMs ===")
@@ -65,11 +129,12 @@ class LLM_Knowledge:
         # Episodes about current LLMs
         episodes = PHASE1_EPISODES
 
-        await Connection.add_episodes(graphiti, episodes, "Current LLMs")
+        if not await self.ingest(graphiti, episodes, "Current LLMs"):
+            return
 
         # Perform a search to show the results
         print("\nSearching for: 'Which is the best LLM?'")
-        results = await graphiti.search('Which is the best LLM?')
+        results = await graphiti.search('Which is the best LLM?', group_ids=self.group_ids)
 
         print('\nSearch Results:')
         for result in results:
@@ -83,11 +148,12 @@ class LLM_Knowledge:
         # Episodes about Claude 4 becoming the best LLM
         episodes = PHASE2_EPISODES
 
-        await Connection.add_episodes(graphiti, episodes, "Claude 4 Era")
+        if not await self.ingest(graphiti, episodes, "Claude 4 Era"):
+            return
 
         # Perform a search to show the results
         print("\nSearching for: 'Which is the best LLM now?'")
-        results = await graphiti.search('Which is the best LLM now?')
+        results = await graphiti.search('Which is the best LLM now?', group_ids=self.group_ids)
 
         print('\nSearch Results:')
         for result in results:
@@ -101,53 +167,100 @@ class LLM_Knowledge:
         # Episodes about MLMs replacing LLMs
         episodes = PHASE3_EPISODES
 
-        await Connection.add_episodes(graphiti, episodes, "MLM Revolution")
+        if not await self.ingest(graphiti, episodes, "MLM Revolution"):
+            return
 
         # Perform a search to show the results
         print("\nSearching for: 'Are LLMs still relevant?'")
-        results = await graphiti.search('Are LLMs still relevant?')
+        results = await graphiti.search('Are LLMs still relevant?', group_ids=self.group_ids)
 
         print('\nSearch Results:')
         for result in results:
             print(f'Fact: {result.fact}')
             print('---')
 
-    async def run_llm_knowledge_demo(self, graphiti):
-        """Main function to run the LLM evolution demonstration."""
-        try:
-            if await self.check_llm_data_exists(graphiti):
-                print("LLM knowledge data already exists. Skipping data loading.")
-            else:
-                # Clear existing data
-                print("Do you want to clear existing data?")
-                choice = await self.get_user_choice()
-                if choice == 'quit':
-                    return
-
-                print("Clearing existing graph data...")
-                await clear_data(graphiti.driver)
-                print("Graph data cleared successfully.")
-
-                # Phase 1: Current top LLMs with Gemini 2.5 Pro as the best
-                await self.phase1_current_llms(graphiti)
-
-                # Wait for user input
-                choice = await self.get_user_choice()
-                if choice == 'quit':
-                    return
-
-                # Phase 2: Claude 4 emerges as the new best LLM
-                await self.phase2_claude4_emerges(graphiti)
-
-                # Wait for user input
-                choice = await self.get_user_choice()
-                if choice == 'quit':
-                    return
-
-                # Phase 3: MLMs make LLMs irrelevant
-                await self.phase3_mlm_revolution(graphiti)
-
-        finally:
-            # Close the connection
-            await graphiti.close()
-            print('\nConnection closed')
+    async def run_llm_knowledge_demo(self, graphiti, reload=False):
+        """Main function to run the LLM evolution demonstration.
+
+        Only episodes missing from the manifest are ingested, so a repeated
+        run is cheap. ``reload`` clears the graph (or just the group) and
+        ingests every phase.
+        """
+        if reload:
+            # Clear existing data
+            print("Do you want to clear existing data?")
+            choice = await self.get_user_choice()
+            if choice == 'quit':
+                return
+
+            print("Clearing existing graph data...")
+            await Connection(graphiti, self.group_id).clear_data()
+            print("Graph data cleared successfully.")
+        elif not await self.load_manifest(graphiti) \
+                and await self.check_llm_data_exists(graphiti):
+            print("LLM knowledge data exists but was loaded without a manifest. "
+                  "Skipping data loading; use --reload to rebuild it.")
+            return
+
+        # Phase 1: Current top LLMs with Gemini 2.5 Pro as the best
+        await self.phase1_current_llms(graphiti)
+
+        # Wait for user input
+        choice = await self.get_user_choice()
+        if choice == 'quit':
+            return
+
+        # Phase 2: Claude 4 emerges as the new best LLM
+        await self.phase2_claude4_emerges(graphiti)
+
+        # Wait for user input
+        choice = await self.get_user_choice()
+        if choice == 'quit':
+            return
+
+        # Phase 3: MLMs make LLMs irrelevant
+        await self.phase3_mlm_revolution(graphiti)
+
+
+def episode_hash(episode):
+    """Return a stable content hash for a fixture episode."""
+    payload = json.dumps(
+        {
+            'content': episode['content'],
+            'type': episode['type'].value,
+            'description': episode['description'],
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def parse_args(argv=None):
+    """Parse the loader's command line options."""
+    parser = argparse.ArgumentParser(description="Load the LLM knowledge fixtures.")
+    parser.add_argument(
+        '-y', '--yes', action='store_true',
+        help="run non-interactively, answering 'continue' to every prompt")
+    parser.add_argument(
+        '--reload', action='store_true',
+        help="clear the graph and ingest every phase again")
+    parser.add_argument(
+        '--group-id', default=os.environ.get('GROUP_ID') or None,
+        help="load, check and clear only this group (default: GROUP_ID)")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    graphiti = get_graphiti(args.group_id)
+    try:
+        await build_indices_once(graphiti)
+        await LLM_Knowledge(
+            interactive=not args.yes, group_id=args.group_id).run_llm_knowledge_demo(
+            graphiti, reload=args.reload)
+    finally:
+        await close_graphiti()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,382 @@
+"""
+Neighborhood snapshot cache
+
+Keeps the k-hop neighborhood of frequently used center nodes in process, so
+graph-distance reranking around a hot entity needs no shortest-path query
+and its nodes are hydrated without a round-trip. A center gets a snapshot
+once it has been used ``min_uses`` times: the ball of up to ``hops`` hops is
+fetched hop by hop and stored as CSR adjacency over interned uuids, with
+each node's hop distance from the center and its ``EntityNode`` (name,
+summary, labels and attributes, no embedding).
+
+Candidates outside a snapshot's ball are resolved with one shortest-path
+query for just those nodes. Episodes ingested through ``Connection`` refresh
+the snapshots they touch: an edge inside a ball is added in place, node
+summaries are replaced, and an edge that could pull new nodes into a ball
+marks it stale so it is rebuilt on next use. Bulk loads drop every
+snapshot, and a fetch that overlaps a bulk load or a clear is discarded
+rather than cached. A fetch that fails falls back to the uncached query. The total number of nodes and
+adjacency entries is bounded by ``max_entries``, evicting the least recently
+used snapshots.
+"""
+
+import asyncio
+import os
+import sys
+from collections import OrderedDict
+
+import numpy as np
+from graphiti_core.helpers import DEFAULT_DATABASE
+from graphiti_core.nodes import EntityNode, get_entity_node_from_record
+from graphiti_core.search.search_utils import node_distance_reranker
+
+# Like ENTITY_NODE_RETURN, but the name embedding never leaves the database
+NODE_FIELDS = """
+    m.uuid AS uuid,
+    m.name AS name,
+    m.group_id AS group_id,
+    m.created_at AS created_at,
+    m.summary AS summary,
+    labels(m) AS labels,
+    m {.*, name_embedding: null} AS attributes"""
+
+USE_COUNTS = 10000
+
+
+def bfs_distances(indptr: np.ndarray, indices: np.ndarray, source: int = 0) -> np.ndarray:
+    """Hop distance of every node from ``source`` over CSR adjacency (-1 if unreached)."""
+    distances = np.full(len(indptr) - 1, -1, dtype=np.int32)
+    distances[source] = 0
+    frontier = np.array([source])
+    hop = 0
+    while len(frontier):
+        hop += 1
+        starts, ends = indptr[frontier], indptr[frontier + 1]
+        lengths = ends - starts
+        if not lengths.sum():
+            break
+        # Gather every frontier node's neighbor slice in one go
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        neighbors = np.unique(indices[offsets + np.arange(lengths.sum())])
+        frontier = neighbors[distances[neighbors] < 0]
+        distances[frontier] = hop
+    return distances
+
+
+class Neighborhood:
+    """The ball of ``radius`` hops around one center node, as CSR adjacency."""
+
+    def __init__(self, center: str, radius: int, closed: bool, uuids: list[str],
+                 pairs: np.ndarray):
+        self.center = center
+        self.radius = radius
+        # The ball is the center's whole component; anything else is unreachable
+        self.closed = closed
+        self.uuids = [sys.intern(uuid) for uuid in uuids]
+        self.ids = {uuid: i for i, uuid in enumerate(self.uuids)}
+        self.stale = False
+        self._build(pairs)
+
+    def _build(self, pairs: np.ndarray):
+        # Undirected, deduplicated, sorted by source
+        both = np.concatenate([pairs, pairs[:, ::-1]]) if len(pairs) else pairs
+        both = np.unique(both, axis=0) if len(both) else np.zeros((0, 2), dtype=np.int32)
+        self.indices = both[:, 1].astype(np.int32)
+        self.indptr = np.searchsorted(
+            both[:, 0], np.arange(len(self.uuids) + 1)).astype(np.int32)
+        self.distances = bfs_distances(self.indptr, self.indices)
+
+    @property
+    def size(self) -> int:
+        return len(self.uuids) + len(self.indices)
+
+    def pairs(self) -> np.ndarray:
+        sources = np.repeat(np.arange(len(self.uuids), dtype=np.int32), np.diff(self.indptr))
+        return np.stack([sources, self.indices], axis=1)
+
+    def distance(self, uuid: str) -> int | None:
+        """Hop distance from the center, or None if the node is outside the ball."""
+        i = self.ids.get(uuid)
+        if i is None or self.distances[i] < 0:
+            return None
+        return int(self.distances[i])
+
+    def add_edges(self, edges) -> bool:
+        """Apply ingested ``(source, target)`` uuid pairs; returns whether anything changed."""
+        inside = []
+        for source, target in edges:
+            a, b = self.ids.get(source), self.ids.get(target)
+            if a is not None and b is not None:
+                inside.append((a, b))
+            elif a is not None or b is not None:
+                hop = self.distances[a if a is not None else b]
+                # A node reached from inside the radius joins the ball, along
+                # with neighbors this snapshot has never seen
+                if self.closed or hop < self.radius:
+                    self.stale = True
+                    return True
+        if not inside:
+            return False
+        self._build(np.concatenate([self.pairs(), np.asarray(inside, dtype=np.int32)]))
+        return True
+
+
+async def shortest_distances(driver, center_uuid: str, uuids: list[str]) -> dict[str, int]:
+    """Shortest RELATES_TO path length from the center to each reachable node."""
+    records, _, _ = await driver.execute_query(
+        """
+        UNWIND $node_uuids AS node_uuid
+        MATCH p = SHORTEST 1 (center:Entity {uuid: $center_uuid})-[:RELATES_TO]-+(n:Entity {uuid: node_uuid})
+        RETURN length(p) AS score, node_uuid AS uuid
+        """,
+        node_uuids=uuids,
+        center_uuid=center_uuid,
+        database_=DEFAULT_DATABASE,
+        routing_='r',
+    )
+    return {record['uuid']: record['score'] for record in records}
+
+
+class NeighborhoodCache:
+    """Memory-bounded k-hop snapshots of hot center nodes, kept fresh by ingestion."""
+
+    def __init__(self, hops: int = 2, max_nodes: int = 2000, max_entries: int = 200000,
+                 min_uses: int = 2):
+        self.hops = max(1, hops)
+        self.max_nodes = max_nodes
+        self.max_entries = max_entries
+        self.min_uses = max(1, min_uses)
+        self.snapshots: 'OrderedDict[str, Neighborhood]' = OrderedDict()
+        # Node models shared by every snapshot holding them
+        self.nodes: dict[str, EntityNode] = {}
+        self.refcounts: dict[str, int] = {}
+        self.uses: 'OrderedDict[str, int]' = OrderedDict()
+        self.size = 0
+        self._inflight: dict[str, asyncio.Task] = {}
+        # Edges ingested while a center's snapshot was being fetched
+        self._replay: dict[str, list] = {}
+        # Bumped by invalidate() and clear(), so fetches started before are discarded
+        self._generation = 0
+        self.hits = 0
+        self.partial = 0
+        self.misses = 0
+        self.builds = 0
+        self.refreshes = 0
+        self.node_hits = 0
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    async def get(self, driver, center_uuid: str) -> Neighborhood | None:
+        """Return the center's snapshot, building it once the center is hot."""
+        uses = self.uses.pop(center_uuid, 0) + 1
+        self.uses[center_uuid] = uses
+        while len(self.uses) > USE_COUNTS:
+            self.uses.popitem(last=False)
+
+        neighborhood = self.snapshots.get(center_uuid)
+        if neighborhood is not None and not neighborhood.stale:
+            self.snapshots.move_to_end(center_uuid)
+            return neighborhood
+        if neighborhood is None and uses < self.min_uses:
+            return None
+
+        task = self._inflight.get(center_uuid)
+        if task is None:
+            task = self._inflight[center_uuid] = asyncio.create_task(
+                self._refresh(driver, center_uuid))
+            task.add_done_callback(lambda _: self._inflight.pop(center_uuid, None))
+        return await asyncio.shield(task)
+
+    async def _refresh(self, driver, center_uuid: str) -> Neighborhood | None:
+        generation = self._generation
+        self._replay[center_uuid] = []
+        try:
+            built = await self._fetch(driver, center_uuid)
+        finally:
+            replay = self._replay.pop(center_uuid, [])
+        if generation != self._generation:
+            # Cleared or bulk-loaded while fetching; the snapshot may be out of date
+            return None
+        self._drop(center_uuid)
+        if built is None:
+            return None
+        neighborhood, nodes = built
+        # The fetch may or may not have seen edges ingested meanwhile
+        neighborhood.add_edges(replay)
+        self.builds += 1
+        self.snapshots[center_uuid] = neighborhood
+        self.size += neighborhood.size
+        for node in nodes:
+            self.nodes.setdefault(node.uuid, node)
+            self.refcounts[node.uuid] = self.refcounts.get(node.uuid, 0) + 1
+        self._evict()
+        return neighborhood
+
+    async def _fetch(self, driver, center_uuid: str):
+        records, _, _ = await driver.execute_query(
+            'MATCH (m:Entity {uuid: $uuid}) RETURN' + NODE_FIELDS,
+            uuid=center_uuid,
+            database_=DEFAULT_DATABASE,
+            routing_='r',
+        )
+        if not records:
+            return None
+        nodes = {center_uuid: get_entity_node_from_record(records[0])}
+        pairs: list[tuple[str, str]] = []
+        frontier, radius, closed = [center_uuid], 0, False
+        limit = 2 * self.max_nodes
+        for hop in range(1, self.hops + 1):
+            records, _, _ = await driver.execute_query(
+                """
+                UNWIND $uuids AS uuid
+                MATCH (n:Entity {uuid: uuid})-[:RELATES_TO]-(m:Entity)
+                WITH m, collect(DISTINCT n.uuid) AS sources
+                LIMIT $limit
+                RETURN sources,""" + NODE_FIELDS,
+                uuids=frontier,
+                limit=limit,
+                database_=DEFAULT_DATABASE,
+                routing_='r',
+            )
+            new = [record for record in records if record['uuid'] not in nodes]
+            # Only whole hops are kept, so every distance in the ball is exact
+            if len(records) >= limit or len(nodes) + len(new) > self.max_nodes:
+                break
+            for record in new:
+                nodes[record['uuid']] = get_entity_node_from_record(record)
+            pairs += [(source, record['uuid'])
+                      for record in records for source in record['sources']]
+            radius = hop
+            frontier = [record['uuid'] for record in new]
+            if not frontier:
+                closed = True
+                break
+        if radius == 0 and not closed:
+            # The center alone is of no use; hubs this large stay uncached
+            return None
+
+        uuids = list(nodes)
+        ids = {uuid: i for i, uuid in enumerate(uuids)}
+        pair_ids = np.asarray([(ids[a], ids[b]) for a, b in pairs],
+                              dtype=np.int32).reshape(-1, 2)
+        return Neighborhood(center_uuid, radius, closed, uuids, pair_ids), list(nodes.values())
+
+    def _drop(self, center_uuid: str):
+        neighborhood = self.snapshots.pop(center_uuid, None)
+        if neighborhood is None:
+            return
+        self.size -= neighborhood.size
+        for uuid in neighborhood.uuids:
+            self.refcounts[uuid] -= 1
+            if not self.refcounts[uuid]:
+                del self.refcounts[uuid]
+                del self.nodes[uuid]
+
+    def _evict(self):
+        while self.size + len(self.nodes) > self.max_entries and len(self.snapshots) > 1:
+            self._drop(next(iter(self.snapshots)))
+
+    async def rerank(self, driver, node_uuids: list[str], center_uuid: str) -> list[str]:
+        """Order nodes by graph distance to the center, like Graphiti's node distance reranker."""
+        try:
+            neighborhood = await self.get(driver, center_uuid)
+        except Exception as e:
+            # A failed snapshot build falls back to the uncached query
+            print(f'Neighborhood snapshot of {center_uuid} failed: {str(e)}')
+            neighborhood = None
+        if neighborhood is None:
+            self.misses += 1
+            return await node_distance_reranker(driver, node_uuids, center_uuid)
+
+        filtered = [uuid for uuid in node_uuids if uuid != center_uuid]
+        scores = {}
+        for uuid in filtered:
+            distance = neighborhood.distance(uuid)
+            if distance is not None:
+                scores[uuid] = distance
+        outside = [uuid for uuid in filtered if uuid not in scores]
+        if outside and not neighborhood.closed:
+            self.partial += 1
+            scores.update(await shortest_distances(driver, center_uuid, outside))
+        else:
+            self.hits += 1
+        filtered.sort(key=lambda uuid: scores.get(uuid, float('inf')))
+        if center_uuid in node_uuids:
+            filtered.insert(0, center_uuid)
+        return filtered
+
+    async def hydrate_nodes(self, driver, uuids: list[str]) -> list[EntityNode]:
+        """Entity nodes by uuid, from the snapshots where possible."""
+        cached = [self.nodes[uuid] for uuid in uuids if uuid in self.nodes]
+        self.node_hits += len(cached)
+        missing = [uuid for uuid in uuids if uuid not in self.nodes]
+        return cached + (await EntityNode.get_by_uuids(driver, missing) if missing else [])
+
+    def add_results(self, results):
+        """Refresh the snapshots an ``AddEpisodeResults`` touches."""
+        for node in results.nodes:
+            if node.uuid in self.nodes:
+                self.nodes[node.uuid] = node.model_copy(update={'name_embedding': None})
+        edges = [(edge.source_node_uuid, edge.target_node_uuid) for edge in results.edges]
+        for replay in self._replay.values():
+            replay += edges
+        for neighborhood in self.snapshots.values():
+            if not neighborhood.stale:
+                size = neighborhood.size
+                if neighborhood.add_edges(edges):
+                    self.refreshes += 1
+                    self.size += neighborhood.size - size
+        self._evict()
+
+    def invalidate(self):
+        """Drop every snapshot, e.g. after a bulk load; hot centers rebuild on next use."""
+        self._generation += 1
+        for center_uuid in list(self.snapshots):
+            self._drop(center_uuid)
+
+    def remove_groups(self, group_ids: list[str]):
+        """Drop the snapshots of cleared groups; a fetch in flight is discarded."""
+        self._generation += 1
+        for center_uuid in list(self.snapshots):
+            if self.nodes[center_uuid].group_id in group_ids:
+                self._drop(center_uuid)
+
+    def clear(self):
+        self._generation += 1
+        self.snapshots.clear()
+        self.nodes.clear()
+        self.refcounts.clear()
+        self.uses.clear()
+        self._replay.clear()
+        self.size = 0
+
+    def stats(self) -> dict:
+        return {
+            'snapshots': len(self.snapshots),
+            'nodes': len(self.nodes),
+            'entries': self.size + len(self.nodes),
+            'hits': self.hits,
+            'partial': self.partial,
+            'misses': self.misses,
+            'builds': self.builds,
+            'refreshes': self.refreshes,
+            'node_hits': self.node_hits,
+        }
+
+
+_neighborhood_cache: NeighborhoodCache | None = None
+
+
+def get_neighborhood_cache() -> NeighborhoodCache | None:
+    """Return the process-wide cache, or None unless NEIGHBORHOOD_CACHE is set."""
+    global _neighborhood_cache
+    if _neighborhood_cache is None and os.environ.get(
+            'NEIGHBORHOOD_CACHE', 'false').lower() in ('1', 'true', 'yes'):
+        _neighborhood_cache = NeighborhoodCache(
+            hops=int(os.environ.get('NEIGHBORHOOD_HOPS', '2')),
+            max_nodes=int(os.environ.get('NEIGHBORHOOD_MAX_NODES', '2000')),
+            max_entries=int(os.environ.get('NEIGHBORHOOD_CACHE_SIZE', '200000')),
+            min_uses=int(os.environ.get('NEIGHBORHOOD_MIN_USES', '2')),
+        )
+    return _neighborhood_cache
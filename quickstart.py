@@ -1,17 +1,17 @@
 import asyncio
 import json
 import logging
-import os
 
 from datetime import datetime, timezone
 from logging import INFO
 
 from dotenv import load_dotenv
 
-from graphiti_core import Graphiti
 from graphiti_core.nodes import EpisodeType
 from connection import Connection
-from llm_knowledge import LLM_Knowledge
+from graphiti_client import build_indices_once, get_graphiti
+from instrumentation import metrics
+from llm_knowledge import LLM_Knowledge, parse_args
 #################################################
 # CONFIGURATION
 #################################################
@@ -29,17 +29,10 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-# Neo4j connection parameters
-# Make sure Neo4j Desktop is running with a local DBMS started
-neo4j_uri = os.environ.get('NEO4J_URI', 'bolt://localhost:7687')
-neo4j_user = os.environ.get('NEO4J_USER', 'neo4j')
-neo4j_password = os.environ.get('NEO4J_PASSWORD', 'password')
 
-if not neo4j_uri or not neo4j_user or not neo4j_password:
-    raise ValueError('NEO4J_URI, NEO4J_USER, and NEO4J_PASSWORD must be set')
+async def main(argv=None):
+    args = parse_args(argv)
 
-
-async def main():
     #################################################
     # INITIALIZATION
     #################################################
@@ -48,23 +41,26 @@ async def main():
     # functionality
     #################################################
 
-    # Initialize Graphiti with Neo4j connection
-    graphiti = Graphiti(neo4j_uri, neo4j_user, neo4j_password)
+    # Borrow the shared Graphiti client; its Neo4j settings and pool
+    # size come from the environment (see graphiti_client.py)
+    graphiti = get_graphiti(args.group_id)
+    graphiti_connection = Connection(graphiti, args.group_id)
 
     try:
         # Initialize the graph database with graphiti's indices. This only needs to be done once.
-        await graphiti.build_indices_and_constraints()
-        graphiti_connection = Connection()
-        llm_knowlodge = LLM_Knowledge()
+        await build_indices_once(graphiti)
+        llm_knowlodge = LLM_Knowledge(interactive=not args.yes, group_id=args.group_id)
 
         #################################################
         # LLM KNOWLEDGE DEMO
         #################################################
         # This section runs a demonstration of how LLM
         # knowledge evolves over time within Graphiti.
-        # It checks if data exists and loads it if not.
+        # Only episodes missing from the graph's ingest
+        # manifest are loaded, so re-runs are cheap.
         #################################################
-        await llm_knowlodge.run_llm_knowledge_demo(graphiti)
+        await llm_knowlodge.run_llm_knowledge_demo(graphiti, reload=args.reload)
+        print(f'\nGraph stats: {await graphiti_connection.graph_stats()}')
 
         query = 'Which AI assistant is from Anthropic?'
         #################################################
@@ -101,6 +97,21 @@ async def main():
         #################################################
         await graphiti_connection.node_search_by_recipe(query)
 
+        #################################################
+        # BATCHED SEARCH
+        #################################################
+        # search_many embeds several queries in a single
+        # request and runs their graph searches
+        # concurrently on the shared connection pool.
+        #################################################
+        batch = await graphiti_connection.search_many([
+            query,
+            'Which is the best LLM?',
+            'Are LLMs still relevant?',
+        ])
+        for item in batch:
+            print(f"{item.query}: {len(item.results.edges)} facts in {item.seconds:.2f}s")
+
     finally:
         #################################################
         # CLEANUP
@@ -110,6 +121,10 @@ async def main():
         #################################################
 
         # Close the connection
+        print(f'\nSearch cache: {graphiti_connection.search_cache.stats()}')
+        if graphiti_connection.neighborhood_cache is not None:
+            print(f'Neighborhood cache: {graphiti_connection.neighborhood_cache.stats()}')
+        metrics.report()
         await graphiti_connection.close()
         print('\nConnection closed')
 
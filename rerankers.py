@@ -0,0 +1,102 @@
+"""
+Vectorized rerankers
+
+Batched NumPy versions of Graphiti's RRF and MMR rerankers plus a weighted
+score fusion. Each reranker scores the candidate pools of many queries in
+one pass over padded ``(queries, candidates)`` arrays instead of looping over
+candidates in Python; ``mask`` marks the real entries of each row.
+"""
+
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+RRF_RANK_CONST = 1
+DEFAULT_MMR_LAMBDA = 0.5
+
+
+def build_pools(rankings: Sequence[Sequence[Sequence[str]]]
+                ) -> Tuple[List[List[str]], np.ndarray, np.ndarray]:
+    """Merge per-query result lists into padded candidate pools.
+
+    ``rankings[q][s]`` is the uuid ranking source ``s`` returned for query
+    ``q``. Returns each query's candidate uuids, a ``(sources, queries,
+    candidates)`` array of 0-based ranks (-1 where a source missed the
+    candidate) and the ``(queries, candidates)`` mask.
+    """
+    pools = [list(dict.fromkeys(uuid for ranking in query for uuid in ranking))
+             for query in rankings]
+    sources = max((len(query) for query in rankings), default=0)
+    width = max((len(pool) for pool in pools), default=0)
+
+    ranks = np.full((sources, len(pools), width), -1, dtype=np.int32)
+    mask = np.zeros((len(pools), width), dtype=bool)
+    for q, (query, pool) in enumerate(zip(rankings, pools)):
+        column = {uuid: c for c, uuid in enumerate(pool)}
+        mask[q, :len(pool)] = True
+        for s, ranking in enumerate(query):
+            for rank, uuid in enumerate(ranking):
+                if ranks[s, q, column[uuid]] < 0:
+                    ranks[s, q, column[uuid]] = rank
+    return pools, ranks, mask
+
+
+def rrf(ranks: np.ndarray, rank_const: int = RRF_RANK_CONST) -> np.ndarray:
+    """Reciprocal rank fusion scores, ``sum(1 / (rank + rank_const))``."""
+    present = ranks >= 0
+    return np.where(present, 1.0 / (np.maximum(ranks, 0) + rank_const), 0.0).sum(axis=0)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def mmr(query_vectors: np.ndarray, candidate_vectors: np.ndarray, mask: np.ndarray,
+        mmr_lambda: float = DEFAULT_MMR_LAMBDA) -> np.ndarray:
+    """Maximal marginal relevance scores, as Graphiti computes them.
+
+    ``query_vectors`` is ``(queries, dim)`` and ``candidate_vectors``
+    ``(queries, candidates, dim)``. Each candidate scores
+    ``lambda * sim(query) + (lambda - 1) * max sim(other candidate)``.
+    """
+    candidates = normalize(candidate_vectors) * mask[..., None]
+    relevance = np.matmul(candidates, query_vectors[..., None])[..., 0]
+    similarity = np.matmul(candidates, candidates.transpose(0, 2, 1))
+    # A candidate is not redundant with itself
+    diagonal = np.arange(similarity.shape[1])
+    similarity[:, diagonal, diagonal] = 0
+    redundancy = similarity.max(axis=2)
+    return mmr_lambda * relevance + (mmr_lambda - 1) * redundancy
+
+
+def cosine(query_vectors: np.ndarray, candidate_vectors: np.ndarray) -> np.ndarray:
+    """Cosine similarity of each candidate to its query."""
+    return np.matmul(normalize(candidate_vectors), normalize(query_vectors)[..., None])[..., 0]
+
+
+def score_fusion(scores: Sequence[np.ndarray], weights: Sequence[float],
+                 mask: np.ndarray) -> np.ndarray:
+    """Weighted sum of per-query min-max normalized score arrays."""
+    fused = np.zeros(mask.shape)
+    for source, weight in zip(scores, weights):
+        low = np.where(mask, source, np.inf).min(axis=1, keepdims=True)
+        high = np.where(mask, source, -np.inf).max(axis=1, keepdims=True)
+        spread = np.where(high > low, high - low, 1)
+        fused += weight * np.where(mask, (source - low) / spread, 0)
+    return fused
+
+
+def top_k(scores: np.ndarray, mask: np.ndarray, k: int,
+          min_score: float = -np.inf) -> List[List[int]]:
+    """Column indices of the ``k`` best masked candidates of each query."""
+    scores = np.where(mask & (scores >= min_score), scores, -np.inf)
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return [[] for _ in range(len(scores))]
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    best = np.take_along_axis(
+        best, np.argsort(-np.take_along_axis(scores, best, axis=1), axis=1, kind='stable'),
+        axis=1)
+    return [[int(c) for c in row if np.isfinite(scores[q, c])]
+            for q, row in enumerate(best)]
@@ -0,0 +1,128 @@
+"""
+Search result cache
+
+An async-safe LRU cache for Graphiti search results with TTL expiry,
+write invalidation and collapsing of identical concurrent searches.
+"""
+
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SearchCache:
+    """LRU cache of search results keyed by query, config and center node."""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        # Bumped on every write so searches started before it are not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(query: str, config: Any = None,
+                 center_node_uuid: str | None = None, **params) -> Hashable:
+        """Build a cache key from a normalized query and search settings."""
+        normalized = re.sub(r'\s+', ' ', query).strip().lower()
+        if hasattr(config, 'model_dump_json'):
+            config = config.model_dump_json()
+        return (normalized, config, center_node_uuid,
+                tuple(sorted((k, repr(v)) for k, v in params.items())))
+
+    async def get_or_search(self, key: Hashable,
+                            search: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached result for ``key`` or run ``search`` once.
+
+        Callers that joined an in-flight search start over if the caller
+        running it is cancelled, instead of being cancelled with it.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        while (inflight := self._inflight.get(key)) is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    # This caller was cancelled, not the search it joined
+                    raise
+                # The leading caller was cancelled; retry, possibly as the new leader
+
+        self.misses += 1
+        generation = self._generation
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await search()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a search nobody joined does not warn
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            if generation == self._generation:
+                self._store(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _store(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self):
+        """Drop every cached result after a write to the graph."""
+        self._entries.clear()
+        self._generation += 1
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        """Return hit-rate metrics."""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'hit_rate': (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+
+_search_cache: SearchCache | None = None
+
+
+def get_search_cache() -> SearchCache:
+    """Return the process-wide search cache shared with the agent tool."""
+    global _search_cache
+    if _search_cache is None:
+        _search_cache = SearchCache(
+            max_entries=int(os.environ.get('SEARCH_CACHE_SIZE', '512')),
+            ttl_seconds=float(os.environ.get('SEARCH_CACHE_TTL', '300')),
+        )
+    return _search_cache
@@ -0,0 +1,313 @@
+"""
+Graphiti HTTP server
+
+An asyncio web service over one shared Graphiti client and connection pool.
+
+Endpoints:
+    POST /search        hybrid edge search, optionally "as_of" an ISO datetime
+    POST /search/nodes  node search with the NODE_HYBRID_SEARCH_RRF recipe
+    POST /episodes      queue episodes for ingestion ("wait": true ingests inline)
+    GET  /episodes/status  ingestion queue depth and lag
+    POST /chat          stream an agent answer as server-sent events
+    GET  /health        graph statistics
+    GET  /metrics       latency histograms in Prometheus text format
+
+Search, ingestion, chat and /health take an optional "group_id" (a query
+parameter for /health) that scopes them to one tenant's partition of the
+graph, served by its GROUP_ROUTES client if it has one.
+
+Requests beyond SERVER_MAX_INFLIGHT wait up to SERVER_QUEUE_TIMEOUT seconds
+for a slot and are then rejected with 503 (an "error" event for /chat, whose
+stream has already started), and every request is cut off after
+SERVER_REQUEST_TIMEOUT seconds (SERVER_INGEST_TIMEOUT for ingestion).
+"""
+
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from dotenv import load_dotenv
+from sse_starlette.sse import EventSourceResponse
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from connection import Connection, parse_episode
+from graphiti_client import (
+    build_indices_once,
+    close_graphiti,
+    get_graphiti,
+    route_client,
+    route_clients,
+)
+from ingest_queue import IngestionQueue
+from instrumentation import metrics
+
+if TYPE_CHECKING:
+    from conversation_memory import ConversationMemory
+
+load_dotenv()
+
+MAX_INFLIGHT = int(os.environ.get('SERVER_MAX_INFLIGHT', '64'))
+QUEUE_TIMEOUT = float(os.environ.get('SERVER_QUEUE_TIMEOUT', '2'))
+REQUEST_TIMEOUT = float(os.environ.get('SERVER_REQUEST_TIMEOUT', '30'))
+INGEST_TIMEOUT = float(os.environ.get('SERVER_INGEST_TIMEOUT', '600'))
+MAX_SESSIONS = int(os.environ.get('SERVER_MAX_SESSIONS', '1000'))
+
+_inflight = asyncio.Semaphore(MAX_INFLIGHT)
+_sessions: 'OrderedDict[str, ConversationMemory]' = OrderedDict()
+
+
+class Overloaded(Exception):
+    """Raised when no request slot frees up within the queue timeout."""
+
+
+@asynccontextmanager
+async def request_slot():
+    """Hold one of the server's in-flight request slots."""
+    try:
+        await asyncio.wait_for(_inflight.acquire(), QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise Overloaded()
+    try:
+        yield
+    finally:
+        _inflight.release()
+
+
+def guarded(timeout):
+    """Wrap a JSON handler with backpressure, a timeout and error mapping."""
+    def decorator(handler):
+        async def endpoint(request: Request):
+            try:
+                async with request_slot():
+                    return await asyncio.wait_for(handler(request), timeout)
+            except Overloaded:
+                return JSONResponse(
+                    {'error': 'server busy'}, status_code=503,
+                    headers={'Retry-After': '1'})
+            except asyncio.TimeoutError:
+                return JSONResponse({'error': 'request timed out'}, status_code=504)
+            except (KeyError, ValueError, json.JSONDecodeError) as e:
+                return JSONResponse({'error': f'bad request: {e}'}, status_code=400)
+        return endpoint
+    return decorator
+
+
+def connection(request: Request, group_id: str | None = None) -> Connection:
+    """The app's connection, or one scoped to ``group_id``."""
+    default = request.app.state.connection
+    if group_id is None:
+        return default
+    return Connection(route_client(default.graphiti, group_id), group_id)
+
+
+@guarded(REQUEST_TIMEOUT)
+async def search(request: Request):
+    body = await request.json()
+    edges = await connection(request, body.get('group_id')).search_edges(
+        body['query'],
+        num_results=int(body.get('num_results', 10)),
+        center_node_uuid=body.get('center_node_uuid'),
+        as_of=datetime.fromisoformat(body['as_of']) if body.get('as_of') else None,
+    )
+    return JSONResponse({'edges': [
+        edge.model_dump(mode='json', exclude={'fact_embedding'}) for edge in edges
+    ]})
+
+
+@guarded(REQUEST_TIMEOUT)
+async def search_nodes(request: Request):
+    body = await request.json()
+    results = await connection(request, body.get('group_id')).search_nodes(
+        body['query'], limit=int(body.get('limit', 5)))
+    return JSONResponse({'nodes': [
+        node.model_dump(mode='json', exclude={'name_embedding'})
+        for node in results.nodes
+    ]})
+
+
+@guarded(INGEST_TIMEOUT)
+async def episodes(request: Request):
+    body = await request.json()
+    batch = [parse_episode(record) for record in body['episodes']]
+    prefix = body.get('prefix', 'API')
+    if body.get('group_id'):
+        # Records may still name a group of their own
+        for episode in batch:
+            episode.setdefault('group_id', str(body['group_id']))
+    if not body.get('wait'):
+        # Journaled and ingested by the background workers
+        queue = request.app.state.ingest_queue
+        ids = [queue.enqueue(episode, prefix) for episode in batch]
+        await queue.flush()
+        return JSONResponse({'queued': ids}, status_code=202)
+
+    await Connection.add_episodes(
+        connection(request).graphiti, batch, prefix,
+        concurrency=int(body.get('concurrency', 4)))
+    return JSONResponse({'ingested': len(batch)})
+
+
+@guarded(REQUEST_TIMEOUT)
+async def episodes_status(request: Request):
+    return JSONResponse(request.app.state.ingest_queue.status())
+
+
+async def prometheus_metrics(request: Request):
+    return PlainTextResponse(
+        metrics.prometheus_text(), media_type='text/plain; version=0.0.4')
+
+
+@guarded(REQUEST_TIMEOUT)
+async def health(request: Request):
+    stats = await connection(request, request.query_params.get('group_id')).graph_stats()
+    return JSONResponse({'status': 'ok', **asdict(stats)})
+
+
+def session_memory(session_id: str) -> 'ConversationMemory':
+    """Return the bounded memory of a chat session, evicting the oldest."""
+    from conversation_memory import ConversationMemory
+
+    memory = _sessions.pop(session_id, None) or ConversationMemory()
+    _sessions[session_id] = memory
+    while len(_sessions) > MAX_SESSIONS:
+        _sessions.popitem(last=False)
+    return memory
+
+
+async def chat(request: Request):
+    # The agent and chat memory pull in pydantic_ai, so only load them for chat
+    from conversation_memory import ConversationMemory
+    from live_agent import (
+        GraphitiDependencies,
+        answer_messages,
+        cached_answer,
+        get_agent,
+        remember_answer,
+        start_prefetch,
+    )
+
+    try:
+        body = await request.json()
+        message = body['message']
+        group_id = str(body['group_id']) if body.get('group_id') else None
+    except (KeyError, ValueError) as e:
+        return JSONResponse({'error': f'bad request: {e}'}, status_code=400)
+
+    graphiti = connection(request, group_id).graphiti
+    # Sessions are per group, so a tenant cannot pick up another's history
+    memory = session_memory(f"{group_id or ''}/{body['session_id']}") \
+        if body.get('session_id') else ConversationMemory()
+
+    async def stream():
+        # The slot is taken once the stream runs, so a client that disconnects
+        # before that, or a failure while setting it up, cannot leak it
+        try:
+            async with request_slot():
+                async for event in respond():
+                    yield event
+        except Overloaded:
+            yield {'event': 'error', 'data': 'server busy'}
+
+    async def respond():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + REQUEST_TIMEOUT
+        prefetch = None
+        try:
+            history = memory.history()
+            try:
+                hit, question_vector = await asyncio.wait_for(
+                    cached_answer(graphiti, message, history, group_id),
+                    deadline - loop.time())
+            except asyncio.TimeoutError:
+                yield {'event': 'error', 'data': 'request timed out'}
+                return
+            if hit is not None:
+                await memory.add_turn(answer_messages(message, hit.answer))
+                yield {'event': 'delta', 'data': hit.answer}
+                yield {'event': 'done', 'data': json.dumps(
+                    {'request_tokens': 0, 'cached': True})}
+                return
+
+            # Search the raw message while the model decides what to look up
+            prefetch = start_prefetch(graphiti, message, group_id)
+            deps = GraphitiDependencies(
+                graphiti_client=graphiti, prefetch=prefetch, group_id=group_id)
+            answer = []
+            async with get_agent().run_stream(
+                message, message_history=history, deps=deps,
+            ) as result:
+                deltas = result.stream_text(delta=True).__aiter__()
+                while True:
+                    # Bound every wait, including tool calls between deltas
+                    try:
+                        delta = await asyncio.wait_for(
+                            deltas.__anext__(), deadline - loop.time())
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        yield {'event': 'error', 'data': 'request timed out'}
+                        return
+                    answer.append(delta)
+                    yield {'event': 'delta', 'data': delta}
+            await memory.add_turn(result.new_messages())
+            remember_answer(message, question_vector, ''.join(answer), deps)
+            yield {'event': 'done', 'data': json.dumps(
+                {'request_tokens': result.usage().request_tokens})}
+        finally:
+            if prefetch is not None:
+                prefetch.cancel()
+
+    return EventSourceResponse(stream())
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    graphiti = get_graphiti()
+    for client in [graphiti, *route_clients()]:
+        await build_indices_once(client)
+    app.state.connection = Connection(graphiti)
+    app.state.ingest_queue = IngestionQueue(
+        graphiti,
+        journal_path=os.environ.get('INGEST_JOURNAL', '.ingest_journal.jsonl'),
+        workers=int(os.environ.get('INGEST_WORKERS', '4')),
+        compact_after=int(os.environ.get('INGEST_COMPACT_AFTER', '10000')),
+    )
+    await app.state.ingest_queue.start()
+    try:
+        yield
+    finally:
+        # Unfinished episodes stay in the journal for the next start
+        await app.state.ingest_queue.stop(drain=False)
+        await close_graphiti()
+
+
+app = Starlette(
+    routes=[
+        Route('/search', search, methods=['POST']),
+        Route('/search/nodes', search_nodes, methods=['POST']),
+        Route('/episodes', episodes, methods=['POST']),
+        Route('/episodes/status', episodes_status, methods=['GET']),
+        Route('/chat', chat, methods=['POST']),
+        Route('/health', health, methods=['GET']),
+        Route('/metrics', prometheus_metrics, methods=['GET']),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(
+        app,
+        host=os.environ.get('SERVER_HOST', '127.0.0.1'),
+        port=int(os.environ.get('SERVER_PORT', '8000')),
+    )
@@ -0,0 +1,95 @@
+"""
+Streaming Markdown renderer
+
+Renders a streamed Markdown answer without re-parsing it from the start on
+every delta. Completed blocks are printed once and frozen above the live
+region; only the trailing unfinished block is re-parsed, at most ``fps``
+times per second, with a tokens-per-second readout underneath.
+"""
+
+import time
+
+from rich.console import Console, Group
+from rich.live import Live
+from rich.markdown import Markdown
+from rich.text import Text
+
+# Rough OpenAI tokenizer ratio, good enough for a throughput readout
+CHARS_PER_TOKEN = 4
+
+
+def split_completed(text: str) -> tuple[str, str]:
+    """Split ``text`` into completed blocks and the unfinished tail.
+
+    A block ends at a blank line that is not inside a fenced code block.
+    """
+    boundary = -1
+    in_fence = False
+    position = 0
+    for line in text.splitlines(keepends=True):
+        if line.lstrip().startswith(('```', '~~~')):
+            in_fence = not in_fence
+        elif (not in_fence and not line.strip() and line.endswith('\n')
+              and position > 0):
+            # The last line may still be growing, so it must be terminated
+            boundary = position
+        position += len(line)
+    if boundary < 0:
+        return '', text
+    return text[:boundary], text[boundary:].lstrip('\r\n')
+
+
+class StreamingMarkdown:
+    """Incremental Markdown view for a rich ``Live`` display."""
+
+    def __init__(self, console: Console, fps: float = 15.0):
+        self.console = console
+        self.frame_interval = 1.0 / fps
+        self.pending = ''
+        self.chars = 0
+        self.started_at = None
+        self.last_frame = 0.0
+        self.live = Live(
+            '', console=console, auto_refresh=False, vertical_overflow='visible')
+
+    def __enter__(self):
+        self.live.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._render(final=True)
+        return self.live.__exit__(*exc_info)
+
+    @property
+    def tokens_per_second(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        elapsed = time.perf_counter() - self.started_at
+        return self.chars / CHARS_PER_TOKEN / elapsed if elapsed > 0 else 0.0
+
+    def append(self, delta: str):
+        """Add a streamed delta and redraw if a frame is due."""
+        if self.started_at is None:
+            self.started_at = time.perf_counter()
+        self.chars += len(delta)
+        self.pending += delta
+
+        if '\n' in delta:
+            completed, self.pending = split_completed(self.pending)
+            if completed:
+                # Printed above the live region and never re-rendered
+                self.live.console.print(Markdown(completed))
+                self._render()
+                return
+
+        if time.perf_counter() - self.last_frame >= self.frame_interval:
+            self._render()
+
+    def _render(self, final: bool = False):
+        self.last_frame = time.perf_counter()
+        readout = Text(
+            f'{self.chars // CHARS_PER_TOKEN} tokens · '
+            f'{self.tokens_per_second:.1f} tokens/s',
+            style='dim',
+        )
+        self.live.update(Group(Markdown(self.pending), readout), refresh=True)
@@ -0,0 +1,249 @@
+"""
+Validity-interval index
+
+An in-memory interval tree over the ``[valid_at, invalid_at)`` interval of
+every edge, answering "which facts were valid at this instant" without a
+database round-trip. Facts without a ``valid_at`` count as valid since the
+beginning and facts without an ``invalid_at`` as still valid.
+
+The tree is static and rebuilt lazily; edges changed since the last build
+(new facts, or facts a newer episode invalidated) are kept in a small
+pending set that is checked directly until the next rebuild. Queries return
+row ids, either the index's own or, through a cached row mapping, those of
+an ANN ``VectorIndex``, so no per-query set of uuids is built.
+"""
+
+import asyncio
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+from graphiti_core.helpers import DEFAULT_DATABASE, parse_db_date
+
+OPEN_START = np.iinfo(np.int64).min
+OPEN_END = np.iinfo(np.int64).max
+LEAF_SIZE = 64
+LOAD_BATCH = 20000
+INITIAL_ROWS = 1024
+
+
+def to_micros(value: datetime | None, default: int) -> int:
+    if value is None:
+        return default
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1_000_000)
+
+
+class IntervalTree:
+    """Static centered interval tree over half-open integer intervals."""
+
+    __slots__ = ('center', 'ids_by_start', 'starts', 'ids_by_end', 'ends',
+                 'left', 'right')
+
+    def __init__(self, ids: np.ndarray, starts: np.ndarray, ends: np.ndarray):
+        self.left = self.right = None
+        center = np.median(np.concatenate([starts, ends]).astype(np.float64))
+        left = ends <= center
+        right = starts > center
+        if len(ids) <= LEAF_SIZE or left.all() or right.all():
+            # Small or unsplittable nodes hold their intervals and are scanned
+            self.center = None
+            self.ids_by_start, self.starts, self.ends = ids, starts, ends
+            return
+
+        self.center = center
+        here = ~(left | right)
+
+        order = np.argsort(starts[here], kind='stable')
+        self.ids_by_start = ids[here][order]
+        self.starts = starts[here][order]
+        order = np.argsort(ends[here], kind='stable')
+        self.ids_by_end = ids[here][order]
+        self.ends = ends[here][order]
+
+        if left.any():
+            self.left = IntervalTree(ids[left], starts[left], ends[left])
+        if right.any():
+            self.right = IntervalTree(ids[right], starts[right], ends[right])
+
+    def stab(self, point: int, out: list):
+        """Append the ids of intervals containing ``point`` to ``out``."""
+        node = self
+        while node is not None:
+            if node.center is None:
+                out.append(node.ids_by_start[(node.starts <= point) & (node.ends > point)])
+                return
+            if point < node.center:
+                # Every interval here ends after the center, so after point
+                out.append(node.ids_by_start[:np.searchsorted(node.starts, point, 'right')])
+                node = node.left
+            else:
+                # Every interval here starts at or before the center
+                out.append(node.ids_by_end[np.searchsorted(node.ends, point, 'right'):])
+                node = node.right
+
+
+class ValidityIndex:
+    """Edge uuids by validity interval, for point-in-time filtering."""
+
+    def __init__(self):
+        self.uuids: list[str] = []
+        self.rows: dict[str, int] = {}
+        self.group_rows: dict[str, list[int]] = {}
+        # Growable; only the first len(uuids) rows are used
+        self.starts = np.zeros(0, dtype=np.int64)
+        self.ends = np.zeros(0, dtype=np.int64)
+        self._tree: IntervalTree | None = None
+        # Row of each of our rows in an ANN index (-1 when it has none yet)
+        self._ann_rows = np.zeros(0, dtype=np.int64)
+        self._ann_key: tuple | None = None
+        self._ann_size = 0
+        self._pending: set[int] = set()
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self.uuids)
+
+    def upsert(self, uuid: str, valid_at: datetime | None, invalid_at: datetime | None,
+               group_id: str = ''):
+        start = to_micros(valid_at, OPEN_START)
+        end = to_micros(invalid_at, OPEN_END)
+        row = self.rows.get(uuid)
+        if row is None:
+            row = self.rows[uuid] = len(self.uuids)
+            self.uuids.append(uuid)
+            self.group_rows.setdefault(group_id, []).append(row)
+            if row == len(self.starts):
+                grow = max(INITIAL_ROWS, row)
+                self.starts = np.concatenate([self.starts, np.zeros(grow, dtype=np.int64)])
+                self.ends = np.concatenate([self.ends, np.zeros(grow, dtype=np.int64)])
+            self.starts[row] = start
+            self.ends[row] = end
+        elif (self.starts[row], self.ends[row]) == (start, end):
+            return
+        else:
+            self.starts[row] = start
+            self.ends[row] = end
+        self._pending.add(row)
+
+    def add_edges(self, edges):
+        for edge in edges:
+            self.upsert(edge.uuid, edge.valid_at, edge.invalid_at, edge.group_id)
+
+    def remove_groups(self, group_ids: list[str]):
+        """Forget the intervals of cleared groups."""
+        for group_id in group_ids:
+            for row in self.group_rows.pop(group_id, []):
+                if self.rows.get(self.uuids[row]) == row:
+                    del self.rows[self.uuids[row]]
+                # An empty interval is never valid; the row goes at the next rebuild
+                self.starts[row] = self.ends[row] = OPEN_END
+                self._pending.add(row)
+
+    def valid_rows(self, as_of: datetime) -> np.ndarray:
+        """Return the sorted rows of the edges valid at ``as_of``."""
+        point = to_micros(as_of, 0)
+        if self._tree is None or len(self._pending) > max(1024, len(self.uuids) // 16):
+            self._rebuild()
+
+        found: list[np.ndarray] = []
+        if self._tree is not None:
+            self._tree.stab(point, found)
+        rows = np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+        if self._pending:
+            # Rows changed since the build are decided from their current interval
+            pending = np.fromiter(self._pending, dtype=np.int64, count=len(self._pending))
+            valid = (self.starts[pending] <= point) & (self.ends[pending] > point)
+            rows = np.union1d(np.setdiff1d(rows, pending), pending[valid])
+        else:
+            rows = np.sort(rows)
+        return rows
+
+    def valid_at(self, as_of: datetime) -> set[str]:
+        """Return the uuids of edges valid at ``as_of``."""
+        return {self.uuids[row] for row in self.valid_rows(as_of)}
+
+    def ann_rows(self, as_of: datetime, index) -> np.ndarray:
+        """Return the sorted rows of ``index`` (a ``VectorIndex``) valid at ``as_of``."""
+        mapping = self._map_rows(index)[self.valid_rows(as_of)]
+        return np.unique(mapping[mapping >= 0])
+
+    def _map_rows(self, index) -> np.ndarray:
+        # Rows of an index only move when it removes entries, which bumps its
+        # version; otherwise only our new rows, and unmatched rows once the
+        # index has grown, need a lookup
+        key = (id(index), index.version)
+        if key != self._ann_key:
+            self._ann_key, self._ann_size = key, index.size
+            self._ann_rows = np.zeros(0, dtype=np.int64)
+        rows = index.rows
+        if index.size != self._ann_size:
+            missing = np.flatnonzero(self._ann_rows == -1)
+            self._ann_rows[missing] = [rows.get(self.uuids[row], -1) for row in missing]
+            self._ann_size = index.size
+        if len(self._ann_rows) < len(self.uuids):
+            new = [rows.get(uuid, -1) for uuid in self.uuids[len(self._ann_rows):]]
+            self._ann_rows = np.concatenate([self._ann_rows, np.asarray(new, dtype=np.int64)])
+        return self._ann_rows
+
+    async def ensure_loaded(self, driver):
+        if not self._loaded:
+            await self.load(driver)
+
+    async def load(self, driver):
+        """Load the validity interval of every edge in the graph."""
+        async with self._lock:
+            after_uuid = ''
+            while True:
+                records, _, _ = await driver.execute_query(
+                    """
+                    MATCH ()-[e:RELATES_TO]->()
+                    WHERE e.uuid > $after_uuid
+                    RETURN e.uuid AS uuid, e.group_id AS group_id,
+                           e.valid_at AS valid_at, e.invalid_at AS invalid_at
+                    ORDER BY e.uuid
+                    LIMIT $limit
+                    """,
+                    after_uuid=after_uuid,
+                    limit=LOAD_BATCH,
+                    database_=DEFAULT_DATABASE,
+                    routing_='r',
+                )
+                for record in records:
+                    self.upsert(record['uuid'], parse_db_date(record['valid_at']),
+                                parse_db_date(record['invalid_at']), record['group_id'] or '')
+                if len(records) < LOAD_BATCH:
+                    break
+                after_uuid = records[-1]['uuid']
+            self._rebuild()
+            self._loaded = True
+
+    def invalidate(self):
+        """Reload from the graph on next use, e.g. after a bulk load."""
+        self._loaded = False
+
+    def clear(self):
+        self.__init__()
+
+    def _rebuild(self):
+        self._pending.clear()
+        if not self.uuids:
+            self._tree = None
+            return
+        size = len(self.uuids)
+        self._tree = IntervalTree(
+            np.arange(size), self.starts[:size].copy(), self.ends[:size].copy())
+
+
+_validity_index: ValidityIndex | None = None
+
+
+def get_validity_index() -> ValidityIndex | None:
+    """Return the process-wide validity index, or None unless TEMPORAL_INDEX is set."""
+    global _validity_index
+    if _validity_index is None and os.environ.get(
+            'TEMPORAL_INDEX', 'false').lower() in ('1', 'true', 'yes'):
+        _validity_index = ValidityIndex()
+    return _validity_index
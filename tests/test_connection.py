@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+from graphiti_core.nodes import EpisodeType
+
+from connection import Connection, load_checkpoint
+
+
+class Crash(BaseException):
+    """Stands in for the process dying mid-load."""
+
+
+class BulkGraphiti:
+    """Records the episode names of every bulk call; optionally dies on one."""
+
+    def __init__(self, crash_on_call=None):
+        self.names = []
+        self.calls = 0
+        self.crash_on_call = crash_on_call
+
+    async def add_episode_bulk(self, raw_episodes, group_id=''):
+        self.calls += 1
+        if self.calls == self.crash_on_call:
+            raise Crash()
+        self.names += [(group_id, raw.name) for raw in raw_episodes]
+
+
+def episodes(count, start=0):
+    return [{'content': f'episode {i}', 'type': EpisodeType.text, 'description': 'test'}
+            for i in range(start, start + count)]
+
+
+def load(graphiti, batch, checkpoint_path, group_id=None):
+    asyncio.run(Connection.add_bulk_episodes(
+        graphiti, batch, 'P', chunk_size=10, checkpoint_path=checkpoint_path,
+        group_id=group_id))
+
+
+def test_bulk_load_resumes_after_crash(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    batch = episodes(40)
+    with pytest.raises(Crash):
+        load(BulkGraphiti(crash_on_call=3), batch, path)
+    assert load_checkpoint(path)['P']['done'] == 20
+
+    graphiti = BulkGraphiti()
+    load(graphiti, batch, path)
+    assert graphiti.names == [('', f'P {i}') for i in range(20, 40)]
+    assert load_checkpoint(path) == {}
+
+
+def test_bulk_load_ignores_checkpoint_of_other_episodes(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    with pytest.raises(Crash):
+        load(BulkGraphiti(crash_on_call=3), episodes(40), path)
+
+    # A caller that filtered out what it already loaded passes the rest
+    graphiti = BulkGraphiti()
+    load(graphiti, episodes(20, start=20), path)
+    assert len(graphiti.names) == 20
+    assert load_checkpoint(path) == {}
+
+
+def test_bulk_checkpoint_is_per_group(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    batch = episodes(40)
+    with pytest.raises(Crash):
+        load(BulkGraphiti(crash_on_call=3), batch, path, group_id='a')
+
+    graphiti = BulkGraphiti()
+    load(graphiti, batch, path, group_id='b')
+    assert graphiti.names == [('b', f'P {i}') for i in range(40)]
+    assert load_checkpoint(path)['a/P']['done'] == 20
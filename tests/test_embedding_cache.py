@@ -0,0 +1,38 @@
+from embedding_cache import EmbeddingStore
+
+
+def vector(value):
+    return [float(value)] * 4
+
+
+def test_dropped_stale_slot_is_reused_before_live_ones(tmp_path):
+    store = EmbeddingStore(str(tmp_path), max_entries=4, flush_every=1000)
+    for value, key in enumerate('abcd'):
+        store.put(EmbeddingStore.make_key('m', key), vector(value))
+    store.flush()
+    # Evicts 'a' and reuses its slot, then the process dies before a flush
+    store.put(EmbeddingStore.make_key('m', 'e'), vector(4))
+    store._vectors.flush()
+    store._tags.flush()
+
+    store = EmbeddingStore(str(tmp_path), max_entries=4, flush_every=1000)
+    assert store.get(EmbeddingStore.make_key('m', 'a')) is None
+    store.put(EmbeddingStore.make_key('m', 'f'), vector(5))
+
+    for value, key in enumerate('bcd', start=1):
+        assert store.get(EmbeddingStore.make_key('m', key)) == vector(value)
+    assert store.get(EmbeddingStore.make_key('m', 'f')) == vector(5)
+
+
+def test_slots_survive_a_reopen(tmp_path):
+    store = EmbeddingStore(str(tmp_path), max_entries=3)
+    for value, key in enumerate('abc'):
+        store.put(EmbeddingStore.make_key('m', key), vector(value))
+    # Evicts 'a'
+    store.put(EmbeddingStore.make_key('m', 'd'), vector(3))
+    store.flush()
+
+    store = EmbeddingStore(str(tmp_path), max_entries=3)
+    assert store.get(EmbeddingStore.make_key('m', 'a')) is None
+    for value, key in enumerate('bcd', start=1):
+        assert store.get(EmbeddingStore.make_key('m', key)) == vector(value)
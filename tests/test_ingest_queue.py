@@ -0,0 +1,131 @@
+import asyncio
+import json
+
+from graphiti_core.nodes import EpisodeType
+
+from ingest_queue import IngestionQueue
+
+
+class RecordingGraphiti:
+    """Records committed episode names; ``failures`` maps names to failed attempts."""
+
+    def __init__(self, failures=None, gate=None):
+        self.added = []
+        self.failures = dict(failures or {})
+        self.gate = gate
+
+    async def add_episode(self, name, group_id='', **kwargs):
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.failures.get(name):
+            self.failures[name] -= 1
+            raise RuntimeError('extraction failed')
+        self.added.append(name)
+
+
+def episode(i, group_id=None):
+    episode = {'content': f'episode {i}', 'type': EpisodeType.text, 'description': 'test'}
+    if group_id:
+        episode['group_id'] = group_id
+    return episode
+
+
+def journal_lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_replay_resumes_pending_episodes_in_order(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+
+    async def crash():
+        queue = IngestionQueue(RecordingGraphiti(gate=asyncio.Event()), path, fsync=False)
+        await queue.start()
+        for i in range(3):
+            queue.enqueue(episode(i), 'Q')
+        await queue.flush()
+        # The process dies with every episode still in flight
+        for task in queue._tasks.values():
+            task.cancel()
+        queue._journal.close()
+
+    async def restart():
+        graphiti = RecordingGraphiti()
+        queue = IngestionQueue(graphiti, path, fsync=False)
+        await queue.start()
+        assert queue.status()['depth'] == 3
+        await queue.stop()
+        return graphiti
+
+    asyncio.run(crash())
+    graphiti = asyncio.run(restart())
+    assert graphiti.added == ['Q 0', 'Q 1', 'Q 2']
+    # Only the episode numbering is left once everything is done
+    assert journal_lines(path) == [{'op': 'seq', 'seq': 3}]
+
+
+def test_replay_skips_finished_and_torn_records(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+
+    async def run():
+        queue = IngestionQueue(RecordingGraphiti(), path, fsync=False)
+        await queue.start()
+        for i in range(2):
+            queue.enqueue(episode(i), 'Q')
+        await queue.stop()
+        with open(path, 'a') as f:
+            f.write(json.dumps({'op': 'enqueue', 'id': 'x', 'seq': 2, 'prefix': 'Q',
+                                'enqueued_at': 0, 'episode': {
+                                    'content': 'late', 'type': 'text', 'description': 'test',
+                                    'reference_time': '2025-01-01T00:00:00+00:00'}}) + '\n')
+            f.write('{"op": "done", "id"')
+
+        graphiti = RecordingGraphiti()
+        queue = IngestionQueue(graphiti, path, fsync=False)
+        await queue.start()
+        await queue.stop()
+        return graphiti
+
+    assert asyncio.run(run()).added == ['Q 2']
+
+
+def test_journal_is_compacted_as_records_finish(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+
+    async def run():
+        queue = IngestionQueue(RecordingGraphiti(), path, fsync=False, compact_after=2)
+        await queue.start()
+        for i in range(10):
+            queue.enqueue(episode(i), 'Q')
+        while queue.status()['depth']:
+            await asyncio.sleep(0.01)
+        await queue.flush()
+        lines = journal_lines(path)
+        await queue.stop()
+        return lines
+
+    lines = asyncio.run(run())
+    # Ten enqueue and ten done records without compaction
+    assert len(lines) < 20
+    # Whatever the rewrite kept has finished since
+    enqueued = {line['id'] for line in lines if line['op'] == 'enqueue'}
+    assert enqueued <= {line['id'] for line in lines if line['op'] == 'done'}
+
+
+def test_backoff_does_not_hold_an_ingestion_slot(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    graphiti = RecordingGraphiti(failures={'Q 0': 1})
+
+    async def run():
+        queue = IngestionQueue(graphiti, path, workers=1, base_delay=0.2, fsync=False)
+        await queue.start()
+        queue.enqueue(episode(0, 'failing'), 'Q')
+        await asyncio.sleep(0.01)
+        queue.enqueue(episode(1, 'healthy'), 'Q')
+        await asyncio.sleep(0.1)
+        # The healthy group ran while the failing one backed off
+        assert graphiti.added == ['Q 1']
+        await queue.stop()
+
+    asyncio.run(run())
+    assert graphiti.added == ['Q 1', 'Q 0']
@@ -0,0 +1,25 @@
+import asyncio
+
+from neighborhood_cache import NeighborhoodCache
+
+
+class FlakyDriver:
+    """Fails the snapshot queries but answers shortest-path reranking."""
+
+    def __init__(self):
+        self.queries = 0
+
+    async def execute_query(self, query_, **params):
+        self.queries += 1
+        text = getattr(query_, 'text', query_)
+        if 'SHORTEST' in text:
+            return [{'uuid': 'far', 'score': 3}, {'uuid': 'near', 'score': 1}], None, None
+        raise ConnectionError('database unavailable')
+
+
+def test_failed_snapshot_falls_back_to_uncached_rerank():
+    cache = NeighborhoodCache(min_uses=1)
+    driver = FlakyDriver()
+    ranked = asyncio.run(cache.rerank(driver, ['far', 'near', 'center'], 'center'))
+    assert ranked == ['center', 'near', 'far']
+    assert cache.misses == 1 and not cache.snapshots
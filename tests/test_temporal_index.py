@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from ann_index import VectorIndex
+from temporal_index import IntervalTree, ValidityIndex
+
+T0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def day(n):
+    return T0 + timedelta(days=n)
+
+
+def test_stab_matches_a_linear_scan():
+    rng = np.random.default_rng(0)
+    starts = rng.integers(0, 1000, 5000)
+    ends = starts + rng.integers(1, 200, 5000)
+    tree = IntervalTree(np.arange(5000), starts, ends)
+    for point in (0, 1, 37, 500, 999, 1100, 1300):
+        found = []
+        tree.stab(point, found)
+        expected = np.flatnonzero((starts <= point) & (ends > point))
+        assert np.array_equal(np.sort(np.concatenate(found)), expected)
+
+
+def test_open_bounds_and_half_open_intervals():
+    index = ValidityIndex()
+    index.upsert('always', None, None)
+    index.upsert('since', day(1), None)
+    index.upsert('until', None, day(1))
+    index.upsert('window', day(1), day(2))
+    assert index.valid_at(day(0)) == {'always', 'until'}
+    assert index.valid_at(day(1)) == {'always', 'since', 'window'}
+    assert index.valid_at(day(2)) == {'always', 'since'}
+
+
+def test_rows_changed_after_a_build_are_pending():
+    index = ValidityIndex()
+    for i in range(100):
+        index.upsert(f'e{i}', day(0), None)
+    assert len(index.valid_rows(day(1))) == 100
+
+    # A newer episode invalidates a fact, and another fact arrives
+    index.upsert('e5', day(0), day(1))
+    index.upsert('new', day(1), None)
+    assert index._pending
+    valid = index.valid_at(day(1))
+    assert 'e5' not in valid and 'new' in valid and len(valid) == 100
+    index._rebuild()
+    assert index.valid_at(day(1)) == valid
+
+
+def test_remove_groups_only_drops_those_groups():
+    index = ValidityIndex()
+    index.upsert('a', None, None, 'acme')
+    index.upsert('g', None, None, 'globex')
+    index.valid_rows(day(0))
+    index.remove_groups(['acme'])
+    assert index.valid_at(day(0)) == {'g'}
+    index._rebuild()
+    assert index.valid_at(day(0)) == {'g'}
+    # A cleared fact can come back
+    index.upsert('a', None, None, 'acme')
+    assert index.valid_at(day(0)) == {'a', 'g'}
+
+
+def test_ann_rows_follow_the_vector_index():
+    index = ValidityIndex()
+    vectors = VectorIndex()
+    index.upsert('old', None, day(1))
+    index.upsert('current', day(1), None)
+    index.upsert('unindexed', None, None)
+    vectors.upsert(['current', 'old'], np.eye(2), ['', ''])
+    assert vectors.rows['current'] == 0
+    assert index.ann_rows(day(0), vectors).tolist() == [vectors.rows['old']]
+    assert index.ann_rows(day(2), vectors).tolist() == [vectors.rows['current']]
+
+    # Rows added to the vector index later are picked up
+    vectors.upsert(['unindexed'], [[1.0, 1.0]], [''])
+    assert index.ann_rows(day(2), vectors).tolist() == sorted(
+        [vectors.rows['current'], vectors.rows['unindexed']])
+
+    # Removed entries drop out once the index bumps its version
+    vectors.remove(['current'])
+    assert index.ann_rows(day(2), vectors).tolist() == [vectors.rows['unindexed']]
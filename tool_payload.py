@@ -0,0 +1,60 @@
+"""
+Search tool payloads
+
+Serializes lean fact records (see ``Connection.search_facts``) straight into
+the compact text the agent's search tool returns, as TSV or JSON, within a
+fact count and character budget. No intermediate models are built, and a
+trailing note tells the model when results were cut.
+"""
+
+import json
+import re
+from typing import List
+
+FIELDS = ('uuid', 'fact', 'valid_at', 'invalid_at', 'source_node_uuid')
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def tsv_row(fact: dict) -> str:
+    return '\t'.join(
+        WHITESPACE_RE.sub(' ', value) if isinstance(value := fact.get(field), str) else ''
+        for field in FIELDS)
+
+
+def json_row(fact: dict) -> str:
+    return json.dumps({field: fact[field] for field in FIELDS if fact.get(field)},
+                      separators=(',', ':'), ensure_ascii=False)
+
+
+def format_facts(facts: List[dict], fmt: str = 'tsv', max_facts: int = 10,
+                 max_chars: int = 4000) -> str:
+    """Render up to ``max_facts`` facts in at most about ``max_chars`` characters."""
+    if not facts:
+        return 'No matching facts found.'
+    if fmt not in ('tsv', 'json'):
+        raise ValueError("fmt must be 'tsv' or 'json'")
+
+    head = '\t'.join(FIELDS) if fmt == 'tsv' else '['
+    render = tsv_row if fmt == 'tsv' else json_row
+    rows: List[str] = []
+    used = len(head)
+    for fact in facts[:max_facts]:
+        row = render(fact)
+        if used + len(row) + 1 > max_chars:
+            if not rows:
+                # Always show something of the best fact, shortened to fit
+                overflow = used + len(row) + 1 - max_chars
+                text = fact.get('fact') or ''
+                rows.append(render(dict(fact, fact=text[:max(0, len(text) - overflow - 1)] + '…')))
+            break
+        rows.append(row)
+        used += len(row) + 1
+
+    omitted = len(facts) - len(rows)
+    if fmt == 'tsv':
+        body = '\n'.join([head] + rows)
+    else:
+        body = head + ','.join(rows) + ']'
+    if omitted:
+        body += f'\n({omitted} more facts omitted; refine the query to see them)'
+    return body